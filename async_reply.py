@@ -0,0 +1,167 @@
+"""
+Asynchronous reply delivery
+
+In async reply mode the ``/sms`` webhook only advances the conversation state,
+enqueues a search job and acknowledges Twilio immediately. A pool of background
+workers runs the geocode, Places and formatting steps and delivers the answer
+out-of-band through a pluggable ``MessageSender``.
+"""
+
+import logging
+import queue
+import threading
+import time
+
+from http_client import LatencyRecorder
+
+
+class MessageSender:
+    """Delivers an outbound SMS. Subclasses implement ``send``."""
+
+    def send(self, to, body, from_=None):
+        raise NotImplementedError
+
+
+class TwilioSender(MessageSender):
+    def __init__(self, account_sid, auth_token, from_number=None):
+        self.account_sid = account_sid
+        self.auth_token = auth_token
+        self.from_number = from_number
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from twilio.rest import Client
+            self._client = Client(self.account_sid, self.auth_token)
+        return self._client
+
+    def send(self, to, body, from_=None):
+        self.client.messages.create(to=to, from_=from_ or self.from_number, body=body)
+
+
+class InMemorySender(MessageSender):
+    """Collects messages instead of sending them; used by tests and benchmarks."""
+
+    def __init__(self):
+        self.messages = []
+        self._condition = threading.Condition()
+
+    def send(self, to, body, from_=None):
+        with self._condition:
+            self.messages.append({'to': to, 'from': from_, 'body': body})
+            self._condition.notify_all()
+
+    def wait_for(self, count, timeout=5):
+        with self._condition:
+            self._condition.wait_for(lambda: len(self.messages) >= count, timeout)
+            return list(self.messages)
+
+
+class SearchJob:
+    def __init__(self, to, from_, address, keyword, received_at=None, context=None):
+        self.to = to
+        self.from_ = from_
+        self.address = address
+        self.keyword = keyword
+        # Extra keyword arguments forwarded to the pool's search function.
+        self.context = context or {}
+        self.received_at = received_at if received_at is not None else time.perf_counter()
+        self.enqueued_at = time.perf_counter()
+
+
+class SearchWorkerPool:
+    """Runs ``search(address, keyword, **job.context) -> str`` jobs on
+    background threads and sends each result with ``sender``. Workers are
+    started on first submit."""
+
+    def __init__(self, search, sender, workers=4, max_queue=1000):
+        self.search = search
+        self.sender = sender
+        self.workers = workers
+        self.jobs = queue.Queue(maxsize=max_queue)
+        self.queue_wait = LatencyRecorder()
+        self.job_latency = LatencyRecorder()
+        self.end_to_end = LatencyRecorder()
+        self.submitted = 0
+        self.rejected = 0
+        self.failed = 0
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def submit(self, job):
+        """Enqueues ``job``; returns False if the queue is full so the caller
+        can fall back to answering synchronously."""
+        self._ensure_started()
+        try:
+            self.jobs.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            return False
+        with self._lock:
+            self.submitted += 1
+        return True
+
+    def _ensure_started(self):
+        if self._threads:
+            return
+        with self._lock:
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._run, name=f'search-worker-{len(self._threads)}',
+                                          daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            try:
+                if job is None:
+                    return
+                self._process(job)
+            finally:
+                self.jobs.task_done()
+
+    def _process(self, job):
+        started = time.perf_counter()
+        self.queue_wait.record(started - job.enqueued_at)
+        try:
+            body = self.search(job.address, job.keyword, **job.context)
+            self.sender.send(job.to, body, from_=job.from_)
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+            logging.error(f"An error occurred delivering search results: {str(e)}")
+            self.job_latency.record(time.perf_counter() - started, error=True)
+            return
+        finished = time.perf_counter()
+        self.job_latency.record(finished - started)
+        self.end_to_end.record(finished - job.received_at)
+
+    def join(self):
+        """Blocks until every queued job has been processed."""
+        self.jobs.join()
+
+    def shutdown(self):
+        """Stops the workers once the jobs already queued are done, without
+        waiting for them."""
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            try:
+                self.jobs.put_nowait(None)
+            except queue.Full:
+                # Hand over the stop signal once the workers make room, without blocking the caller.
+                threading.Thread(target=self.jobs.put, args=(None,), daemon=True).start()
+
+    def stats(self):
+        return {
+            'queue_depth': self.jobs.qsize(),
+            'submitted': self.submitted,
+            'rejected': self.rejected,
+            'failed': self.failed,
+            'queue_wait': self.queue_wait.stats(),
+            'job_latency': self.job_latency.stats(),
+            'end_to_end': self.end_to_end.stats(),
+        }
@@ -0,0 +1 @@
+"""Load-test and benchmark harness for the ``/sms`` webhook. Run ``python -m bench --help``."""
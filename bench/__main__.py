@@ -0,0 +1,87 @@
+"""
+Benchmark command line.
+
+    python -m bench run --phones 20 --conversations 10 --latency-ms 80 --output results.json
+    python -m bench run --profile sample --profile-output stacks.txt
+    python -m bench compare baseline.json results.json --threshold 10
+    python -m bench startup --runs 5
+
+``run`` prints a summary and writes machine-readable JSON; ``compare`` exits
+non-zero when any latency, error-rate or throughput metric regresses by
+more than the threshold. ``startup`` measures a cold worker's time to its
+first reply and its peak memory.
+"""
+
+import argparse
+import sys
+
+from bench import report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bench', description='Benchmark the /sms webhook.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='Replay conversations against a fake Google backend')
+    run_parser.add_argument('--phones', type=int, default=10, help='Concurrent simulated phone numbers')
+    run_parser.add_argument('--conversations', type=int, default=5, help='Full conversations per phone')
+    run_parser.add_argument('--seed', type=int, default=1)
+    run_parser.add_argument('--latency-ms', type=float, default=50.0, help='Mean fake Google latency')
+    run_parser.add_argument('--jitter-ms', type=float, default=10.0)
+    run_parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of failed upstream calls')
+    run_parser.add_argument('--error-kind', choices=('500', 'OVER_QUERY_LIMIT'), default='500')
+    run_parser.add_argument('--unique-addresses', action='store_true', help='Never repeat an address')
+    run_parser.add_argument('--url', help='POST to a running server instead of the in-process app')
+    run_parser.add_argument('--fake-port', type=int, default=0, help='Port for the fake Google server')
+    run_parser.add_argument('--async-reply', action='store_true', help='Benchmark ASYNC_REPLY mode')
+    run_parser.add_argument('--place-details', action='store_true', help='Enrich replies with Place Details')
+    run_parser.add_argument('--profile', choices=('sample', 'cprofile'), help='Profile every in-process request')
+    run_parser.add_argument('--profile-output', default='bench_profile.txt',
+                            help='Collapsed stacks (sample) or pstats file (cprofile) for the whole run')
+    run_parser.add_argument('--output', default='bench_results.json', help='Where to write JSON results')
+    run_parser.add_argument('--compare', metavar='BASELINE', help='Compare against a previous results file')
+    run_parser.add_argument('--threshold', type=float, default=10.0, help='Regression threshold in percent')
+
+    compare_parser = commands.add_parser('compare', help='Compare two results files')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('candidate')
+    compare_parser.add_argument('--threshold', type=float, default=10.0, help='Regression threshold in percent')
+
+    startup_parser = commands.add_parser('startup', help='Measure cold-start time and memory')
+    startup_parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters to start')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'startup':
+        from bench.startup import format_startup, measure
+
+        print(format_startup(measure(args.runs)))
+        return 0
+
+    if args.command == 'run':
+        from bench.runner import run
+
+        results = run(phones=args.phones, conversations=args.conversations, seed=args.seed,
+                      latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+                      error_kind=args.error_kind, unique_addresses=args.unique_addresses, url=args.url,
+                      fake_port=args.fake_port, async_reply=args.async_reply,
+                      place_details=args.place_details, profile=args.profile, profile_output=args.profile_output)
+        print(report.format_results(results))
+        report.save(results, args.output)
+        print(f'\nResults written to {args.output}')
+        if args.profile:
+            print(f"{results['profile']['profiles']} request profiles merged into {args.profile_output}")
+        if not args.compare:
+            return 0
+        baseline, candidate = report.load(args.compare), results
+    else:
+        baseline, candidate = report.load(args.baseline), report.load(args.candidate)
+
+    rows, regressions = report.compare(baseline, candidate, args.threshold)
+    print()
+    print(report.format_comparison(rows, args.threshold))
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Conversation generator for the ``/sms`` benchmark.
+
+Each simulated phone number walks the full ``UserState`` flow:
+keyword -> address -> yes -> new business -> new address -> no. Keywords and
+addresses are drawn from small pools by default so caches see realistic
+repeat traffic; ``unique_addresses`` makes every address distinct.
+"""
+
+import random
+import threading
+import time
+
+KEYWORDS = ('pizza', 'coffee', 'grocery', 'pharmacy', 'tacos', 'gym', 'bakery', 'hardware store')
+STREETS = ('Main St', 'Oak Ave', 'Elm St', 'Pine Rd', 'Maple Dr', 'Cedar Ln')
+CITIES = ('Springfield IL', 'Austin TX', 'Portland OR', 'Denver CO')
+
+STEPS = ('keyword', 'address', 'yes', 'new_business', 'new_address', 'no')
+
+
+def random_address(rng, unique=False, serial=0):
+    number = serial + 1 if unique else rng.randint(1, 40)
+    return f'{number} {rng.choice(STREETS)} {rng.choice(CITIES)}'
+
+
+def conversation(rng, unique_addresses=False, serial=0):
+    """Returns the ``(step, body)`` messages of one full conversation."""
+    return [
+        ('keyword', rng.choice(KEYWORDS)),
+        ('address', random_address(rng, unique_addresses, serial * 2)),
+        ('yes', 'yes'),
+        ('new_business', rng.choice(KEYWORDS)),
+        ('new_address', random_address(rng, unique_addresses, serial * 2 + 1)),
+        ('no', 'no'),
+    ]
+
+
+class InProcessTarget:
+    """Posts webhooks straight into the Flask app with its test client."""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def post(self, form, headers=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.post('/sms', data=form, headers=headers or {})
+        return response.status_code, response.get_data(as_text=True)
+
+
+class HttpTarget:
+    """Posts webhooks to a running server, e.g. gunicorn."""
+
+    def __init__(self, url):
+        import requests
+
+        self.url = url
+        self._local = threading.local()
+        self._requests = requests
+
+    def post(self, form, headers=None):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self._requests.Session()
+        response = session.post(self.url, data=form, headers=headers or {}, timeout=30)
+        return response.status_code, response.text
+
+
+def drive_phone(target, phone, conversations, rng, record, unique_addresses=False, serial_base=0,
+                to='+15005550006', headers=None):
+    """Runs ``conversations`` full conversations for one phone number and
+    calls ``record(step, seconds, ok, body)`` for every message."""
+    for serial in range(serial_base, serial_base + conversations):
+        for step, body in conversation(rng, unique_addresses, serial):
+            form = {'From': phone, 'To': to, 'Body': body, 'MessageSid': f'SM{rng.getrandbits(128):032x}'}
+            start = time.perf_counter()
+            try:
+                status, text = target.post(form, headers)
+                ok = status == 200 and 'An error occurred' not in text
+            except Exception as e:
+                text = str(e)
+                ok = False
+            record(step, time.perf_counter() - start, ok, text)
+
+
+def seeded_rng(seed, phone_index):
+    return random.Random(seed * 1000003 + phone_index)
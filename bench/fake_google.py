@@ -0,0 +1,205 @@
+"""
+Local stand-in for the Google Geocoding, Places Nearby Search and Place
+Details endpoints.
+
+Responses are deterministic functions of the request so repeated runs are
+comparable: an address always geocodes to the same point and a location plus
+keyword always yields the same page of businesses around it. Latency and
+error injection are configurable per server.
+"""
+
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+GEOCODE_PATH = '/maps/api/geocode/json'
+NEARBY_SEARCH_PATH = '/maps/api/place/nearbysearch/json'
+DETAILS_PATH = '/maps/api/place/details/json'
+
+
+def _seed(*parts):
+    return int(hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()[:12], 16)
+
+
+def geocode_response(address):
+    rng = random.Random(_seed('geocode', address))
+    if address.strip().lower() in ('', 'nowhere'):
+        return {'status': 'ZERO_RESULTS', 'results': []}
+    lat = round(rng.uniform(25.0, 49.0), 7)
+    lng = round(rng.uniform(-124.0, -67.0), 7)
+    return {'status': 'OK', 'results': [{
+        'formatted_address': address,
+        'geometry': {'location': {'lat': lat, 'lng': lng}},
+    }]}
+
+
+def nearby_search_response(location, keyword, radius, page_size=20):
+    rng = random.Random(_seed('places', location, keyword, radius))
+    lat, lng = (float(part) for part in location.split(','))
+    spread = float(radius) / 111320.0
+    results = []
+    for i in range(page_size):
+        result = {
+            'place_id': f'fake-{_seed(location, keyword, str(i)):x}',
+            'name': f'{keyword.title()} Place {i + 1}',
+            'vicinity': f'{rng.randint(1, 9999)} {rng.choice(["Main", "Oak", "Elm", "Pine"])} St',
+            'geometry': {'location': {'lat': lat + rng.uniform(-spread, spread) / 2,
+                                      'lng': lng + rng.uniform(-spread, spread) / 2}},
+            'rating': round(rng.uniform(2.5, 5.0), 1),
+            'user_ratings_total': rng.randint(0, 2000),
+        }
+        if rng.random() < 0.8:
+            result['opening_hours'] = {'open_now': rng.random() < 0.7}
+        results.append(result)
+    return {'status': 'OK', 'results': results}
+
+
+def details_response(place_id):
+    rng = random.Random(_seed('details', place_id))
+    result = {'formatted_phone_number': f'({rng.randint(200, 999)}) 555-{rng.randint(0, 9999):04d}',
+              'utc_offset': -300}
+    if rng.random() < 0.8:
+        opens, closes = rng.randint(6, 11), rng.randint(5, 11)
+        result['opening_hours'] = {'weekday_text': [f'{day}: {opens}:00 AM \u2013 {closes}:00 PM' for day in (
+            'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')]}
+    return {'status': 'OK', 'result': result}
+
+
+class FakeGoogleServer:
+    """Threaded HTTP server answering the geocode, nearbysearch and details paths.
+
+    ``latency_ms`` is the mean added delay with ``jitter_ms`` of uniform
+    spread; ``error_rate`` is the fraction of requests answered with
+    ``error_kind`` ('500' or 'OVER_QUERY_LIMIT')."""
+
+    def __init__(self, host='127.0.0.1', port=0, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0,
+                 error_kind='500', seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_kind = error_kind
+        self.requests = {GEOCODE_PATH: 0, NEARBY_SEARCH_PATH: 0, DETAILS_PATH: 0}
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def geocode_url(self):
+        return self.base_url + GEOCODE_PATH
+
+    @property
+    def places_url(self):
+        return self.base_url + NEARBY_SEARCH_PATH
+
+    @property
+    def details_url(self):
+        return self.base_url + DETAILS_PATH
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-google', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _draw(self):
+        with self._lock:
+            delay = max(0.0, self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            fail = self._rng.random() < self.error_rate
+        return delay, fail
+
+    def respond(self, path, query):
+        """Returns ``(http_status, payload)`` for a request."""
+        delay, fail = self._draw()
+        if delay:
+            time.sleep(delay)
+        with self._lock:
+            if path in self.requests:
+                self.requests[path] += 1
+            if fail:
+                self.errors += 1
+        if fail:
+            if self.error_kind == 'OVER_QUERY_LIMIT':
+                return 200, {'status': 'OVER_QUERY_LIMIT', 'results': []}
+            return 500, {'status': 'UNKNOWN_ERROR', 'results': []}
+
+        params = {key: values[0] for key, values in parse_qs(query).items()}
+        if path == GEOCODE_PATH:
+            return 200, geocode_response(params.get('address', ''))
+        if path == NEARBY_SEARCH_PATH:
+            return 200, nearby_search_response(params.get('location', '0,0'), params.get('keyword', ''),
+                                               params.get('radius', '8047'))
+        if path == DETAILS_PATH:
+            return 200, details_response(params.get('place_id', ''))
+        return 404, {'status': 'NOT_FOUND'}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                status, payload = server.respond(parts.path, parts.query)
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def stats(self):
+        return {'requests': dict(self.requests), 'errors': self.errors}
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Serve fake Google geocode, nearbysearch and details endpoints.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-kind', choices=('500', 'OVER_QUERY_LIMIT'), default='500')
+    args = parser.parse_args()
+
+    server = FakeGoogleServer(args.host, args.port, args.latency_ms, args.jitter_ms, args.error_rate,
+                              args.error_kind)
+    print(f'GEOCODE_API_URL={server.geocode_url}')
+    print(f'PLACES_API_URL={server.places_url}')
+    print(f'PLACE_DETAILS_API_URL={server.details_url}')
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
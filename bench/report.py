@@ -0,0 +1,105 @@
+"""
+Result summaries and run-to-run comparison for the ``/sms`` benchmark.
+"""
+
+import json
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(sorted_samples, pct):
+    if not sorted_samples:
+        return None
+    index = min(len(sorted_samples) - 1, int(round(pct / 100 * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+def summarize(samples):
+    """Latency summary in milliseconds for a list of seconds."""
+    ordered = sorted(samples)
+    summary = {'count': len(ordered)}
+    if ordered:
+        summary['mean_ms'] = sum(ordered) / len(ordered) * 1000
+        summary['max_ms'] = ordered[-1] * 1000
+        for pct in PERCENTILES:
+            summary[f'p{pct}_ms'] = percentile(ordered, pct) * 1000
+    return summary
+
+
+def save(results, path):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _metrics(results):
+    """Flattens the comparable numbers of a run; ``higher_is_better`` marks
+    throughput-style metrics."""
+    metrics = {'throughput_rps': (results['throughput_rps'], True),
+               'error_rate': (results['error_rate'], False)}
+    for scope, summary in [('overall', results['overall'])] + sorted(results['steps'].items()):
+        for pct in PERCENTILES:
+            value = summary.get(f'p{pct}_ms')
+            if value is not None:
+                metrics[f'{scope}.p{pct}_ms'] = (value, False)
+    memory = results.get('memory', {})
+    if 'session_bytes_growth' in memory:
+        metrics['memory.session_bytes_growth'] = (memory['session_bytes_growth'], False)
+    return metrics
+
+
+def compare(baseline, candidate, threshold_pct=10.0):
+    """Returns ``(rows, regressions)`` where each row is
+    ``(metric, baseline, candidate, change_pct, regressed)``."""
+    base_metrics = _metrics(baseline)
+    rows = []
+    regressions = []
+    for name, (value, higher_is_better) in _metrics(candidate).items():
+        if name not in base_metrics:
+            continue
+        base_value = base_metrics[name][0]
+        if base_value:
+            change = (value - base_value) / abs(base_value) * 100
+        else:
+            change = 0.0 if not value else float('inf')
+        worse = -change if higher_is_better else change
+        regressed = worse > threshold_pct
+        rows.append((name, base_value, value, change, regressed))
+        if regressed:
+            regressions.append(name)
+    return rows, regressions
+
+
+def format_results(results):
+    lines = [
+        f"{results['requests']} requests, {results['conversations']} conversations "
+        f"in {results['duration_seconds']:.2f}s",
+        f"throughput: {results['throughput_rps']:.1f} req/s, error rate: {results['error_rate']:.2%}",
+        '',
+        f"{'step':<14}{'count':>8}{'p50 ms':>10}{'p90 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}",
+    ]
+    for scope, summary in list(results['steps'].items()) + [('overall', results['overall'])]:
+        if not summary['count']:
+            continue
+        lines.append(f"{scope:<14}{summary['count']:>8}{summary['p50_ms']:>10.2f}{summary['p90_ms']:>10.2f}"
+                     f"{summary['p95_ms']:>10.2f}{summary['p99_ms']:>10.2f}{summary['max_ms']:>10.2f}")
+    memory = results.get('memory', {})
+    if memory:
+        lines.append('')
+        lines.append(f"sessions: {memory.get('sessions_after')} active, "
+                     f"{memory.get('session_bytes_growth')} bytes of session state added, "
+                     f"max RSS {memory.get('max_rss_kb')} KB")
+    return '\n'.join(lines)
+
+
+def format_comparison(rows, threshold_pct):
+    lines = [f"{'metric':<32}{'baseline':>12}{'candidate':>12}{'change':>10}"]
+    for name, base_value, value, change, regressed in rows:
+        flag = '  REGRESSION' if regressed else ''
+        lines.append(f'{name:<32}{base_value:>12.2f}{value:>12.2f}{change:>9.1f}%{flag}')
+    lines.append(f'(regression threshold: {threshold_pct:.0f}%)')
+    return '\n'.join(lines)
@@ -0,0 +1,194 @@
+"""
+Replays full SMS conversations against the app with Google replaced by a
+local ``FakeGoogleServer`` and collects throughput, per-step latency and
+session memory growth. With ``profile`` every in-process request is also
+profiled and the profiles of the run are merged into one file.
+"""
+
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench.conversations import STEPS, HttpTarget, InProcessTarget, drive_phone, seeded_rng
+from bench.fake_google import FakeGoogleServer
+from bench.report import summarize
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+_PATCHED_COMPONENTS = ('geocode_api_url', 'places_url', 'place_details_url', 'async_reply_enabled',
+                       'place_details_enabled', 'profiler', 'geocode_cache')
+
+
+def load_app(fake_google, async_reply=False, place_details=False):
+    """Imports ``main`` pointed at the fake server, with the geocode cache's
+    on-disk tier in a temporary directory rather than the configured file.
+
+    Environment is set before ``main`` first configures itself; the
+    components are also patched in case it already has. Returns the module
+    and a callable that restores what was patched."""
+    os.environ.setdefault('API_KEY', 'benchmark')
+    os.environ['GEOCODE_API_URL'] = fake_google.geocode_url
+    os.environ['PLACES_API_URL'] = fake_google.places_url
+    os.environ['PLACE_DETAILS_API_URL'] = fake_google.details_url
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+
+    import main
+    from async_reply import InMemorySender
+    from geocode_cache import GeocodeCache
+
+    components = main.components
+    saved = {name: getattr(components, name) for name in _PATCHED_COMPONENTS}
+    saved_sender = components.search_workers.sender
+    cache_dir = tempfile.TemporaryDirectory(prefix='bench-geocode-')
+    geocode_cache = GeocodeCache(max_size=components.settings.geocode_cache_size,
+                                 ttl=components.settings.geocode_cache_ttl,
+                                 negative_ttl=components.settings.geocode_cache_negative_ttl,
+                                 path=os.path.join(cache_dir.name, 'geocode_cache.sqlite3'))
+
+    def restore():
+        for name, value in saved.items():
+            setattr(components, name, value)
+        components.search_workers.sender = saved_sender
+        components.http_client.session.close()
+        geocode_cache.close()
+        cache_dir.cleanup()
+
+    components.geocode_api_url = fake_google.geocode_url
+    components.places_url = fake_google.places_url
+    components.place_details_url = fake_google.details_url
+    components.async_reply_enabled = async_reply
+    components.place_details_enabled = place_details
+    components.geocode_cache = geocode_cache
+    components.search_workers.sender = InMemorySender()
+    return main, restore
+
+
+def run(phones=10, conversations=5, seed=1, latency_ms=50.0, jitter_ms=10.0, error_rate=0.0,
+        error_kind='500', unique_addresses=False, url=None, fake_port=0, async_reply=False, clear_caches=True,
+        headers=None, place_details=False, profile=None, profile_output='bench_profile.txt'):
+    """Runs the benchmark and returns a JSON-serializable result dict.
+
+    With ``url`` the conversations are posted to a running server, which must
+    be started with GEOCODE_API_URL/PLACES_API_URL pointing at the fake
+    server on ``fake_port``; session memory is then not measured. With
+    ``place_details`` replies are enriched with Place Details. With
+    ``profile`` ('sample' or 'cprofile') in-process requests are profiled and
+    written to ``profile_output`` as collapsed stacks or a pstats file."""
+    with FakeGoogleServer(port=fake_port, latency_ms=latency_ms, jitter_ms=jitter_ms, error_rate=error_rate,
+                          error_kind=error_kind, seed=seed) as fake_google:
+        main, restore = load_app(fake_google, async_reply=async_reply, place_details=place_details)
+        profiles = []
+        if profile:
+            from profiling import RequestProfiler
+
+            main.components.profiler = RequestProfiler(size=1, sample_rate=1.0, default_mode=profile,
+                                                       interval=main.components.settings.profile_interval,
+                                                       sink=profiles.append)
+        try:
+            results = _run(main, fake_google, phones, conversations, seed, latency_ms, jitter_ms, error_rate,
+                           error_kind, unique_addresses, url, async_reply, clear_caches, headers, place_details)
+            if profile:
+                results['profile'] = save_profiles(profiles, profile, profile_output)
+            return results
+        finally:
+            if clear_caches:
+                main.components.geocode_cache.clear()
+                main.components.places_cache.clear()
+                main.components.details_enricher.cache.clear()
+            restore()
+
+
+def save_profiles(profiles, mode, path):
+    """Merges the run's profiles into ``path``. In cprofile mode, requests
+    that overlapped one already being profiled were sampled instead and are
+    left out."""
+    import pstats
+
+    from profiling import CPROFILE, merge_collapsed
+
+    merged = [profile for profile in profiles if profile.mode == mode]
+    if mode == CPROFILE:
+        if merged:
+            stats = pstats.Stats(merged[0].profiler)
+            for profile in merged[1:]:
+                stats.add(profile.profiler)
+            stats.dump_stats(path)
+    else:
+        with open(path, 'w') as f:
+            f.write(merge_collapsed(merged))
+    return {'mode': mode, 'profiles': len(merged), 'skipped': len(profiles) - len(merged), 'output': path}
+
+
+def _run(main, fake_google, phones, conversations, seed, latency_ms, jitter_ms, error_rate, error_kind,
+         unique_addresses, url, async_reply, clear_caches, headers, place_details):
+    if clear_caches:
+        main.components.geocode_cache.clear()
+        main.components.places_cache.clear()
+        main.components.details_enricher.cache.clear()
+    target = HttpTarget(url) if url else InProcessTarget(main.app)
+
+    samples = {step: [] for step in STEPS}
+    errors = {step: 0 for step in STEPS}
+    lock = threading.Lock()
+
+    def record(step, seconds, ok, body):
+        with lock:
+            samples[step].append(seconds)
+            if not ok:
+                errors[step] += 1
+
+    sessions_before = main.components.session_store.stats()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=phones) as pool:
+        futures = [
+            pool.submit(drive_phone, target, f'+1555{index:07d}', conversations, seeded_rng(seed, index),
+                        record, unique_addresses, index * conversations, headers=headers)
+            for index in range(phones)
+        ]
+        for future in futures:
+            future.result()
+    if async_reply:
+        main.components.search_workers.join()
+    duration = time.perf_counter() - start
+    sessions_after = main.components.session_store.stats()
+
+    requests_made = sum(len(values) for values in samples.values())
+    error_count = sum(errors.values())
+    results = {
+        'config': {
+            'phones': phones, 'conversations': conversations, 'seed': seed, 'latency_ms': latency_ms,
+            'jitter_ms': jitter_ms, 'error_rate': error_rate, 'error_kind': error_kind,
+            'unique_addresses': unique_addresses, 'target': url or 'in-process', 'async_reply': async_reply,
+            'place_details': place_details,
+        },
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'duration_seconds': duration,
+        'requests': requests_made,
+        'conversations': phones * conversations,
+        'throughput_rps': requests_made / duration if duration else 0.0,
+        'error_rate': error_count / requests_made if requests_made else 0.0,
+        'errors': errors,
+        'steps': {step: summarize(values) for step, values in samples.items()},
+        'overall': summarize([value for values in samples.values() for value in values]),
+        'upstream': fake_google.stats(),
+    }
+    if not url:
+        results['memory'] = {
+            'sessions_before': sessions_before['active_sessions'],
+            'sessions_after': sessions_after['active_sessions'],
+            'session_bytes_growth': sessions_after['approx_bytes'] - sessions_before['approx_bytes'],
+            'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        }
+        results['caches'] = {'geocode': main.components.geocode_cache.stats(),
+                             'places': main.components.places_cache.stats()}
+        if place_details:
+            results['caches']['place_details'] = main.components.details_enricher.stats()
+    if async_reply:
+        results['async_reply'] = main.components.search_workers.stats()
+    return results
@@ -0,0 +1,44 @@
+"""
+Cold-start measurement for the ``/sms`` app.
+
+Each run starts a fresh interpreter, imports ``main``, builds the app with
+``create_app`` and posts one first message to it in process. The child
+reports the import time, the time until that first reply and its peak RSS.
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_CHILD = '''
+import json, resource, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+client = main.create_app().test_client()
+client.post('/sms', data={'From': '+15550000001', 'Body': 'pizza'})
+replied = time.perf_counter()
+print(json.dumps({'import_ms': (imported - start) * 1000, 'first_request_ms': (replied - start) * 1000,
+                  'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+'''
+
+
+def measure_once(python=sys.executable):
+    env = dict(os.environ, GEOCODE_CACHE_PATH='', CACHE_SNAPSHOT_PATH='', LOG_LEVEL='WARNING')
+    output = subprocess.run([python, '-c', _CHILD], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def measure(runs=5, python=sys.executable):
+    """Median of each figure over ``runs`` fresh interpreters."""
+    samples = [measure_once(python) for _ in range(runs)]
+    return {name: statistics.median(sample[name] for sample in samples) for name in samples[0]} | {'runs': runs}
+
+
+def format_startup(results):
+    return (f"import {results['import_ms']:.0f} ms, first reply {results['first_request_ms']:.0f} ms, "
+            f"peak RSS {results['max_rss_kb'] / 1024:.1f} MB (median of {results['runs']} runs)")
@@ -0,0 +1,257 @@
+"""
+Bulk search over a JSONL file of queries
+
+Each input line is a JSON object with ``keyword`` and ``address`` and an
+optional ``id``. Lines are read lazily and run on a bounded thread pool with at
+most ``window`` queries in flight, so memory stays flat however large the input
+is. Results are written as JSONL, either in input order or in completion order.
+A ``--rate`` limit caps how many queries start per second across all workers.
+Queries wait for Google API quota as long as it takes, rather than the web
+app's ``QUOTA_MAX_WAIT``, unless ``--quota-max-wait`` bounds the wait.
+
+With ``--checkpoint`` the lines already written, and the output size at that
+point, are recorded periodically after the output is flushed. ``--resume``
+truncates the output back to that size, so nothing is written twice, and
+skips the recorded lines, so an interrupted run picks up where it stopped.
+
+    python bulk_search.py queries.jsonl results.jsonl --workers 16 --rate 20 --checkpoint results.ckpt
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from constants import NUM_RESULTS
+from rate_limit import TokenBucket
+
+RESULT_FIELDS = ('place_id', 'name', 'vicinity', 'rating', 'user_ratings_total', 'opening_hours')
+
+
+def read_queries(lines):
+    """Yields ``(line_number, query, error)`` for each non-blank line; ``query``
+    is None and ``error`` set when the line is not a usable query."""
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            query = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f"Invalid JSON: {str(e)}"
+            continue
+        if not isinstance(query, dict) or not query.get('keyword') or not query.get('address'):
+            yield line_number, None, "Query needs 'keyword' and 'address'"
+            continue
+        yield line_number, query, None
+
+
+def configure_app(quota_max_wait=None):
+    """Configures the app from the environment for a batch run, waiting at
+    most ``quota_max_wait`` seconds for API quota (None: no limit) instead
+    of falling back to stale or local results."""
+    import main
+    from config import Config
+
+    main.configure(Config.from_env(quota_max_wait=quota_max_wait))
+
+
+def search_query(keyword, address):
+    """Geocodes ``address`` and runs the Places search through the app's
+    caches, coalescing and backends. Returns ``(location, results)``."""
+    import main
+
+    main.configure()
+    location = main.geocode(address)
+    if location is None:
+        raise ValueError("Geocoding was not successful")
+    return location, main.fetch_places(location, keyword)
+
+
+class Checkpoint:
+    """Tracks written lines as a low-water mark plus the few lines above it
+    that finished early, and the output size they correspond to. Saved
+    atomically every ``every`` marks."""
+
+    def __init__(self, path, every=100):
+        self.path = path
+        self.every = every
+        self.next_line = 1
+        self.done = set()
+        self.output_offset = 0
+        self._unsaved = 0
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                state = json.load(f)
+            self.next_line = state['next_line']
+            self.done = set(state['done'])
+            self.output_offset = state['output_offset']
+        return self
+
+    def is_done(self, line_number):
+        return line_number < self.next_line or line_number in self.done
+
+    def mark(self, line_number):
+        self.done.add(line_number)
+        while self.next_line in self.done:
+            self.done.remove(self.next_line)
+            self.next_line += 1
+        self._unsaved += 1
+
+    def due(self):
+        return self._unsaved >= self.every
+
+    def save(self, output_offset=None):
+        if output_offset is not None:
+            self.output_offset = output_offset
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'next_line': self.next_line, 'done': sorted(self.done),
+                       'output_offset': self.output_offset}, f)
+        os.replace(tmp_path, self.path)
+        self._unsaved = 0
+
+
+class BulkSearch:
+    def __init__(self, search=search_query, workers=8, window=None, rate=None, ordered=True,
+                 max_results=NUM_RESULTS):
+        self.search = search
+        self.workers = workers
+        self.window = window or workers * 2
+        self.limiter = TokenBucket(rate) if rate else None
+        self.ordered = ordered
+        self.max_results = max_results
+
+    def run_one(self, line_number, query, error):
+        result = {'line': line_number}
+        if query is not None:
+            result.update(id=query.get('id'), keyword=query['keyword'], address=query['address'])
+        if error is not None:
+            result['error'] = error
+            return result
+        if self.limiter is not None:
+            self.limiter.acquire()
+        try:
+            location, places = self.search(query['keyword'], query['address'])
+        except Exception as e:
+            result['error'] = str(e)
+            return result
+        result['location'] = location
+        result['results'] = [{field: place[field] for field in RESULT_FIELDS if field in place}
+                             for place in places[:self.max_results]]
+        return result
+
+    def run(self, queries, out, checkpoint=None):
+        """Runs every query from ``read_queries`` and writes one JSON line per
+        query to ``out``. Returns counts of ok, failed and skipped queries."""
+        stats = {'ok': 0, 'errors': 0, 'skipped': 0}
+        started = time.perf_counter()
+
+        def write(result):
+            out.write(json.dumps(result) + '\n')
+            stats['errors' if 'error' in result else 'ok'] += 1
+            if checkpoint is not None:
+                checkpoint.mark(result['line'])
+                if checkpoint.due():
+                    out.flush()
+                    checkpoint.save(_offset(out))
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            pending = deque() if self.ordered else set()
+            for line_number, query, error in queries:
+                if checkpoint is not None and checkpoint.is_done(line_number):
+                    stats['skipped'] += 1
+                    continue
+                if len(pending) >= self.window:
+                    self._drain(pending, write, block_all=False)
+                future = pool.submit(self.run_one, line_number, query, error)
+                if self.ordered:
+                    pending.append(future)
+                else:
+                    pending.add(future)
+            self._drain(pending, write, block_all=True)
+
+        out.flush()
+        if checkpoint is not None:
+            checkpoint.save(_offset(out))
+        stats['seconds'] = time.perf_counter() - started
+        return stats
+
+    def _drain(self, pending, write, block_all):
+        if self.ordered:
+            # Write the oldest query first, even if later ones are done.
+            while pending:
+                write(pending.popleft().result())
+                if not block_all:
+                    return
+            return
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.remove(future)
+                write(future.result())
+            if not block_all:
+                return
+
+
+def _offset(out):
+    return out.tell() if out.seekable() else None
+
+
+def open_output(path, checkpoint=None):
+    """Opens ``path`` for writing, or when resuming from ``checkpoint``
+    truncates it to the checkpointed size and positions at the end."""
+    if checkpoint is None or not os.path.exists(path):
+        return open(path, 'w')
+    out = open(path, 'r+')
+    out.truncate(checkpoint.output_offset)
+    out.seek(checkpoint.output_offset)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run geocode and nearby searches for a JSONL file of queries.')
+    parser.add_argument('input', help="JSONL file of {\"keyword\": ..., \"address\": ...} queries, or - for stdin")
+    parser.add_argument('output', nargs='?', default='-', help='JSONL results file, or - for stdout')
+    parser.add_argument('--workers', type=int, default=8, help='Concurrent queries')
+    parser.add_argument('--window', type=int, default=None,
+                        help='Queries read ahead of the output (default 2x workers)')
+    parser.add_argument('--rate', type=float, default=None, help='Maximum queries started per second')
+    parser.add_argument('--order', choices=('input', 'completion'), default='input', help='Output order')
+    parser.add_argument('--quota-max-wait', type=float, default=None,
+                        help='Seconds a query waits for API quota before degrading (default: no limit)')
+    parser.add_argument('--max-results', type=int, default=NUM_RESULTS, help='Places kept per query')
+    parser.add_argument('--checkpoint', help='Checkpoint file recording finished lines')
+    parser.add_argument('--resume', action='store_true', help='Continue an interrupted run from --checkpoint')
+    args = parser.parse_args()
+
+    checkpoint = None
+    if args.checkpoint:
+        checkpoint = Checkpoint(args.checkpoint)
+        if args.resume:
+            checkpoint.load()
+    elif args.resume:
+        parser.error('--resume needs --checkpoint')
+
+    configure_app(args.quota_max_wait)
+    bulk = BulkSearch(workers=args.workers, window=args.window, rate=args.rate, ordered=args.order == 'input',
+                      max_results=args.max_results)
+    source = sys.stdin if args.input == '-' else open(args.input)
+    out = sys.stdout if args.output == '-' else open_output(args.output, checkpoint if args.resume else None)
+    try:
+        stats = bulk.run(read_queries(source), out, checkpoint)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+    print(f"{stats['ok']} ok, {stats['errors']} failed, {stats['skipped']} skipped "
+          f"in {stats['seconds']:.1f}s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
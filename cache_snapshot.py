@@ -0,0 +1,56 @@
+"""
+Warm-cache snapshot
+
+A new worker starts with empty in-memory caches, so its first requests all go
+to Google. On graceful shutdown ``save`` writes the most recently used geocode
+and Places entries to a JSON file; on start ``load`` puts them back with the
+TTL they had left, less the time the file sat on disk. Entries past their TTL
+but within the Places ``stale_ttl`` are kept too, for quota and outage
+fallbacks.
+
+Several workers may save at once; each writes a temporary file and renames it
+over the snapshot, so readers never see a partial file.
+"""
+
+import json
+import logging
+import os
+import time
+
+VERSION = 1
+
+
+def save(path, geocode_cache, places_cache, limit=500, clock=time.time):
+    """Writes the snapshot and returns the number of entries saved."""
+    snapshot = {
+        'version': VERSION,
+        'saved_at': clock(),
+        'geocode': geocode_cache.snapshot(limit),
+        'places': places_cache.snapshot(limit),
+    }
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+    return len(snapshot['geocode']) + len(snapshot['places'])
+
+
+def load(path, geocode_cache, places_cache, clock=time.time):
+    """Restores a snapshot written by ``save`` and returns the number of
+    entries loaded. A missing or unreadable file loads nothing."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            snapshot = json.load(f)
+    except FileNotFoundError:
+        return 0
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable cache snapshot {path}: {str(e)}")
+        return 0
+    if snapshot.get('version') != VERSION:
+        return 0
+    age = max(0.0, clock() - snapshot['saved_at'])
+    geocode = [(key, value, ttl - age) for key, value, ttl in snapshot['geocode']]
+    places = [(key, value, ttl - age) for key, value, ttl in snapshot['places']]
+    geocode_cache.restore(geocode)
+    places_cache.restore(places)
+    return len(geocode) + len(places)
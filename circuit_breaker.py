@@ -0,0 +1,122 @@
+"""
+Per-endpoint circuit breaker
+
+Tracks outcomes of recent upstream calls in a rolling time window. When
+enough calls have been seen and the share that failed, or that took longer
+than ``slow_call_seconds``, crosses its threshold, the breaker opens. While
+open, ``before_call`` raises ``CircuitOpen`` at once instead of letting every
+request wait for the same failure, and callers fall back to cached or local
+answers. After ``open_seconds`` the breaker is half-open and lets a few trial
+calls through. A successful trial closes it; a failed one opens it again.
+"""
+
+import threading
+import time
+from collections import deque
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpen(Exception):
+    def __init__(self, name):
+        self.name = name
+        super().__init__(f"Google {name} is unavailable, please try again shortly")
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_rate=0.5, slow_call_seconds=3.0, slow_call_rate=0.8, window_seconds=30,
+                 min_calls=10, open_seconds=15, half_open_calls=1, clock=time.monotonic):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.clock = clock
+        self.state = CLOSED
+        self.transitions = {}
+        self.rejected = 0
+        self._calls = deque()
+        self._failures = 0
+        self._slow = 0
+        self._opened_at = 0.0
+        self._trials = 0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raises ``CircuitOpen`` unless a call may go upstream now. Every
+        permitted call must be followed by ``record`` or ``cancel``."""
+        with self._lock:
+            if self.state == OPEN:
+                if self.clock() - self._opened_at < self.open_seconds:
+                    self.rejected += 1
+                    raise CircuitOpen(self.name)
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._trials >= self.half_open_calls:
+                    self.rejected += 1
+                    raise CircuitOpen(self.name)
+                self._trials += 1
+
+    def cancel(self):
+        """Returns a permit from ``before_call`` that was not used."""
+        with self._lock:
+            if self.state == HALF_OPEN and self._trials:
+                self._trials -= 1
+
+    def record(self, success, seconds):
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._trials = max(0, self._trials - 1)
+                if success and seconds < self.slow_call_seconds:
+                    self._transition(CLOSED)
+                else:
+                    self._transition(OPEN)
+                return
+            if self.state == OPEN:
+                return
+            now = self.clock()
+            failed = not success
+            slow = seconds >= self.slow_call_seconds
+            self._calls.append((now, failed, slow))
+            self._failures += failed
+            self._slow += slow
+            self._expire(now)
+            calls = len(self._calls)
+            if calls >= self.min_calls and (self._failures / calls >= self.failure_rate
+                                            or self._slow / calls >= self.slow_call_rate):
+                self._transition(OPEN)
+
+    def _expire(self, now):
+        while self._calls and self._calls[0][0] <= now - self.window_seconds:
+            _, failed, slow = self._calls.popleft()
+            self._failures -= failed
+            self._slow -= slow
+
+    def _transition(self, state):
+        key = (self.state, state)
+        self.transitions[key] = self.transitions.get(key, 0) + 1
+        self.state = state
+        self._trials = 0
+        if state == OPEN:
+            self._opened_at = self.clock()
+        elif state == CLOSED:
+            self._calls.clear()
+            self._failures = 0
+            self._slow = 0
+
+    def stats(self):
+        with self._lock:
+            calls = len(self._calls)
+            return {
+                'state': self.state,
+                'calls_in_window': calls,
+                'failure_rate': self._failures / calls if calls else 0.0,
+                'slow_call_rate': self._slow / calls if calls else 0.0,
+                'rejected': self.rejected,
+                'transitions': {f'{old}->{new}': count for (old, new), count in self.transitions.items()},
+            }
@@ -0,0 +1,159 @@
+"""
+Application configuration
+
+``Config`` holds every setting the app reads, typed and with its default from
+constants.py. ``Config.from_env`` loads ``.env`` and overrides each default
+with the environment variable of the same name in upper case, e.g.
+``places_cache_ttl`` from ``PLACES_CACHE_TTL``. Values are converted to the
+field's declared type; booleans accept ``1``/``true``/``yes``.
+
+``main.create_app(config)`` builds the app's components from a ``Config``.
+Without one, ``main.app`` and the first function that needs a component call
+``Config.from_env()`` themselves. The standalone ``send_sms`` scripts still
+read their own variables.
+"""
+
+import os
+from dataclasses import dataclass, fields, replace
+from typing import Optional
+
+from constants import (GEOCODE_API_URL, PLACES_API_URL, PLACE_DETAILS_API_URL, RADIUS_METERS, NUM_RESULTS, FLASK_PORT,
+                       HTTP_POOL_SIZE, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HTTP_MAX_RETRIES, HTTP_HEDGING,
+                       HTTP_HEDGE_RATIO, HTTP_HEDGE_MIN_DELAY, GEOCODE_CACHE_PATH, GEOCODE_CACHE_SIZE,
+                       GEOCODE_CACHE_TTL, GEOCODE_CACHE_NEGATIVE_TTL, PLACES_CACHE_SIZE, PLACES_CACHE_TTL,
+                       PLACES_CACHE_PRECISION, PLACES_CACHE_STALE_TTL, ASYNC_REPLY, ASYNC_REPLY_WORKERS,
+                       ASYNC_REPLY_QUEUE_SIZE, SESSION_STORE, SESSION_DB_PATH, SESSION_TTL, SESSION_MAX_ENTRIES,
+                       PLACES_BACKEND, LOCAL_INDEX_PATH, GAZETTEER_PATH, COALESCE_LOCK_DIR, COALESCE_LOCK_WAIT,
+                       METRICS_SAMPLE_RATE, QUOTA_GEOCODE_QPS, QUOTA_PLACES_QPS, QUOTA_GEOCODE_DAILY,
+                       QUOTA_PLACES_DAILY, QUOTA_MAX_WAIT, QUOTA_TIMEZONE,
+                       BREAKER_FAILURE_RATE, BREAKER_SLOW_CALL_SECONDS, BREAKER_SLOW_CALL_RATE, BREAKER_WINDOW_SECONDS,
+                       BREAKER_MIN_CALLS, BREAKER_OPEN_SECONDS, REQUEST_DEADLINE, DEADLINE_MIN_STAGE, IDEMPOTENCY_TTL,
+                       IDEMPOTENCY_MAX_ENTRIES, IDEMPOTENCY_WAIT, MAX_KEYWORDS, KEYWORD_FANOUT_WORKERS,
+                       ADAPTIVE_RADIUS, RADIUS_TIERS, REPLY_FORMAT, SMS_SEGMENT_BUDGET, LOG_LEVEL, LOG_FORMAT,
+                       LOG_SAMPLE_RATES, LOG_MAX_FIELD_LENGTH, LOG_QUEUE_SIZE, CACHE_SNAPSHOT_PATH,
+                       CACHE_SNAPSHOT_SIZE, PLACE_DETAILS, PLACE_DETAILS_WORKERS, PLACE_DETAILS_BUDGET,
+                       PLACE_DETAILS_CACHE_SIZE, PLACE_DETAILS_CACHE_TTL, QUOTA_DETAILS_QPS, QUOTA_DETAILS_DAILY,
+                       PROFILE_SAMPLE_RATE, PROFILE_MODE, PROFILE_BUFFER_SIZE, PROFILE_INTERVAL)
+
+_TRUE = ('1', 'true', 'yes')
+
+
+@dataclass(frozen=True)
+class Config:
+    api_key: Optional[str] = None
+    twilio_account_sid: Optional[str] = None
+    twilio_auth_token: Optional[str] = None
+    twilio_phone_number: Optional[str] = None
+    admin_token: Optional[str] = None
+
+    geocode_api_url: str = GEOCODE_API_URL
+    places_api_url: str = PLACES_API_URL
+    place_details_api_url: str = PLACE_DETAILS_API_URL
+    radius_meters: int = RADIUS_METERS
+    num_results: int = NUM_RESULTS
+    flask_port: int = FLASK_PORT
+
+    http_pool_size: int = HTTP_POOL_SIZE
+    http_connect_timeout: float = HTTP_CONNECT_TIMEOUT
+    http_read_timeout: float = HTTP_READ_TIMEOUT
+    http_max_retries: int = HTTP_MAX_RETRIES
+    http_hedging: bool = HTTP_HEDGING
+    http_hedge_ratio: float = HTTP_HEDGE_RATIO
+    http_hedge_min_delay: float = HTTP_HEDGE_MIN_DELAY
+
+    geocode_cache_path: str = GEOCODE_CACHE_PATH
+    geocode_cache_size: int = GEOCODE_CACHE_SIZE
+    geocode_cache_ttl: int = GEOCODE_CACHE_TTL
+    geocode_cache_negative_ttl: int = GEOCODE_CACHE_NEGATIVE_TTL
+    places_cache_size: int = PLACES_CACHE_SIZE
+    places_cache_ttl: int = PLACES_CACHE_TTL
+    places_cache_precision: int = PLACES_CACHE_PRECISION
+    places_cache_stale_ttl: int = PLACES_CACHE_STALE_TTL
+    cache_snapshot_path: str = CACHE_SNAPSHOT_PATH
+    cache_snapshot_size: int = CACHE_SNAPSHOT_SIZE
+
+    async_reply: bool = ASYNC_REPLY
+    async_reply_workers: int = ASYNC_REPLY_WORKERS
+    async_reply_queue_size: int = ASYNC_REPLY_QUEUE_SIZE
+    session_store: str = SESSION_STORE
+    session_db_path: str = SESSION_DB_PATH
+    session_ttl: int = SESSION_TTL
+    session_max_entries: int = SESSION_MAX_ENTRIES
+    idempotency_ttl: int = IDEMPOTENCY_TTL
+    idempotency_max_entries: int = IDEMPOTENCY_MAX_ENTRIES
+    idempotency_wait: float = IDEMPOTENCY_WAIT
+
+    places_backend: str = PLACES_BACKEND
+    local_index_path: str = LOCAL_INDEX_PATH
+    gazetteer_path: str = GAZETTEER_PATH
+    coalesce_lock_dir: str = COALESCE_LOCK_DIR
+    coalesce_lock_wait: float = COALESCE_LOCK_WAIT
+    max_keywords: int = MAX_KEYWORDS
+    keyword_fanout_workers: int = KEYWORD_FANOUT_WORKERS
+    adaptive_radius: bool = ADAPTIVE_RADIUS
+    radius_tiers: str = RADIUS_TIERS
+    place_details: bool = PLACE_DETAILS
+    place_details_workers: int = PLACE_DETAILS_WORKERS
+    place_details_budget: float = PLACE_DETAILS_BUDGET
+    place_details_cache_size: int = PLACE_DETAILS_CACHE_SIZE
+    place_details_cache_ttl: int = PLACE_DETAILS_CACHE_TTL
+
+    quota_geocode_qps: float = QUOTA_GEOCODE_QPS
+    quota_places_qps: float = QUOTA_PLACES_QPS
+    quota_geocode_daily: int = QUOTA_GEOCODE_DAILY
+    quota_places_daily: int = QUOTA_PLACES_DAILY
+    quota_details_qps: float = QUOTA_DETAILS_QPS
+    quota_details_daily: int = QUOTA_DETAILS_DAILY
+    quota_max_wait: float = QUOTA_MAX_WAIT
+    quota_timezone: str = QUOTA_TIMEZONE
+    breaker_failure_rate: float = BREAKER_FAILURE_RATE
+    breaker_slow_call_seconds: float = BREAKER_SLOW_CALL_SECONDS
+    breaker_slow_call_rate: float = BREAKER_SLOW_CALL_RATE
+    breaker_window_seconds: float = BREAKER_WINDOW_SECONDS
+    breaker_min_calls: int = BREAKER_MIN_CALLS
+    breaker_open_seconds: float = BREAKER_OPEN_SECONDS
+    request_deadline: float = REQUEST_DEADLINE
+    deadline_min_stage: float = DEADLINE_MIN_STAGE
+
+    reply_format: str = REPLY_FORMAT
+    sms_segment_budget: int = SMS_SEGMENT_BUDGET
+    metrics_sample_rate: float = METRICS_SAMPLE_RATE
+    log_level: str = LOG_LEVEL
+    log_format: str = LOG_FORMAT
+    log_sample_rates: str = LOG_SAMPLE_RATES
+    log_max_field_length: int = LOG_MAX_FIELD_LENGTH
+    log_queue_size: int = LOG_QUEUE_SIZE
+    profile_sample_rate: float = PROFILE_SAMPLE_RATE
+    profile_mode: str = PROFILE_MODE
+    profile_buffer_size: int = PROFILE_BUFFER_SIZE
+    profile_interval: float = PROFILE_INTERVAL
+
+    @classmethod
+    def from_env(cls, environ=None, **overrides):
+        """Builds a config from ``environ`` (default: ``.env`` plus
+        ``os.environ``); keyword arguments take precedence over both."""
+        if environ is None:
+            from dotenv import load_dotenv
+            load_dotenv()
+            environ = os.environ
+        values = {}
+        for field in fields(cls):
+            raw = environ.get(field.name.upper())
+            if raw is not None:
+                values[field.name] = _convert(field.name, raw, field.type)
+        values.update(overrides)
+        return cls(**values)
+
+    def replace(self, **changes):
+        return replace(self, **changes)
+
+
+def _convert(name, raw, kind):
+    if kind is bool:
+        return raw.strip().lower() in _TRUE
+    if kind not in (int, float):
+        return raw
+    try:
+        return kind(raw)
+    except ValueError:
+        raise ValueError(f"{name.upper()}={raw!r} is not a valid {kind.__name__}") from None
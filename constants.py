@@ -1,7 +1,79 @@
 # constants.py
 GEOCODE_API_URL = 'https://maps.googleapis.com/maps/api/geocode/json'
 PLACES_API_URL = 'https://maps.googleapis.com/maps/api/place/nearbysearch/json'
+PLACE_DETAILS_API_URL = 'https://maps.googleapis.com/maps/api/place/details/json'
 RADIUS_METERS = 8047
 NUM_RESULTS = 5
 FLASK_PORT = 8080  # Get port from env variable, default to 8080
 
+GEOCODE_CACHE_PATH = ''  # SQLite file for the on-disk tier, e.g. geocode_cache.sqlite3; empty disables it
+GEOCODE_CACHE_SIZE = 1024
+GEOCODE_CACHE_TTL = 604800  # 7 days
+GEOCODE_CACHE_NEGATIVE_TTL = 300  # ZERO_RESULTS and other failed lookups
+PLACES_CACHE_SIZE = 2048
+PLACES_CACHE_TTL = 300  # Seconds a Nearby Search result page is reused
+PLACES_CACHE_PRECISION = 6  # Geohash length of a cache cell, ~1.2 km x 0.6 km
+PLACES_CACHE_STALE_TTL = 3600  # Expired results still served when the Places quota is exhausted
+HTTP_POOL_SIZE = 10  # Keep-alive connections per host
+HTTP_CONNECT_TIMEOUT = 3.05
+HTTP_READ_TIMEOUT = 5.0  # Keeps a slow upstream well inside Twilio's 15 s webhook deadline
+HTTP_MAX_RETRIES = 2  # Retries on 5xx and OVER_QUERY_LIMIT
+HTTP_HEDGING = False  # Duplicate calls still unanswered after the endpoint's p95 latency
+HTTP_HEDGE_RATIO = 0.05  # At most this share of calls is hedged
+HTTP_HEDGE_MIN_DELAY = 0.05  # Never hedge sooner than this many seconds
+ASYNC_REPLY = False  # Reply to Twilio at once and send search results as a follow-up SMS
+ASYNC_REPLY_WORKERS = 4  # Background search workers when ASYNC_REPLY is enabled
+ASYNC_REPLY_QUEUE_SIZE = 1000
+SESSION_STORE = 'memory'  # 'memory' or 'sqlite'; use sqlite when running several workers
+SESSION_DB_PATH = 'sessions.sqlite3'
+SESSION_TTL = 86400  # Idle conversations are dropped after a day
+SESSION_MAX_ENTRIES = 100000
+PLACES_BACKEND = 'google'  # 'google', 'local', or 'auto' (local index when the Places API fails)
+LOCAL_INDEX_PATH = ''  # Snapshot built by local_index.py, or a CSV/JSONL dataset
+GAZETTEER_PATH = ''  # CSV/JSONL of addresses, ZIP and city centroids answered without the Geocoding API
+COALESCE_LOCK_DIR = ''  # Directory of lock files to coalesce identical lookups across worker processes
+COALESCE_LOCK_WAIT = 5.0  # Longest wait, in seconds, for another worker's identical lookup
+METRICS_SAMPLE_RATE = 1.0  # Fraction of requests whose stage timings are recorded
+QUOTA_GEOCODE_QPS = 50  # Geocoding API requests per second, 0 for no rate limit
+QUOTA_PLACES_QPS = 100  # Places API requests per second, 0 for no rate limit
+QUOTA_GEOCODE_DAILY = 0  # Geocoding API requests per day, 0 for no daily cap
+QUOTA_PLACES_DAILY = 0  # Places API requests per day, 0 for no daily cap
+QUOTA_DETAILS_QPS = 100  # Place Details requests per second, 0 for no rate limit
+QUOTA_DETAILS_DAILY = 0  # Place Details requests per day, 0 for no daily cap
+QUOTA_MAX_WAIT = 2.0  # Seconds a call may queue for quota before degrading
+QUOTA_TIMEZONE = 'America/Los_Angeles'  # Google resets daily quotas at midnight Pacific time
+BREAKER_FAILURE_RATE = 0.5  # Share of failed calls in the window that opens the circuit
+BREAKER_SLOW_CALL_SECONDS = 3.0
+BREAKER_SLOW_CALL_RATE = 0.8  # Share of calls slower than BREAKER_SLOW_CALL_SECONDS that opens the circuit
+BREAKER_WINDOW_SECONDS = 30
+BREAKER_MIN_CALLS = 10  # Calls in the window before the breaker may open
+BREAKER_OPEN_SECONDS = 15  # Fail fast for this long before letting a trial call through
+REQUEST_DEADLINE = 12.0  # Seconds the webhook may spend before replying, inside Twilio's 15 s limit
+DEADLINE_MIN_STAGE = 0.5  # An upstream call is not started with less time than this left
+IDEMPOTENCY_TTL = 3600  # Seconds a reply is kept for retried deliveries of the same MessageSid
+IDEMPOTENCY_MAX_ENTRIES = 10000  # Replies kept in memory with the memory session store
+IDEMPOTENCY_WAIT = 10.0  # Seconds a retry waits for the first delivery to finish
+MAX_KEYWORDS = 3  # "coffee or donuts" style messages search at most this many keywords
+KEYWORD_FANOUT_WORKERS = 8  # Threads running the per-keyword Places searches
+# Widen through RADIUS_TIERS, tightest first, until one has NUM_RESULTS places. Each uncached tier searched
+# costs one Places call per keyword, so a sparse area can use up to len(RADIUS_TIERS) x MAX_KEYWORDS calls.
+ADAPTIVE_RADIUS = False
+RADIUS_TIERS = '1609,8047,40234'  # Meters: 1, 5 and 25 miles
+PROFILE_SAMPLE_RATE = 0.0  # Share of /sms requests run under the profiler
+PROFILE_MODE = 'sample'  # 'sample' for collapsed stacks, or 'cprofile' for pstats
+PROFILE_BUFFER_SIZE = 20  # Recent profiles kept for /admin/profiles
+PROFILE_INTERVAL = 0.001  # Seconds between stack samples in 'sample' mode
+REPLY_FORMAT = 'verbose'  # 'compact' packs results into SMS_SEGMENT_BUDGET GSM-7 segments
+SMS_SEGMENT_BUDGET = 2  # Segments a compact reply may use, including the follow-up prompt
+LOG_LEVEL = 'INFO'  # Root log level; change it at runtime through /admin/log-level
+LOG_FORMAT = 'json'  # 'json' for one structured record per line, or 'text'
+LOG_SAMPLE_RATES = ''  # Share of DEBUG records kept per logger, e.g. 'upstream=0.1,sms=0.5'
+LOG_MAX_FIELD_LENGTH = 512  # Longer log messages and fields, such as upstream payloads, are truncated
+LOG_QUEUE_SIZE = 10000  # Records waiting for the log writer thread; further records are dropped
+CACHE_SNAPSHOT_PATH = ''  # File the hottest cache entries are saved to on shutdown and loaded from on start
+CACHE_SNAPSHOT_SIZE = 500  # Entries per cache kept in the snapshot
+PLACE_DETAILS = False  # Look up phone numbers and today's hours for the places in each reply
+PLACE_DETAILS_WORKERS = 8  # Threads running Place Details lookups
+PLACE_DETAILS_BUDGET = 1.0  # Seconds a reply waits for details; places still pending are shown without
+PLACE_DETAILS_CACHE_SIZE = 4096
+PLACE_DETAILS_CACHE_TTL = 86400  # Phone numbers and weekly hours rarely change
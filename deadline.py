@@ -0,0 +1,35 @@
+"""
+Per-request deadline budget
+
+Twilio waits 15 seconds for a webhook response. ``sms_reply`` creates a
+``Deadline`` when the request arrives and passes it down through geocoding,
+the Places search and the HTTP client. Each stage gets only the remaining
+budget as its timeout. A stage that cannot start with at least its minimum
+budget left raises ``DeadlineExceeded`` instead, so the webhook can still
+answer from cache or hand the search to the background workers.
+"""
+
+import time
+
+
+class DeadlineExceeded(Exception):
+    def __init__(self, stage):
+        self.stage = stage
+        super().__init__(f"Ran out of time before {stage}")
+
+
+class Deadline:
+    def __init__(self, budget, started_at=None, clock=time.perf_counter):
+        self.clock = clock
+        self.expires_at = (clock() if started_at is None else started_at) + budget
+
+    def remaining(self):
+        return max(0.0, self.expires_at - self.clock())
+
+    def expired(self):
+        return self.clock() >= self.expires_at
+
+    def check(self, stage, needed=0.0):
+        """Raises ``DeadlineExceeded`` unless ``needed`` seconds are left."""
+        if self.expires_at - self.clock() < needed or self.expired():
+            raise DeadlineExceeded(stage)
@@ -0,0 +1,170 @@
+"""
+Local gazetteer geocoder
+
+A fast-path in front of the Geocoding API for the street addresses, ZIP codes
+and city names our users text most. Entries come from a CSV or JSONL file
+with an address (or ``zip``/``city``/``name``) column and ``lat``/``lng``.
+
+Lookups normalize the text the same way the geocode cache does and try an
+exact match. Otherwise a character trigram index finds candidates, and a
+candidate matches only if it has the same tokens in the same order, each
+either equal or off by one typo. Numbers (house numbers, ZIP codes) and short
+tokens (state and direction codes) must be equal, and so must words of up to
+five letters apart from a swapped pair: "123 Main St Springfield MO" and
+"123 Maine St Springfield IL" are not "123 Main St Springfield IL". Anything
+else, including more than one matching entry, returns None so the caller goes
+to Google. The index is built lazily on first lookup. Rows whose address
+normalizes to one already loaded are skipped; the first row wins, and the
+skipped rows are counted and logged.
+"""
+
+import csv
+import json
+import logging
+import threading
+from collections import Counter
+
+from geocode_cache import normalize_address
+
+_ADDRESS_FIELDS = ('address', 'zip', 'zipcode', 'postcode', 'city', 'name')
+
+
+def trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _strict(token):
+    return len(token) <= 3 or any(char.isdigit() for char in token)
+
+
+def _one_typo(a, b):
+    """Whether two different tokens are one swapped pair of adjacent letters
+    apart or, for words of six letters or more, one letter added, dropped
+    or changed."""
+    if len(a) == len(b):
+        diffs = [i for i in range(len(a)) if a[i] != b[i]]
+        if len(diffs) == 2 and diffs[1] == diffs[0] + 1 and a[diffs[0]] == b[diffs[1]] and a[diffs[1]] == b[diffs[0]]:
+            return True
+        return len(diffs) == 1 and len(a) >= 6
+    if abs(len(a) - len(b)) != 1 or min(len(a), len(b)) < 6:
+        return False
+    short, long = sorted((a, b), key=len)
+    i = next((i for i in range(len(short)) if short[i] != long[i]), len(short))
+    return short[i:] == long[i + 1:]
+
+
+def tokens_match(query, entry):
+    """Whether two token lists are the same address, allowing one typo in
+    each longer word."""
+    if len(query) != len(entry):
+        return False
+    return all(a == b or (not _strict(a) and not _strict(b) and _one_typo(a, b)) for a, b in zip(query, entry))
+
+
+class Gazetteer:
+    def __init__(self, path, max_candidates=20):
+        self.path = path
+        self.max_candidates = max_candidates
+        self._entries = None
+        self._exact = None
+        self._postings = None
+        self._lock = threading.Lock()
+        self._counter_lock = threading.Lock()
+        self.duplicates = 0
+        self.lookups = 0
+        self.exact_hits = 0
+        self.fuzzy_hits = 0
+        self.ambiguous = 0
+        self.misses = 0
+
+    def _load(self):
+        with self._lock:
+            if self._entries is not None:
+                return
+            entries = []
+            exact = {}
+            postings = {}
+            duplicates = []
+            for name, lat, lng in self._read_rows():
+                key = normalize_address(name)
+                if not key:
+                    continue
+                if key in exact:
+                    duplicates.append(name)
+                    continue
+                entry_id = len(entries)
+                grams = trigrams(key)
+                entries.append((key, f"{lat}, {lng}", key.split()))
+                exact[key] = entry_id
+                for gram in grams:
+                    postings.setdefault(gram, []).append(entry_id)
+            if duplicates:
+                logging.warning(f"Gazetteer {self.path}: skipped {len(duplicates)} rows whose address was already "
+                                f"loaded, e.g. {duplicates[0]!r}")
+            self.duplicates = len(duplicates)
+            self._exact = exact
+            self._postings = postings
+            self._entries = entries
+
+    def _read_rows(self):
+        with open(self.path, newline='', encoding='utf-8') as f:
+            if self.path.endswith(('.jsonl', '.ndjson')):
+                rows = (json.loads(line) for line in f if line.strip())
+            else:
+                rows = csv.DictReader(f)
+            for row in rows:
+                name = next((row[field] for field in _ADDRESS_FIELDS if row.get(field)), None)
+                lat = row.get('lat', row.get('latitude'))
+                lng = row.get('lng', row.get('longitude'))
+                if name and lat not in (None, '') and lng not in (None, ''):
+                    yield str(name), float(lat), float(lng)
+
+    def lookup(self, address):
+        """Returns ``"lat, lng"`` for a confident match, otherwise None."""
+        if self._entries is None:
+            self._load()
+        key = normalize_address(address)
+
+        entry_id = self._exact.get(key)
+        if entry_id is not None:
+            self._count('exact_hits')
+            return self._entries[entry_id][1]
+
+        grams = trigrams(key)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+        tokens = key.split()
+        matches = set()
+        for entry_id, _ in shared.most_common(self.max_candidates):
+            _, location, entry_tokens = self._entries[entry_id]
+            if tokens_match(tokens, entry_tokens):
+                matches.add(location)
+
+        if not matches:
+            self._count('misses')
+            return None
+        if len(matches) > 1:
+            self._count('ambiguous')
+            return None
+        self._count('fuzzy_hits')
+        return matches.pop()
+
+    def _count(self, outcome):
+        with self._counter_lock:
+            self.lookups += 1
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def stats(self):
+        with self._counter_lock:
+            counts = {'lookups': self.lookups, 'exact_hits': self.exact_hits, 'fuzzy_hits': self.fuzzy_hits,
+                      'ambiguous': self.ambiguous, 'misses': self.misses}
+        hits = counts['exact_hits'] + counts['fuzzy_hits']
+        return {
+            'loaded': self._entries is not None,
+            'entries': len(self._entries) if self._entries is not None else 0,
+            'duplicates': self.duplicates,
+            **counts,
+            'hit_rate': hits / counts['lookups'] if counts['lookups'] else 0.0,
+        }
@@ -0,0 +1,282 @@
+"""
+Geocode cache
+
+Two-tier cache that sits in front of the Google Geocoding API. The first tier
+is an in-process LRU with a per-entry TTL, the second an on-disk SQLite store
+so cached addresses survive restarts. Keys are normalized addresses, so
+"123 Main Street" and "123  main st." share one entry.
+
+Failed lookups such as ZERO_RESULTS are cached with a short TTL so a user who
+keeps texting a bad address does not cost a round trip each time.
+"""
+
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Statuses worth remembering for a short while; anything else (quota, denied,
+# unknown errors) is transient and must not be cached.
+NEGATIVE_STATUSES = ('ZERO_RESULTS', 'INVALID_REQUEST')
+
+ABBREVIATIONS = {
+    'street': 'st', 'str': 'st',
+    'avenue': 'ave', 'av': 'ave',
+    'road': 'rd',
+    'boulevard': 'blvd',
+    'drive': 'dr',
+    'lane': 'ln',
+    'court': 'ct',
+    'place': 'pl',
+    'terrace': 'ter',
+    'circle': 'cir',
+    'highway': 'hwy',
+    'parkway': 'pkwy',
+    'square': 'sq',
+    'suite': 'ste',
+    'apartment': 'apt',
+    'north': 'n', 'south': 's', 'east': 'e', 'west': 'w',
+    'northeast': 'ne', 'northwest': 'nw', 'southeast': 'se', 'southwest': 'sw',
+}
+
+_PUNCTUATION = re.compile(r"[.,;:'\"()]")
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_address(address):
+    """Case-folds, strips punctuation, collapses whitespace and unifies
+    common street abbreviations so equivalent addresses share a cache key."""
+    text = _PUNCTUATION.sub(' ', str(address).casefold())
+    tokens = _WHITESPACE.split(text.strip())
+    return ' '.join(ABBREVIATIONS.get(token, token) for token in tokens if token)
+
+
+class LRUCache:
+    """Thread-safe, size-bounded LRU cache with a TTL per entry. Expired
+    entries are kept for another ``stale_ttl`` seconds for ``get_stale``."""
+
+    def __init__(self, max_size=1024, ttl=3600, clock=time.monotonic, stale_ttl=0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            now = self.clock()
+            if expires_at <= now:
+                if expires_at + self.stale_ttl <= now:
+                    del self._data[key]
+                    self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def get_stale(self, key):
+        """Returns the value even if it has expired, as long as it is still
+        within ``stale_ttl``. Does not count as a hit or miss."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[1] + self.stale_ttl <= self.clock():
+                return None
+            return entry[0]
+
+    def set(self, key, value, ttl=None):
+        expires_at = self.clock() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def snapshot(self, limit=None):
+        """Returns ``(key, value, ttl_remaining)`` for the ``limit`` most
+        recently used entries still within their TTL or ``stale_ttl``,
+        least recent first."""
+        with self._lock:
+            now = self.clock()
+            entries = [(key, value, expires_at - now) for key, (value, expires_at) in self._data.items()
+                       if expires_at + self.stale_ttl > now]
+        return entries[-limit:] if limit else entries
+
+    def restore(self, entries):
+        """Loads entries from ``snapshot``, keeping their order."""
+        for key, value, ttl in entries:
+            self.set(key, value, ttl)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        return {
+            'size': len(self._data),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+class SQLiteCache:
+    """Persistent key/value store with wall-clock expiry, shared safely
+    between worker processes through SQLite's WAL mode."""
+
+    def __init__(self, path, table='cache', max_entries=100000, clock=time.time):
+        if not re.fullmatch(r'\w+', table):
+            raise ValueError(f"Invalid table name: {table!r}")
+        self.path = path
+        self.table = table
+        self.max_entries = max_entries
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            f'CREATE TABLE IF NOT EXISTS {table} '
+            '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)'
+        )
+        self._conn.execute(f'CREATE INDEX IF NOT EXISTS {table}_expires ON {table} (expires_at)')
+        self._conn.commit()
+
+    def get(self, key):
+        entry = self.get_entry(key)
+        return None if entry is None else entry[0]
+
+    def get_entry(self, key):
+        """Returns ``(value, seconds_left)`` for a live entry, otherwise None."""
+        with self._lock:
+            row = self._conn.execute(
+                f'SELECT value, expires_at FROM {self.table} WHERE key = ?', (key,)
+            ).fetchone()
+            now = self.clock()
+            if row is None or row[1] <= now:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return json.loads(row[0]), row[1] - now
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._conn.execute(
+                f'INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)',
+                (key, json.dumps(value), self.clock() + ttl),
+            )
+            self._writes += 1
+            # Pruning is amortized over writes to keep the common path cheap.
+            if self._writes % 100 == 0:
+                self._prune()
+            self._conn.commit()
+
+    def _prune(self):
+        self._conn.execute(f'DELETE FROM {self.table} WHERE expires_at <= ?', (self.clock(),))
+        count = self._conn.execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                f'DELETE FROM {self.table} WHERE key IN '
+                f'(SELECT key FROM {self.table} ORDER BY expires_at LIMIT ?)',
+                (overflow,),
+            )
+            self.evictions += overflow
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute(f'DELETE FROM {self.table}')
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+class GeocodeCache:
+    """Caches raw Geocoding API responses keyed on the normalized address."""
+
+    def __init__(self, max_size=1024, ttl=604800, negative_ttl=300, path=None):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.memory = LRUCache(max_size=max_size, ttl=ttl)
+        self.disk = SQLiteCache(path, table='geocode_cache') if path else None
+
+    def get(self, address):
+        key = normalize_address(address)
+        data = self.memory.get(key)
+        if data is None and self.disk is not None:
+            entry = self.disk.get_entry(key)
+            if entry is not None:
+                # Promoted with the TTL left on disk, not a fresh one.
+                data, ttl = entry
+                self.memory.set(key, data, ttl=ttl)
+        return data
+
+    def set(self, address, data):
+        ttl = self._ttl_for(data)
+        if ttl is None:
+            return
+        key = normalize_address(address)
+        self.memory.set(key, data, ttl=ttl)
+        if self.disk is not None:
+            self.disk.set(key, data, ttl)
+
+    def _ttl_for(self, data):
+        if not isinstance(data, dict):
+            return None
+        status = data.get('status')
+        if status == 'OK':
+            return self.ttl
+        if status in NEGATIVE_STATUSES:
+            return self.negative_ttl
+        return None
+
+    def snapshot(self, limit=None):
+        return self.memory.snapshot(limit)
+
+    def restore(self, entries):
+        self.memory.restore(entries)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
+
+    def stats(self):
+        stats = {'memory': self.memory.stats()}
+        if self.disk is not None:
+            stats['disk'] = self.disk.stats()
+        return stats
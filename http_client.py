@@ -0,0 +1,249 @@
+"""
+Pooled HTTP client for outbound Google API calls
+
+Wraps one ``requests.Session`` so every geocode and Places call reuses
+keep-alive connections from a per-host pool instead of paying a fresh TCP and
+TLS handshake. Calls use separate connect and read timeouts, and 5xx or
+OVER_QUERY_LIMIT responses are retried with exponential backoff and full
+jitter. Per-endpoint latency is recorded for every attempt.
+
+With hedging enabled, an attempt that has not answered within the endpoint's
+recent p95 latency is duplicated and whichever copy answers first is used.
+Hedges are limited to ``hedge_ratio`` of attempts so an overloaded upstream
+does not see its traffic doubled.
+
+``get`` accepts an optional deadline (anything with ``remaining()``). Timeouts
+are capped to what is left of it, and a retry is skipped if its backoff would
+not fit.
+
+``get`` also accepts an ``acquire`` callback, called before each retry and
+hedge is sent so that every request the upstream sees is charged against the
+caller's quota. When it returns False the retry is skipped and the last
+response returned, or the hedge is not sent.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class _NotSent(Exception):
+    """The ``acquire`` callback refused a hedge."""
+
+
+class LatencyRecorder:
+    """Keeps call counts and a bounded window of recent latencies."""
+
+    def __init__(self, window=1024):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds, error=False):
+        with self._lock:
+            self.samples.append(seconds)
+            self.count += 1
+            self.total_seconds += seconds
+            if error:
+                self.errors += 1
+
+    def percentile(self, pct):
+        with self._lock:
+            samples = sorted(self.samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+        return samples[index]
+
+    def stats(self):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'avg_seconds': self.total_seconds / self.count if self.count else 0.0,
+            'p50_seconds': self.percentile(50),
+            'p95_seconds': self.percentile(95),
+            'p99_seconds': self.percentile(99),
+        }
+
+
+class HttpClient:
+    def __init__(self, pool_size=10, connect_timeout=3.05, read_timeout=5.0,
+                 max_retries=2, backoff=0.25, max_backoff=2.0,
+                 hedging=False, hedge_ratio=0.05, hedge_min_delay=0.05, hedge_min_samples=20):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedging = hedging
+        self.hedge_ratio = hedge_ratio
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.retries = 0
+        self.retries_skipped = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.latency = {}
+        self._hedge_tokens = 1.0
+        self._hedge_delays = {}
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pool_size = pool_size
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def get(self, url, deadline=None, acquire=None):
+        """GETs ``url`` through the pooled session, retrying retryable
+        responses. Returns the last response; transport errors propagate.
+        ``acquire`` is called before each retry and hedge."""
+        recorder = self._recorder(url)
+        attempt = 0
+        while True:
+            timeout = self._timeout(deadline)
+            if self.hedging:
+                response = self._hedged_get(url, recorder, timeout, acquire)
+            else:
+                response = self._timed_get(url, recorder, timeout)
+            if not self._is_retryable(response) or attempt >= self.max_retries:
+                return response
+            delay = self._backoff_delay(attempt)
+            if deadline is not None and deadline.remaining() <= delay:
+                with self._lock:
+                    self.retries_skipped += 1
+                return response
+            time.sleep(delay)
+            if acquire is not None and not acquire():
+                with self._lock:
+                    self.retries_skipped += 1
+                return response
+            attempt += 1
+            with self._lock:
+                self.retries += 1
+
+    def _timeout(self, deadline):
+        if deadline is None:
+            return self.connect_timeout, self.read_timeout
+        remaining = deadline.remaining()
+        if remaining <= 0:
+            raise requests.Timeout("Request deadline exceeded")
+        return min(self.connect_timeout, remaining), min(self.read_timeout, remaining)
+
+    def _timed_get(self, url, recorder, timeout):
+        start = time.perf_counter()
+        try:
+            response = self.session.get(url, timeout=timeout)
+        except requests.RequestException:
+            recorder.record(time.perf_counter() - start, error=True)
+            raise
+        recorder.record(time.perf_counter() - start, error=self._is_retryable(response))
+        return response
+
+    def _acquired_get(self, url, recorder, timeout, acquire):
+        if acquire is not None and not acquire():
+            raise _NotSent()
+        return self._timed_get(url, recorder, timeout)
+
+    def _hedged_get(self, url, recorder, timeout, acquire=None):
+        delay = self._hedge_delay(recorder)
+        if delay is None:
+            return self._timed_get(url, recorder, timeout)
+        with self._lock:
+            # Each attempt earns hedge_ratio of a hedge, banked up to 10.
+            self._hedge_tokens = min(10.0, self._hedge_tokens + self.hedge_ratio)
+        executor = self._get_executor()
+        primary = executor.submit(self._timed_get, url, recorder, timeout)
+        try:
+            return primary.result(timeout=delay)
+        except FutureTimeout:
+            pass
+        if not self._take_hedge():
+            return primary.result()
+
+        hedge = executor.submit(self._acquired_get, url, recorder, timeout, acquire)
+        done, _ = wait((primary, hedge), return_when=FIRST_COMPLETED)
+        winner = hedge if hedge in done and primary not in done else primary
+        if winner.exception() is not None:
+            # The first copy failed; the other one may still succeed.
+            winner = primary if winner is hedge else hedge
+        if winner is hedge and isinstance(hedge.exception(), _NotSent):
+            winner = primary
+        if winner is hedge:
+            with self._lock:
+                self.hedge_wins += 1
+        return winner.result()
+
+    def _hedge_delay(self, recorder):
+        """The endpoint's p95, refreshed every 64 samples; None until there
+        are enough samples to trust it."""
+        if recorder.count < self.hedge_min_samples:
+            return None
+        cached = self._hedge_delays.get(recorder)
+        if cached is None or recorder.count - cached[0] >= 64:
+            cached = self._hedge_delays[recorder] = (recorder.count, recorder.percentile(95))
+        return max(self.hedge_min_delay, cached[1])
+
+    def _take_hedge(self):
+        with self._lock:
+            if self._hedge_tokens < 1:
+                return False
+            self._hedge_tokens -= 1
+            self.hedges += 1
+            return True
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self._pool_size * 2,
+                                                        thread_name_prefix='http-hedge')
+        return self._executor
+
+    def _recorder(self, url):
+        parts = urlsplit(url)
+        endpoint = f'{parts.netloc}{parts.path}'
+        recorder = self.latency.get(endpoint)
+        if recorder is None:
+            with self._lock:
+                recorder = self.latency.setdefault(endpoint, LatencyRecorder())
+        return recorder
+
+    def _backoff_delay(self, attempt):
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    @staticmethod
+    def _is_retryable(response):
+        if response.status_code >= 500:
+            return True
+        # Cheap substring check first so healthy responses are not parsed twice.
+        if b'OVER_QUERY_LIMIT' not in response.content:
+            return False
+        try:
+            return response.json().get('status') == 'OVER_QUERY_LIMIT'
+        except ValueError:
+            return False
+
+    def close(self):
+        self.session.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    def stats(self):
+        return {
+            'retries': self.retries,
+            'retries_skipped': self.retries_skipped,
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+            'endpoints': {endpoint: recorder.stats() for endpoint, recorder in self.latency.items()},
+        }
@@ -0,0 +1,234 @@
+"""
+Idempotent webhook handling
+
+Twilio retries a webhook delivery when the response is slow, using the same
+``MessageSid``. ``run(key, handler)`` makes sure each key is handled once:
+
+- The first delivery claims the key, runs the handler and stores the rendered
+  response for ``ttl`` seconds.
+- A later duplicate gets the stored response back without running the
+  handler, so conversation state is not advanced twice and Google is not
+  called again.
+- A duplicate that arrives while the first is still running waits up to
+  ``wait_timeout`` seconds for its result.
+
+A claim is a lease of ``lease_ttl`` seconds. If a worker dies mid-request,
+the key becomes claimable again once the lease runs out. If the handler
+raises, the claim is released so a retry can run it.
+
+``MemoryIdempotencyStore`` is bounded by ``max_entries``. Keys still being
+handled are not evicted, so it can exceed the bound by the number of requests
+in flight.
+``SQLiteIdempotencyStore`` shares claims and responses between gunicorn
+workers through a WAL-mode SQLite file.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from session_store import ThreadConnections
+
+DONE = 'done'
+CLAIMED = 'claimed'
+PENDING = 'pending'
+
+
+class IdempotencyStore:
+    wait_timeout = 10
+
+    def __init__(self):
+        self.duplicates = 0
+        self.waited = 0
+        self.wait_timeouts = 0
+        self._stats_lock = threading.Lock()
+
+    def claim(self, key):
+        """Returns ``(DONE, response)``, ``(CLAIMED, token)`` or ``(PENDING, None)``."""
+        raise NotImplementedError
+
+    def complete(self, key, token, response):
+        raise NotImplementedError
+
+    def release(self, key, token):
+        raise NotImplementedError
+
+    def _wait(self, key, seconds):
+        time.sleep(seconds)
+
+    def _count(self, name):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def run(self, key, handler, pending_response=None):
+        """Returns ``handler()`` for the first delivery of ``key`` and the
+        stored response for duplicates. Returns ``pending_response`` if the
+        first delivery is still running after ``wait_timeout``."""
+        give_up_at = time.monotonic() + self.wait_timeout
+        delay = 0.005
+        waited = False
+        while True:
+            status, value = self.claim(key)
+            if status == DONE:
+                self._count('duplicates')
+                return value
+            if status == CLAIMED:
+                break
+            if not waited:
+                waited = True
+                self._count('waited')
+            if time.monotonic() >= give_up_at:
+                self._count('wait_timeouts')
+                return pending_response
+            self._wait(key, delay)
+            delay = min(delay * 2, 0.1)
+
+        try:
+            response = handler()
+        except BaseException:
+            self.release(key, value)
+            raise
+        self.complete(key, value, response)
+        return response
+
+    def close(self):
+        pass
+
+    def stats(self):
+        return {'duplicates': self.duplicates, 'waited': self.waited, 'wait_timeouts': self.wait_timeouts}
+
+
+class MemoryIdempotencyStore(IdempotencyStore):
+    def __init__(self, ttl=3600, max_entries=10000, lease_ttl=30, wait_timeout=10, clock=time.monotonic):
+        super().__init__()
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lease_ttl = lease_ttl
+        self.wait_timeout = wait_timeout
+        self.clock = clock
+        # key -> (claim token or None once done, response, expires_at)
+        self._data = OrderedDict()
+        self._condition = threading.Condition()
+        self.evictions = 0
+
+    def claim(self, key):
+        with self._condition:
+            now = self.clock()
+            entry = self._data.get(key)
+            if entry is not None and entry[2] > now:
+                return (DONE, entry[1]) if entry[0] is None else (PENDING, None)
+            token = uuid.uuid4().hex
+            self._data[key] = (token, None, now + self.lease_ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries and self._evict_one(now):
+                pass
+            return CLAIMED, token
+
+    def _evict_one(self, now):
+        """Drops the least recent entry that is done or whose lease ran out.
+        Live claims are kept, or a retry could run the handler a second time."""
+        for key, (token, _, expires_at) in self._data.items():
+            if token is None or expires_at <= now:
+                del self._data[key]
+                self.evictions += 1
+                return True
+        return False
+
+    def complete(self, key, token, response):
+        with self._condition:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] == token:
+                self._data[key] = (None, response, self.clock() + self.ttl)
+            self._condition.notify_all()
+
+    def release(self, key, token):
+        with self._condition:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] == token:
+                del self._data[key]
+            self._condition.notify_all()
+
+    def _wait(self, key, seconds):
+        with self._condition:
+            self._condition.wait(seconds)
+
+    def clear(self):
+        with self._condition:
+            self._data.clear()
+
+    def stats(self):
+        stats = super().stats()
+        stats.update(backend='memory', entries=len(self._data), evictions=self.evictions)
+        return stats
+
+
+class SQLiteIdempotencyStore(IdempotencyStore):
+    def __init__(self, path, ttl=3600, lease_ttl=30, wait_timeout=10, sweep_interval=60, clock=time.time):
+        super().__init__()
+        self.path = path
+        self.ttl = ttl
+        self.lease_ttl = lease_ttl
+        self.wait_timeout = wait_timeout
+        self.sweep_interval = sweep_interval
+        self.clock = clock
+        self._connections = ThreadConnections(path)
+        self._last_sweep = clock()
+
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('CREATE TABLE IF NOT EXISTS webhook_responses '
+                     '(key TEXT PRIMARY KEY, token TEXT, response TEXT, expires_at REAL NOT NULL)')
+        conn.execute('CREATE INDEX IF NOT EXISTS webhook_responses_expires ON webhook_responses (expires_at)')
+
+    def _conn(self):
+        return self._connections.get()
+
+    def close(self):
+        self._connections.close()
+
+    def claim(self, key):
+        conn = self._conn()
+        now = self.clock()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT token, response FROM webhook_responses WHERE key = ? AND expires_at > ?',
+                               (key, now)).fetchone()
+            if row is None:
+                token = uuid.uuid4().hex
+                conn.execute('INSERT OR REPLACE INTO webhook_responses (key, token, response, expires_at) '
+                             'VALUES (?, ?, NULL, ?)', (key, token, now + self.lease_ttl))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        if row is None:
+            self._maybe_sweep()
+            return CLAIMED, token
+        return (DONE, row[1]) if row[0] is None else (PENDING, None)
+
+    def complete(self, key, token, response):
+        self._conn().execute(
+            'UPDATE webhook_responses SET token = NULL, response = ?, expires_at = ? WHERE key = ? AND token = ?',
+            (response, self.clock() + self.ttl, key, token),
+        )
+
+    def release(self, key, token):
+        self._conn().execute('DELETE FROM webhook_responses WHERE key = ? AND token = ?', (key, token))
+
+    def _maybe_sweep(self):
+        now = self.clock()
+        if now - self._last_sweep < self.sweep_interval:
+            return
+        self._last_sweep = now
+        self._conn().execute('DELETE FROM webhook_responses WHERE expires_at <= ?', (now,))
+
+    def clear(self):
+        self._conn().execute('DELETE FROM webhook_responses')
+
+    def stats(self):
+        stats = super().stats()
+        entries = self._conn().execute('SELECT COUNT(*) FROM webhook_responses WHERE expires_at > ?',
+                                       (self.clock(),)).fetchone()[0]
+        stats.update(backend='sqlite', entries=entries)
+        return stats
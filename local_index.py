@@ -0,0 +1,351 @@
+"""
+Offline local business index
+
+An alternative ``nearby_search`` backend that answers from a local dataset of
+businesses (CSV, JSONL or an OSM-derived dump) when the Places API is over
+quota or too slow.
+
+Records are sorted by grid cell and held in flat ``array`` columns: a sorted
+array of cell keys points into the record columns, and an inverted keyword
+index maps each token to a sorted posting list of record ids. Because records
+are ordered by cell, a radius query visits one contiguous record range per
+grid row and bisects the posting lists into that range, so it never touches
+records outside the bounding box or without the keyword.
+
+``save`` writes every column into one snapshot file that ``load`` memory-maps,
+so startup does not re-parse the dataset. Query results have the same shape
+as Nearby Search results and go through the same formatter.
+
+Build a snapshot from the command line with::
+
+    python local_index.py businesses.csv businesses.idx
+"""
+
+import argparse
+import csv
+import heapq
+import json
+import math
+import mmap
+import re
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+
+EARTH_RADIUS_METERS = 6371008.8
+METERS_PER_DEGREE = 111320.0
+SNAPSHOT_MAGIC = b'TBFIDX1\n'
+# Offset that keeps grid rows/columns positive before packing them into one key.
+_CELL_BIAS = 1 << 20
+
+_TOKEN = re.compile(r'[^\W_]+')
+
+_COLUMNS = (
+    ('cell_keys', 'q'), ('cell_starts', 'I'),
+    ('lat', 'd'), ('lng', 'd'), ('rating', 'f'), ('reviews', 'I'), ('open_now', 'b'),
+    ('text_offsets', 'Q'), ('posting_offsets', 'I'), ('postings', 'I'),
+)
+
+_NAME_FIELDS = ('name', 'title')
+_ADDRESS_FIELDS = ('vicinity', 'address', 'formatted_address', 'addr:full', 'street_address')
+_KEYWORD_FIELDS = ('keywords', 'category', 'categories', 'types', 'amenity', 'shop', 'cuisine', 'tags')
+
+
+def tokenize(text):
+    return _TOKEN.findall(str(text).casefold())
+
+
+def haversine_meters(lat1, lng1, lat2, lng2):
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(a))
+
+
+def _first(record, fields, default=None):
+    for field in fields:
+        value = record.get(field)
+        if value not in (None, ''):
+            return value
+    return default
+
+
+def _as_bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ('1', 'true', 'yes', 'open'):
+        return True
+    if text in ('0', 'false', 'no', 'closed'):
+        return False
+    return None
+
+
+def normalize_record(record):
+    """Maps a raw dataset row onto the fields the index stores. Accepts flat
+    rows (``lat``/``lng`` or ``latitude``/``longitude``) as well as Google
+    Places shaped records. Returns None for rows without a name or position."""
+    location = (record.get('geometry') or {}).get('location') or {}
+    lat = _first(record, ('lat', 'latitude'), location.get('lat'))
+    lng = _first(record, ('lng', 'lon', 'longitude'), location.get('lng'))
+    name = _first(record, _NAME_FIELDS)
+    if name is None or lat is None or lng is None:
+        return None
+
+    keywords = []
+    for field in _KEYWORD_FIELDS:
+        value = record.get(field)
+        if isinstance(value, (list, tuple)):
+            keywords.extend(str(item) for item in value)
+        elif value:
+            keywords.extend(re.split(r'[;,|]', str(value)))
+
+    open_now = record.get('open_now')
+    opening_hours = record.get('opening_hours')
+    if open_now is None and isinstance(opening_hours, dict):
+        open_now = opening_hours.get('open_now')
+
+    rating = record.get('rating')
+    reviews = _first(record, ('user_ratings_total', 'reviews', 'review_count'), 0)
+    return {
+        'name': str(name),
+        'vicinity': str(_first(record, _ADDRESS_FIELDS, '')),
+        'lat': float(lat),
+        'lng': float(lng),
+        'rating': float(rating) if rating not in (None, '') else math.nan,
+        'reviews': int(float(reviews)),
+        'open_now': _as_bool(open_now) if open_now not in (None, '') else None,
+        'keywords': ' '.join(keywords).replace('_', ' '),
+    }
+
+
+def read_records(path):
+    """Streams normalized records from a CSV or JSONL file."""
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith(('.jsonl', '.ndjson', '.json')):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        for row in rows:
+            record = normalize_record(row)
+            if record is not None:
+                yield record
+
+
+class LocalPlaceIndex:
+    def __init__(self, cell_size, count, columns, text, vocabulary, snapshot=None):
+        self.cell_size = cell_size
+        self.count = count
+        self.text = text
+        self.vocabulary = {token: i for i, token in enumerate(vocabulary)}
+        self._vocabulary_list = vocabulary
+        self._snapshot = snapshot
+        for name, _ in _COLUMNS:
+            setattr(self, name, columns[name])
+
+    @classmethod
+    def build(cls, records, cell_size=0.01):
+        rows = []
+        for record in records:
+            row_key = cls._cell_key(record['lat'], record['lng'], cell_size)
+            rows.append((row_key, record))
+        rows.sort(key=lambda item: item[0])
+
+        columns = {name: array(typecode) for name, typecode in _COLUMNS}
+        text = bytearray()
+        columns['text_offsets'].append(0)
+        token_postings = {}
+
+        for record_id, (key, record) in enumerate(rows):
+            if not columns['cell_keys'] or columns['cell_keys'][-1] != key:
+                columns['cell_keys'].append(key)
+                columns['cell_starts'].append(record_id)
+            columns['lat'].append(record['lat'])
+            columns['lng'].append(record['lng'])
+            columns['rating'].append(record['rating'])
+            columns['reviews'].append(record['reviews'])
+            columns['open_now'].append(-1 if record['open_now'] is None else int(record['open_now']))
+            for value in (record['name'], record['vicinity']):
+                text += value.encode('utf-8')
+                columns['text_offsets'].append(len(text))
+            for token in set(tokenize(record['name']) + tokenize(record['keywords'])):
+                token_postings.setdefault(token, []).append(record_id)
+        columns['cell_starts'].append(len(rows))
+
+        vocabulary = sorted(token_postings)
+        columns['posting_offsets'].append(0)
+        for token in vocabulary:
+            columns['postings'].extend(token_postings[token])
+            columns['posting_offsets'].append(len(columns['postings']))
+
+        return cls(cell_size, len(rows), columns, bytes(text), vocabulary)
+
+    @classmethod
+    def from_file(cls, path, cell_size=0.01):
+        return cls.build(read_records(path), cell_size=cell_size)
+
+    @staticmethod
+    def _cell_key(lat, lng, cell_size):
+        row = math.floor(lat / cell_size) + _CELL_BIAS
+        col = math.floor(lng / cell_size) + _CELL_BIAS
+        return (row << 32) | col
+
+    def save(self, path):
+        header = {'cell_size': self.cell_size, 'count': self.count, 'vocabulary': self._vocabulary_list,
+                  'columns': {}}
+        chunks = []
+        offset = 0
+        for name, typecode in _COLUMNS:
+            data = memoryview(getattr(self, name)).cast('B').tobytes()
+            header['columns'][name] = [typecode, offset, len(data)]
+            chunks.append(data)
+            offset += len(data)
+            offset += -offset % 8
+            chunks.append(b'\0' * (-len(data) % 8))
+        header['text'] = [offset, len(self.text)]
+        chunks.append(self.text)
+
+        encoded = json.dumps(header).encode('utf-8')
+        encoded += b' ' * (-(len(SNAPSHOT_MAGIC) + 8 + len(encoded)) % 8)
+        with open(path, 'wb') as f:
+            f.write(SNAPSHOT_MAGIC)
+            f.write(struct.pack('<Q', len(encoded)))
+            f.write(encoded)
+            for chunk in chunks:
+                f.write(chunk)
+
+    @classmethod
+    def load(cls, path):
+        """Memory-maps a snapshot written by ``save``; columns are zero-copy
+        views into the mapping."""
+        with open(path, 'rb') as f:
+            snapshot = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if snapshot[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a local index snapshot")
+        header_length = struct.unpack_from('<Q', snapshot, len(SNAPSHOT_MAGIC))[0]
+        base = len(SNAPSHOT_MAGIC) + 8
+        header = json.loads(snapshot[base:base + header_length])
+        base += header_length
+
+        view = memoryview(snapshot)
+        columns = {}
+        for name, (typecode, offset, length) in header['columns'].items():
+            columns[name] = view[base + offset:base + offset + length].cast(typecode)
+        text_offset, text_length = header['text']
+        text = view[base + text_offset:base + text_offset + text_length]
+        return cls(header['cell_size'], header['count'], columns, text, header['vocabulary'], snapshot)
+
+    def _posting_bounds(self, token):
+        token_id = self.vocabulary.get(token)
+        if token_id is None:
+            return None
+        return self.posting_offsets[token_id], self.posting_offsets[token_id + 1]
+
+    def _text(self, index):
+        start, end = self.text_offsets[index], self.text_offsets[index + 1]
+        return bytes(self.text[start:end]).decode('utf-8')
+
+    def _record_ranges(self, lat, lng, radius_meters):
+        """Yields contiguous ``(start, end)`` record ranges covering the
+        bounding box of the search circle, one per grid row."""
+        lat_delta = radius_meters / METERS_PER_DEGREE
+        lng_delta = radius_meters / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+        row_min = math.floor((lat - lat_delta) / self.cell_size) + _CELL_BIAS
+        row_max = math.floor((lat + lat_delta) / self.cell_size) + _CELL_BIAS
+        col_min = math.floor((lng - lng_delta) / self.cell_size) + _CELL_BIAS
+        col_max = math.floor((lng + lng_delta) / self.cell_size) + _CELL_BIAS
+        for row in range(row_min, row_max + 1):
+            first = bisect_left(self.cell_keys, (row << 32) | col_min)
+            last = bisect_right(self.cell_keys, (row << 32) | col_max)
+            if first < last:
+                yield self.cell_starts[first], self.cell_starts[last]
+
+    def _candidates(self, lat, lng, radius_meters, keyword):
+        # Posting lists are (lo, hi) slices of the shared postings column so
+        # that nothing is copied out of a memory-mapped snapshot.
+        bounds = []
+        for token in tokenize(keyword) if keyword else []:
+            posting = self._posting_bounds(token)
+            if posting is None:
+                return
+            bounds.append(posting)
+        bounds.sort(key=lambda bound: bound[1] - bound[0])
+        postings = self.postings
+
+        for start, end in self._record_ranges(lat, lng, radius_meters):
+            if not bounds:
+                yield from range(start, end)
+                continue
+            lo, hi = bounds[0]
+            for position in range(bisect_left(postings, start, lo, hi), bisect_left(postings, end, lo, hi)):
+                record_id = postings[position]
+                if all(self._contains(other, record_id) for other in bounds[1:]):
+                    yield record_id
+
+    def _contains(self, bound, record_id):
+        position = bisect_left(self.postings, record_id, *bound)
+        return position < bound[1] and self.postings[position] == record_id
+
+    def query(self, lat, lng, radius_meters, keyword=None, limit=20, order='distance'):
+        """Returns up to ``limit`` businesses within ``radius_meters`` whose
+        name or category contains every token of ``keyword``, nearest first
+        (``order='distance'``) or best rated first (``order='rating'``)."""
+        scored = []
+        for record_id in self._candidates(lat, lng, radius_meters, keyword):
+            distance = haversine_meters(lat, lng, self.lat[record_id], self.lng[record_id])
+            if distance > radius_meters:
+                continue
+            if order == 'rating':
+                rating = self.rating[record_id]
+                score = -(0.0 if math.isnan(rating) else rating)
+            else:
+                score = distance
+            scored.append((score, distance, record_id))
+        return [self._record(record_id, distance)
+                for _, distance, record_id in heapq.nsmallest(limit, scored)]
+
+    def _record(self, record_id, distance):
+        result = {
+            'place_id': f'local:{record_id}',
+            'name': self._text(2 * record_id),
+            'vicinity': self._text(2 * record_id + 1),
+            'geometry': {'location': {'lat': self.lat[record_id], 'lng': self.lng[record_id]}},
+            'distance_meters': distance,
+        }
+        rating = self.rating[record_id]
+        if not math.isnan(rating):
+            result['rating'] = round(rating, 1)
+            result['user_ratings_total'] = self.reviews[record_id]
+        if self.open_now[record_id] >= 0:
+            result['opening_hours'] = {'open_now': bool(self.open_now[record_id])}
+        return result
+
+    def __len__(self):
+        return self.count
+
+
+def load_index(path, cell_size=0.01):
+    """Loads a snapshot, or builds an index from a CSV/JSONL dataset."""
+    with open(path, 'rb') as f:
+        is_snapshot = f.read(len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC
+    if is_snapshot:
+        return LocalPlaceIndex.load(path)
+    return LocalPlaceIndex.from_file(path, cell_size=cell_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build a local business index snapshot.')
+    parser.add_argument('source', help='CSV or JSONL dataset of businesses')
+    parser.add_argument('snapshot', help='Path of the snapshot file to write')
+    parser.add_argument('--cell-size', type=float, default=0.01, help='Grid cell size in degrees')
+    args = parser.parse_args()
+
+    index = LocalPlaceIndex.from_file(args.source, cell_size=args.cell_size)
+    index.save(args.snapshot)
+    print(f"Indexed {len(index)} businesses into {args.snapshot}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+"""
+Location input classification
+
+Users often answer "what address?" with something that already is a
+location: a pin shared from a maps app, coordinates, or a plus code. These
+are decoded locally instead of being sent to the Geocoding API, which costs a
+round trip and can resolve "40.71,-74.00" to the wrong place. Recognized:
+
+- decimal coordinates: ``40.7128, -74.0060``
+- degrees/minutes/seconds: ``40°42'46"N 74°0'22"W``, ``40.7128° N, 74.006° W``
+- ``geo:`` URIs and Google Maps and Apple Maps share URLs carrying
+  coordinates (``@lat,lng``, ``ll=``, ``q=``, ``query=`` ...); a URL whose
+  query is an address geocodes just that address
+- Open Location Codes: full codes (``87G7PX7V+4H``) decode directly; short
+  codes with a locality (``PX7V+4H New York``) geocode only the locality
+
+Short links such as ``maps.app.goo.gl/...`` cannot be decoded without
+following the redirect and are left to geocoding. Input may be lowercased,
+as ``sms_reply`` does.
+"""
+
+import re
+from urllib.parse import parse_qs, unquote_plus, urlsplit
+
+TEXT = 'text'
+DECIMAL = 'decimal'
+DMS = 'dms'
+GEO_URI = 'geo_uri'
+GOOGLE_MAPS = 'google_maps'
+APPLE_MAPS = 'apple_maps'
+PLUS_CODE = 'plus_code'
+PLUS_CODE_SHORT = 'plus_code_short'
+
+_NUMBER = r'[-+]?\d{1,3}(?:\.\d+)?'
+_DECIMAL_PATTERN = re.compile(rf'^\s*\(?\s*({_NUMBER})\s*(?:,\s*|\s+)({_NUMBER})\s*\)?\s*$')
+_DMS_COMPONENT = (r'(\d{1,3}(?:\.\d+)?)\s*(?:°|º|˚|deg|d)?\s*'
+                  r'(?:(\d{1,2}(?:\.\d+)?)\s*(?:\'|′|’)?\s*)?'
+                  r'(?:(\d{1,2}(?:\.\d+)?)\s*(?:"|″|”|\'\'|′′)?\s*)?'
+                  r'([nsew])')
+_DMS_PATTERN = re.compile(rf'^\s*{_DMS_COMPONENT}\s*,?\s*{_DMS_COMPONENT}\s*$', re.IGNORECASE)
+# A degree, minute or second mark, or a decimal point.
+_DMS_MARKER = re.compile(r'[.°º˚′″\'"’”]|\d\s*d', re.IGNORECASE)
+_AT_PATTERN = re.compile(rf'@({_NUMBER}),({_NUMBER})')
+# Query parameters that carry a position, in order of preference.
+_COORDINATE_PARAMS = ('ll', 'sll', 'center', 'coordinate', 'destination', 'daddr', 'q', 'query')
+
+OLC_ALPHABET = '23456789CFGHJMPQRVWX'
+OLC_SEPARATOR_POSITION = 8
+_OLC_DIGIT = f'[{OLC_ALPHABET}]'
+_FULL_CODE_PATTERN = re.compile(rf'^({_OLC_DIGIT}{{8}}\+{_OLC_DIGIT}{{2,7}}|{_OLC_DIGIT}{{2,6}}0+\+)$', re.IGNORECASE)
+_SHORT_CODE_PATTERN = re.compile(rf'^({_OLC_DIGIT}{{2,6}}\+{_OLC_DIGIT}{{2,7}})(?:[\s,]+(.+))?$', re.IGNORECASE)
+
+
+def format_location(lat, lng):
+    """The ``"lat, lng"`` string ``nearby_search`` takes."""
+    return f'{round(lat, 6)}, {round(lng, 6)}'
+
+
+def _valid(lat, lng):
+    return -90 <= lat <= 90 and -180 <= lng <= 180
+
+
+def parse_decimal(text, require_point=True):
+    """``require_point`` rejects two whole numbers, which in free text
+    ("10 12", "5, 12") are more likely part of an address than a position.
+    Geo URIs and maps links pass False."""
+    match = _DECIMAL_PATTERN.match(text)
+    if not match:
+        return None
+    if require_point and '.' not in match.group(1) + match.group(2):
+        return None
+    lat, lng = float(match.group(1)), float(match.group(2))
+    return (lat, lng) if _valid(lat, lng) else None
+
+
+def _dms_value(degrees, minutes, seconds, hemisphere):
+    value = float(degrees) + float(minutes or 0) / 60 + float(seconds or 0) / 3600
+    return -value if hemisphere in 'sw' else value
+
+
+def parse_dms(text):
+    match = _DMS_PATTERN.match(text)
+    # Bare numbers with hemisphere letters ("50 n 100 w") are more likely an address.
+    if not match or not _DMS_MARKER.search(text):
+        return None
+    first = (*match.groups()[:3], match.group(4).lower())
+    second = (*match.groups()[4:7], match.group(8).lower())
+    if first[3] in 'ew':
+        first, second = second, first
+    if first[3] not in 'ns' or second[3] not in 'ew':
+        return None
+    if any(part and float(part) >= 60 for part in (first[1], first[2], second[1], second[2])):
+        return None
+    lat, lng = _dms_value(*first), _dms_value(*second)
+    return (lat, lng) if _valid(lat, lng) else None
+
+
+def _olc_decode_pairs(code):
+    lat, lng = -90.0, -180.0
+    resolution = 400.0
+    for i in range(0, min(len(code), 10), 2):
+        resolution /= 20
+        lat += OLC_ALPHABET.index(code[i]) * resolution
+        lng += OLC_ALPHABET.index(code[i + 1]) * resolution
+    return lat, lng, resolution, resolution
+
+
+def decode_plus_code(code):
+    """Returns the center ``(lat, lng)`` of a full Open Location Code."""
+    code = code.upper().replace('+', '').rstrip('0')
+    lat, lng, lat_resolution, lng_resolution = _olc_decode_pairs(code)
+    # Characters after the tenth refine a 5-row by 4-column grid.
+    for char in code[10:15]:
+        lat_resolution /= 5
+        lng_resolution /= 4
+        row, column = divmod(OLC_ALPHABET.index(char), 4)
+        lat += row * lat_resolution
+        lng += column * lng_resolution
+    return min(lat + lat_resolution / 2, 90.0), min(lng + lng_resolution / 2, 180.0)
+
+
+def _olc_encode_pairs(lat, lng, length):
+    lat = min(max(lat, -90.0), 90.0 - 1e-9) + 90
+    lng = (lng + 180) % 360
+    digits = []
+    resolution = 400.0
+    while len(digits) < length:
+        resolution /= 20
+        lat_digit, lng_digit = int(lat // resolution), int(lng // resolution)
+        lat -= lat_digit * resolution
+        lng -= lng_digit * resolution
+        digits += [OLC_ALPHABET[lat_digit], OLC_ALPHABET[lng_digit]]
+    return ''.join(digits[:length])
+
+
+def recover_nearest(short_code, reference_lat, reference_lng):
+    """Returns the center of the full code nearest the reference point that
+    ``short_code`` abbreviates."""
+    short_code = short_code.upper()
+    padding = OLC_SEPARATOR_POSITION - short_code.index('+')
+    resolution = 20.0 ** (2 - padding / 2)
+    half = resolution / 2
+    lat, lng = decode_plus_code(_olc_encode_pairs(reference_lat, reference_lng, padding) + short_code)
+    if reference_lat + half < lat and lat - resolution >= -90:
+        lat -= resolution
+    elif reference_lat - half > lat and lat + resolution <= 90:
+        lat += resolution
+    if reference_lng + half < lng:
+        lng -= resolution
+    elif reference_lng - half > lng:
+        lng += resolution
+    return lat, lng
+
+
+def _parse_pair(text):
+    return parse_decimal(text, require_point=False) or parse_dms(text)
+
+
+def parse_url(text):
+    """Returns ``(kind, (lat, lng) or None, query)`` for a geo URI or a maps
+    share URL, or None for other text. ``query`` is the address a URL
+    searches for when it carries no coordinates."""
+    if text.startswith('geo:'):
+        position = parse_decimal(text[4:].split(';', 1)[0].split('?', 1)[0], require_point=False)
+        return (GEO_URI, position, None) if position else None
+    if not re.match(r'^(https?://)?[\w.-]+\.[a-z]{2,}/', text, re.IGNORECASE):
+        return None
+    url = urlsplit(text if '://' in text else 'https://' + text)
+    host = url.hostname or ''
+    if 'maps.apple' in host:
+        kind = APPLE_MAPS
+    elif 'google' in host and ('maps' in host or url.path.startswith('/maps')):
+        kind = GOOGLE_MAPS
+    else:
+        return None
+    match = _AT_PATTERN.search(unquote_plus(url.path))
+    if match and _valid(float(match.group(1)), float(match.group(2))):
+        return kind, (float(match.group(1)), float(match.group(2))), None
+    params = parse_qs(url.query)
+    query = None
+    for name in _COORDINATE_PARAMS:
+        for value in params.get(name, ()):
+            position = _parse_pair(value)
+            if position:
+                return kind, position, None
+            if name in ('q', 'query', 'daddr') and query is None:
+                query = value
+    query = query or (params.get('address') or [None])[0]
+    # /maps/place/<name or address>/ links without an @ position.
+    if query is None and '/place/' in url.path:
+        query = unquote_plus(url.path.split('/place/', 1)[1].split('/', 1)[0]) or None
+    return kind, None, query
+
+
+def resolve(text, geocode):
+    """Returns ``(kind, location)`` for the user's location text, where
+    ``location`` is a ``"lat, lng"`` string. ``geocode(text)`` is called only
+    for what cannot be decoded locally: free-form text, the address in a maps
+    URL, or the locality of a short plus code. It returns ``"lat, lng"`` or
+    None, and so does ``resolve`` when geocoding fails."""
+    text = text.strip()
+    position = parse_decimal(text)
+    if position:
+        return DECIMAL, format_location(*position)
+    position = parse_dms(text)
+    if position:
+        return DMS, format_location(*position)
+    if _FULL_CODE_PATTERN.match(text):
+        return PLUS_CODE, format_location(*decode_plus_code(text))
+    parsed = parse_url(text)
+    if parsed:
+        kind, position, query = parsed
+        if position:
+            return kind, format_location(*position)
+        return kind, geocode(query) if query else geocode(text)
+    match = _SHORT_CODE_PATTERN.match(text)
+    if match and match.group(2):
+        reference = geocode(match.group(2))
+        if reference is None:
+            return PLUS_CODE_SHORT, None
+        lat, lng = (float(part) for part in reference.split(','))
+        return PLUS_CODE_SHORT, format_location(*recover_nearest(match.group(1), lat, lng))
+    return TEXT, geocode(text)
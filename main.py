@@ -9,33 +9,283 @@ Before running this script, ensure the following environment variables are set:
 - API_KEY: Your Google Maps API key for accessing the Geocoding and Places APIs.
 - FLASK_PORT (optional): Port number for running the Flask app (default: 8080).
 
+Importing this module sets nothing up. ``create_app(config)`` builds the
+components (HTTP session, caches, stores, worker pools, logging) into
+``components`` and returns the Flask app; ``main.app`` creates it on first
+access. Functions used without an app read ``components``, which then
+configures itself from the environment on first use.
+
 Author: William McDaniel
 Date: 8/12/2023
 Version: 1.0.0
 """
 
+import atexit
+import contextvars
+import hmac
 import logging
-from dotenv import load_dotenv
-from urllib.parse import urlencode
-from flask import Flask, request
-import requests
-import os
-from twilio.twiml.messaging_response import MessagingResponse
+from functools import wraps
+from urllib.parse import urlencode, urlsplit
+from flask import Blueprint, Flask, Response, make_response, request
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from zoneinfo import ZoneInfo
+import cache_snapshot
+from async_reply import SearchJob, SearchWorkerPool, TwilioSender
+from circuit_breaker import CircuitBreaker, CircuitOpen
+from config import Config
+from deadline import Deadline, DeadlineExceeded
+from gazetteer import Gazetteer
+from geocode_cache import GeocodeCache, normalize_address
+from http_client import HttpClient
+from idempotency import MemoryIdempotencyStore, SQLiteIdempotencyStore
+from local_index import load_index
+from location_input import resolve as resolve_location
+from metrics import REGISTRY
+from place_details import FIELDS as DETAILS_FIELDS, DetailsEnricher, trim as trim_details
+from places_cache import PlacesCache, PlacesPage, parse_location, split_keywords
+from profiling import CPROFILE, RequestProfiler
+from ranking import format_distance, place_key, rank
+from scheduler import QuotaExceeded, QuotaScheduler, caller, current_phone
+from session_store import MemorySessionStore, SQLiteSessionStore
+from sms_format import CompactFormatter, segments
+from singleflight import SingleFlight
+from structured_logging import parse_sample_rates, set_level, setup_logging
+
+routes = Blueprint('sms', __name__)
+request_log = logging.getLogger('sms')
+upstream_log = logging.getLogger('upstream')
+
+# What str(MessagingResponse()) renders, without importing twilio for it.
+EMPTY_TWIML = '<?xml version="1.0" encoding="UTF-8"?><Response />'
+
+class Components:
+    """The settings and the components ``configure`` builds from them.
+    Reading one before anything was configured configures from the
+    environment, so module functions work without ``create_app``."""
+
+    def __getattr__(self, name):
+        # Only reached for names not set yet.
+        if name.startswith('__') or 'settings' in vars(self):
+            raise AttributeError(name)
+        configure()
+        return object.__getattribute__(self, name)
+
+
+components = Components()
+_configure_lock = threading.RLock()
+_snapshot_saver_registered = False
+
+
+def configure(config=None):
+    """Builds the module's components from ``config`` into ``components``.
+    Without a config, the first call reads ``Config.from_env()`` and later
+    calls do nothing. A new config closes what the previous one built."""
+    with _configure_lock:
+        if config is None:
+            if 'settings' in vars(components):
+                return components.settings
+            config = Config.from_env()
+        close_components()
+        # Set first, so a read of a component not built yet fails instead of configuring again.
+        components.settings = config
+
+        components.log_pipeline = setup_logging(
+            config.log_level,
+            config.log_format,
+            sample_rates=parse_sample_rates(config.log_sample_rates),
+            max_field_length=config.log_max_field_length,
+            queue_size=config.log_queue_size,
+        )
+
+        components.account_sid = config.twilio_account_sid
+        components.auth_token = config.twilio_auth_token
+        components.radius = config.radius_meters
+        components.num_results = config.num_results
+        components.api_key = config.api_key
+        components.geocode_api_url = config.geocode_api_url
+        components.places_url = config.places_api_url
+        components.twilio_phone_number = config.twilio_phone_number
+        components.async_reply_enabled = config.async_reply
+        components.places_backend = config.places_backend
+        components.local_index_path = config.local_index_path
+        components.request_deadline = config.request_deadline
+        components.deadline_min_stage = config.deadline_min_stage
+        components.reply_format = config.reply_format
+
+        if config.session_store == 'sqlite':
+            components.session_store = SQLiteSessionStore(config.session_db_path, ttl=config.session_ttl)
+            components.webhook_responses = SQLiteIdempotencyStore(
+                config.session_db_path,
+                ttl=config.idempotency_ttl,
+                wait_timeout=config.idempotency_wait,
+            )
+        else:
+            components.session_store = MemorySessionStore(ttl=config.session_ttl,
+                                                          max_entries=config.session_max_entries)
+            components.webhook_responses = MemoryIdempotencyStore(
+                ttl=config.idempotency_ttl,
+                max_entries=config.idempotency_max_entries,
+                wait_timeout=config.idempotency_wait,
+            )
+
+        components.http_client = HttpClient(
+            pool_size=config.http_pool_size,
+            connect_timeout=config.http_connect_timeout,
+            read_timeout=config.http_read_timeout,
+            max_retries=config.http_max_retries,
+            hedging=config.http_hedging,
+            hedge_ratio=config.http_hedge_ratio,
+            hedge_min_delay=config.http_hedge_min_delay,
+        )
+
+        components.circuit_breakers = {}
+
+        # Keys match the endpoint label make_api_request derives from the URL path.
+        components.api_scheduler = QuotaScheduler(
+            {
+                'geocode': (config.quota_geocode_qps, config.quota_geocode_daily),
+                'nearbysearch': (config.quota_places_qps, config.quota_places_daily),
+                'details': (config.quota_details_qps, config.quota_details_daily),
+            },
+            max_wait=config.quota_max_wait,
+            tz=ZoneInfo(config.quota_timezone),
+        )
+
+        components.request_coalescer = SingleFlight(lock_dir=config.coalesce_lock_dir or None,
+                                                    lock_wait=config.coalesce_lock_wait)
+
+        components.geocode_cache = GeocodeCache(
+            max_size=config.geocode_cache_size,
+            ttl=config.geocode_cache_ttl,
+            negative_ttl=config.geocode_cache_negative_ttl,
+            path=config.geocode_cache_path or None,
+        )
+
+        components.places_cache = PlacesCache(
+            max_size=config.places_cache_size,
+            ttl=config.places_cache_ttl,
+            precision=config.places_cache_precision,
+            coalescer=components.request_coalescer,
+            stale_ttl=config.places_cache_stale_ttl,
+        )
+
+        components.gazetteer = Gazetteer(config.gazetteer_path) if config.gazetteer_path else None
+        components.local_index = None
 
-app = Flask(__name__)
+        components.max_keywords = config.max_keywords
+        components.adaptive_radius = config.adaptive_radius
+        components.radius_tiers = tuple(sorted(int(tier) for tier in config.radius_tiers.split(',') if tier.strip()))
+        components.keyword_fanout = ThreadPoolExecutor(max_workers=config.keyword_fanout_workers,
+                                                       thread_name_prefix='keyword-fanout')
+        components.place_details_enabled = config.place_details
+        components.place_details_url = config.place_details_api_url
+        components.details_enricher = DetailsEnricher(
+            fetch_place_details,
+            workers=config.place_details_workers,
+            budget=config.place_details_budget,
+            cache_size=config.place_details_cache_size,
+            ttl=config.place_details_cache_ttl,
+        )
+        components.compact_formatter = CompactFormatter(config.sms_segment_budget, distance_format=format_distance)
 
-# Load environment variables
-load_dotenv()
-logging.basicConfig(level=logging.DEBUG)
+        components.search_workers = SearchWorkerPool(
+            search_reply,
+            TwilioSender(config.twilio_account_sid, config.twilio_auth_token, config.twilio_phone_number),
+            workers=config.async_reply_workers,
+            max_queue=config.async_reply_queue_size,
+        )
 
-account_sid = os.environ.get('TWILIO_ACCOUNT_SID')
-auth_token = os.environ.get('TWILIO_AUTH_TOKEN')
-radius = os.getenv('RADIUS_METERS')
-api_key = os.environ.get('API_KEY')
-geocode_api_url = os.environ.get('GEOCODE_API_URL')
-places_url = os.getenv('PLACES_API_URL')
+        components.profiler = RequestProfiler(
+            size=config.profile_buffer_size,
+            sample_rate=config.profile_sample_rate,
+            default_mode=config.profile_mode,
+            interval=config.profile_interval,
+        )
 
-user_state = {}
+        REGISTRY.sample_rate = config.metrics_sample_rate
+        return config
+
+
+def close_components():
+    """Stops the threads and closes the connections of the current
+    components, if any were built, and forgets them."""
+    built = vars(components)
+    if 'settings' not in built:
+        return
+    for name in ('search_workers', 'details_enricher'):
+        if name in built:
+            built[name].shutdown()
+    if 'keyword_fanout' in built:
+        built['keyword_fanout'].shutdown(wait=False)
+    for name in ('http_client', 'session_store', 'webhook_responses', 'geocode_cache'):
+        if name in built:
+            built[name].close()
+    if 'log_pipeline' in built:
+        built['log_pipeline'].stop()
+    built.clear()
+
+
+def create_app(config=None):
+    """Returns a Flask app serving the webhook. Configures the module from
+    ``config`` (default: the environment) and, with CACHE_SNAPSHOT_PATH set,
+    warms the caches from the snapshot and saves it again at exit."""
+    global _snapshot_saver_registered
+    config = configure(config)
+    flask_app = Flask(__name__)
+    flask_app.register_blueprint(routes)
+    if config.cache_snapshot_path:
+        start = time.perf_counter()
+        loaded = cache_snapshot.load(config.cache_snapshot_path, components.geocode_cache, components.places_cache)
+        logging.info(f"Loaded {loaded} cache entries from {config.cache_snapshot_path} "
+                     f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+        if not _snapshot_saver_registered:
+            _snapshot_saver_registered = True
+            atexit.register(save_cache_snapshot)
+    return flask_app
+
+
+def save_cache_snapshot():
+    settings = vars(components).get('settings')
+    if settings is None or not settings.cache_snapshot_path:
+        return
+    try:
+        saved = cache_snapshot.save(settings.cache_snapshot_path, components.geocode_cache, components.places_cache,
+                                    settings.cache_snapshot_size)
+        logging.info(f"Saved {saved} cache entries to {settings.cache_snapshot_path}")
+    except OSError as e:
+        logging.warning(f"Could not save the cache snapshot: {str(e)}")
+
+
+def __getattr__(name):
+    # ``main.app`` (gunicorn main:app, tests) builds the app on first use.
+    if name == 'app':
+        with _configure_lock:
+            if 'app' not in globals():
+                globals()['app'] = create_app()
+        return globals()['app']
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+stage_seconds = REGISTRY.histogram('sms_stage_seconds', 'Time spent in each stage of the SMS pipeline.', ('stage',))
+upstream_responses = REGISTRY.counter('upstream_responses_total', 'Google API HTTP responses by status code.',
+                                      ('endpoint', 'code'))
+google_statuses = REGISTRY.counter('google_api_status_total', 'Google API response status values.',
+                                   ('endpoint', 'status'))
+sms_transitions = REGISTRY.counter('sms_transitions_total', 'Conversation state transitions.',
+                                   ('from_state', 'to_state'))
+deadline_misses = REGISTRY.counter('deadline_misses_total',
+                                   'Upstream calls skipped or cut short by the request deadline.', ('stage',))
+sms_segments = REGISTRY.histogram('sms_reply_segments', 'SMS segments per reply by encoding.', ('encoding',),
+                                  buckets=(1, 2, 3, 4, 5, 6, 8, 10))
+location_inputs = REGISTRY.counter('location_inputs_total',
+                                   'Location replies by input kind and whether they needed geocoding.',
+                                   ('kind', 'source'))
+radius_tiers_chosen = REGISTRY.counter('places_radius_tier_total', 'Radius tier used by adaptive searches.',
+                                       ('radius',))
+sms_errors = REGISTRY.counter('sms_errors_total', 'Search errors by the conversation state that triggered them.',
+                              ('state',))
 
 
 class UserState:
@@ -52,31 +302,113 @@ class ResponseError(Exception):
         self.message = message
 
 
-def make_api_request(url):
+def get_breaker(endpoint):
+    breaker = components.circuit_breakers.get(endpoint)
+    if breaker is None:
+        breaker = components.circuit_breakers.setdefault(endpoint, CircuitBreaker(
+            endpoint,
+            failure_rate=components.settings.breaker_failure_rate,
+            slow_call_seconds=components.settings.breaker_slow_call_seconds,
+            slow_call_rate=components.settings.breaker_slow_call_rate,
+            window_seconds=components.settings.breaker_window_seconds,
+            min_calls=components.settings.breaker_min_calls,
+            open_seconds=components.settings.breaker_open_seconds,
+        ))
+    return breaker
+
+
+# Google statuses that mean the upstream itself is unhealthy, as opposed to a bad query.
+UPSTREAM_FAILURE_STATUSES = ('OVER_QUERY_LIMIT', 'UNKNOWN_ERROR')
+
+
+def make_api_request(url, deadline=None):
+    endpoint = urlsplit(url).path.rstrip('/').split('/')[-2]
+    if deadline is not None:
+        try:
+            deadline.check(endpoint, components.deadline_min_stage)
+        except DeadlineExceeded:
+            deadline_misses.inc(endpoint)
+            raise
+    breaker = get_breaker(endpoint)
+    # These raise before any network I/O so callers can degrade to cached or local answers.
+    breaker.before_call()
+
+    def quota_wait():
+        if deadline is None:
+            return None
+        max_wait = components.api_scheduler.max_wait
+        return deadline.remaining() if max_wait is None else min(max_wait, deadline.remaining())
+
+    def acquire_again():
+        # Retries and hedges are requests Google charges for too.
+        try:
+            components.api_scheduler.acquire(endpoint, quota_wait())
+        except QuotaExceeded:
+            return False
+        return True
+
     try:
-        response = requests.get(url)
+        components.api_scheduler.acquire(endpoint, quota_wait())
+    except QuotaExceeded:
+        breaker.cancel()
+        raise
+    start = time.perf_counter()
+    failed = True
+    try:
+        response = components.http_client.get(url, deadline, acquire_again)
+        upstream_responses.inc(endpoint, response.status_code)
         if response.status_code not in range(200, 299):
             raise ResponseError("API returned non-200 status code")
         else:
             data = response.json()
+        status = data.get('status', 'UNKNOWN')
+        google_statuses.inc(endpoint, status)
+        failed = status in UPSTREAM_FAILURE_STATUSES
+        if upstream_log.isEnabledFor(logging.DEBUG):
+            upstream_log.debug('upstream response', extra={'fields': {
+                'endpoint': endpoint, 'code': response.status_code, 'status': status,
+                'ms': round((time.perf_counter() - start) * 1000, 1), 'url': url, 'payload': data}})
         return data
     except Exception as e:
+        if deadline is not None and deadline.expired():
+            # Cut short by our own deadline, which says nothing about the upstream's health.
+            failed = None
+            deadline_misses.inc(endpoint)
+            raise DeadlineExceeded(endpoint) from e
         error_message = f"An error occurred: {str(e)}"
         logging.error(error_message)
         return error_message
+    finally:
+        if failed is None:
+            breaker.cancel()
+        else:
+            breaker.record(not failed, time.perf_counter() - start)
 
 
-def get_json_data(user_address):
-    data_type = 'json'
-    endpoint = f'https://maps.googleapis.com/maps/api/geocode/{data_type}'
-    params = {'address': user_address, 'key': api_key}
-    url_params = urlencode(params)
-    url = f'{endpoint}?{url_params}'
+@REGISTRY.timed(stage_seconds, 'get_json_data')
+def get_json_data(user_address, deadline=None):
+    cached = components.geocode_cache.get(user_address)
+    if cached is not None:
+        return cached
 
-    data = make_api_request(url)
-    return data
+    def fetch():
+        params = {'address': user_address, 'key': components.api_key}
+        url_params = urlencode(params)
+        url = f'{components.geocode_api_url}?{url_params}'
+
+        data = make_api_request(url, deadline)
+        components.geocode_cache.set(user_address, data)
+        return data
+
+    # Only the SQLite tier is shared with other workers, so only it is worth rechecking.
+    recheck = None
+    if components.geocode_cache.disk is not None:
+        recheck = lambda: components.geocode_cache.get(user_address)
+    return components.request_coalescer.do(('geocode', normalize_address(user_address)), fetch, recheck=recheck,
+                                           deadline=deadline)
 
 
+@REGISTRY.timed(stage_seconds, 'get_lat_long')
 def get_lat_long(data):
     if data['status'] == 'OK':
         results = data['results']
@@ -86,46 +418,405 @@ def get_lat_long(data):
             longitude = location['lng']
             return f"{latitude}, {longitude}"
         else:
-            print("results == None. Line 86: No results found")
+            logging.warning("Geocoding returned no results")
     else:
-        print("Error on line 84: Geocoding was not successful for the following reason: ", data['status'])
+        logging.warning("Geocoding was not successful for the following reason: %s", data['status'])
+
+
+def fetch_places(location, keyword, radius_meters=None, deadline=None):
+    radius_meters = radius_meters or components.radius
+
+    def fetch():
+        params = {'location': location, 'radius': radius_meters, 'keyword': keyword, 'key': components.api_key}
+        url_params = urlencode(params)
+        search_url = f'{components.places_url}?{url_params}'
+
+        search_data = make_api_request(search_url, deadline)
+
+        if search_data['status'] == 'OK':
+            return PlacesPage(search_data.get('results', []), search_data.get('next_page_token'))
+        elif search_data['status'] == 'ZERO_RESULTS':
+            return PlacesPage()
+        else:
+            raise ResponseError("Geocode API returned non-200 status code")
+
+    if components.places_backend == 'local':
+        return local_search(location, keyword, radius_meters)
+    try:
+        return components.places_cache.get_or_fetch(location, keyword, radius_meters, fetch, deadline)
+    except (QuotaExceeded, CircuitOpen, DeadlineExceeded) as e:
+        stale = components.places_cache.get_stale(location, keyword, radius_meters)
+        if stale is not None:
+            logging.warning(f"{str(e)}; answering from expired cache")
+            return stale
+        if not components.local_index_path:
+            raise
+        logging.warning(f"{str(e)}; answering from the local index")
+        return local_search(location, keyword, radius_meters)
+    except Exception as e:
+        if components.places_backend != 'auto' or not components.local_index_path:
+            raise
+        logging.warning(f"Places API failed, answering from the local index: {str(e)}")
+        return local_search(location, keyword, radius_meters)
+
+
+def fetch_next_page(token, deadline=None):
+    cached = components.places_cache.get_page(token)
+    if cached is not None:
+        return cached
+
+    def fetch():
+        url = f"{components.places_url}?{urlencode({'pagetoken': token, 'key': components.api_key})}"
+        for attempt in range(3):
+            data = make_api_request(url, deadline)
+            if not isinstance(data, dict):
+                raise ResponseError(data)
+            # A fresh token is rejected for the first couple of seconds after it is issued.
+            if data['status'] != 'INVALID_REQUEST' or attempt == 2:
+                break
+            if deadline is not None and deadline.remaining() < 1 + components.deadline_min_stage:
+                break
+            time.sleep(1)
+        if data['status'] == 'ZERO_RESULTS':
+            page = PlacesPage()
+        elif data['status'] == 'OK':
+            page = PlacesPage(data.get('results', []), data.get('next_page_token'))
+        else:
+            raise ResponseError(f"Places API returned {data['status']} for the next page")
+        components.places_cache.set_page(token, page)
+        return page
+
+    return components.request_coalescer.do(('places_page', token), fetch, deadline=deadline)
+
+
+def prefetch_next_pages(tokens):
+    def prefetch(token):
+        try:
+            fetch_next_page(token)
+        except Exception as e:
+            logging.warning(f"Prefetching the next Places page failed: {str(e)}")
+
+    for token in tokens.values():
+        if components.places_cache.get_page(token) is None:
+            components.keyword_fanout.submit(contextvars.copy_context().run, prefetch, token)
 
 
-def nearby_search(location, keyword, max_results=5):
-    search_data_type = 'json'
-    search_endpoint = f'https://maps.googleapis.com/maps/api/place/nearbysearch/{search_data_type}'
-    params = {'location': location, 'radius': 8047, 'keyword': keyword, 'key': api_key}
-    url_params = urlencode(params)
-    search_url = f'{search_endpoint}?{url_params}'
+def fetch_place_details(place_id):
+    # No request deadline: a lookup that outlives the reply's budget still fills the cache for the next one.
+    params = {'place_id': place_id, 'fields': DETAILS_FIELDS, 'key': components.api_key}
+    data = make_api_request(f'{components.place_details_url}?{urlencode(params)}')
+    if not isinstance(data, dict):
+        raise ResponseError(data)
+    if data['status'] == 'OK':
+        return trim_details(data.get('result') or {})
+    if data['status'] in ('NOT_FOUND', 'ZERO_RESULTS'):
+        return {}
+    raise ResponseError(f"Place Details returned {data['status']}")
+
+
+@REGISTRY.timed(stage_seconds, 'place_details')
+def enrich_places(results, max_results, deadline=None):
+    """Adds phone numbers and today's hours to the first ``max_results``
+    results, as far as they arrive within PLACE_DETAILS_BUDGET."""
+    if not components.place_details_enabled or not results:
+        return results
+    budget = components.settings.place_details_budget
+    if deadline is not None:
+        budget = min(budget, deadline.remaining() - components.deadline_min_stage)
+    return components.details_enricher.enrich(results[:max_results], budget) + results[max_results:]
+
+
+local_index_lock = threading.Lock()
+
+
+def get_local_index():
+    if components.local_index is None:
+        with local_index_lock:
+            if components.local_index is None:
+                components.local_index = load_index(components.local_index_path)
+    return components.local_index
+
+
+def local_search(location, keyword, radius_meters):
+    coordinates = parse_location(location)
+    if coordinates is None:
+        raise ResponseError(f"Cannot search the local index around {location}")
+    return get_local_index().query(*coordinates, radius_meters, keyword)
+
+
+@REGISTRY.timed(stage_seconds, 'format_places')
+def format_places(results, max_results=5):
     formatted_text = "Nearby places:\n"
+    for result in results[:max_results]:
+        name = result['name']
+        address = result['vicinity']
+        opening_hours = result.get('opening_hours', [])
+        if opening_hours:
+            hours = 'Open' if opening_hours.get('open_now', False) else 'Closed'
+        else:
+            hours = 'N/A'
+        if 'hours_today' in result:
+            hours = result['hours_today'] if hours == 'N/A' else f"{hours}, today {result['hours_today']}"
+        rating = result.get('rating', 'N/A')
+        formatted_text += f'Name: {name}\nAddress: {address}\n'
+        if 'phone' in result:
+            formatted_text += f"Phone: {result['phone']}\n"
+        if 'distance_meters' in result:
+            formatted_text += f"Distance: {format_distance(result['distance_meters'])}\n"
+        formatted_text += f'Hours: {hours}\nRating: {rating}\n'
+    return formatted_text
 
-    search_data = make_api_request(search_url)
 
-    if search_data['status'] == 'OK':
-        results = search_data.get('results', [])[:max_results]
-        for result in results:
-            name = result['name']
-            address = result['vicinity']
-            opening_hours = result.get('opening_hours', [])
-            if opening_hours:
-                hours = 'Open' if opening_hours.get('open_now', False) else 'Closed'
-            else:
-                hours = 'N/A'
-            rating = result.get('rating', 'N/A')
-            formatted_text += f'Name: {name}\nAddress: {address}\nHours: {hours}\nRating: {rating}\n'
-        return formatted_text
+def render_places(results, max_results=5):
+    """Returns the reply text for ``results`` and how many of them it shows.
+    The compact format may show fewer than ``max_results`` to stay within
+    the segment budget."""
+    if components.reply_format == 'compact':
+        return components.compact_formatter.pack(results, max_results, generate_continue_search_message())
+    return format_places(results, max_results), min(len(results), max_results)
+
+
+def fan_out(fn, keys, *args):
+    """Calls ``fn(key, *args)`` for every key concurrently. Returns the
+    results of the calls that succeeded by key; raises only if all failed."""
+    # copy_context carries the caller's phone number into the fan-out threads for quota fairness.
+    futures = {key: components.keyword_fanout.submit(contextvars.copy_context().run, fn, key, *args) for key in keys}
+    results = {}
+    errors = []
+    for key, future in futures.items():
+        try:
+            results[key] = future.result()
+        except Exception as e:
+            logging.warning(f"Search for {key} failed: {str(e)}")
+            errors.append(e)
+    if not results:
+        raise errors[0]
+    return results
+
+
+def fetch_keywords(location, keywords, deadline=None):
+    """Runs one Places search per keyword concurrently and returns the
+    pages of the searches that succeeded by keyword."""
+    return fan_out(lambda keyword: fetch_places(location, keyword, None, deadline), keywords)
+
+
+def fetch_radius_tiers(location, keywords, deadline=None):
+    """Returns ``(radius, pages by keyword)`` for the tightest of
+    ``radius_tiers`` that finds at least ``num_results`` places, or else the
+    widest that could be searched.
+
+    Tiers already cached for the location cell are used without a call. The
+    rest are searched one at a time, each tier's keywords concurrently, and a
+    wider tier is only searched while the places found are too few, so a
+    dense area costs one call per keyword. A tier whose searches all fail
+    ends the widening."""
+    def count(pages):
+        return len({place_key(result) for page in pages.values() for result in page})
+
+    chosen = None
+    tiers = list(components.radius_tiers)
+    while tiers:
+        cached = {keyword: components.places_cache.get(location, keyword, tiers[0]) for keyword in keywords}
+        if components.places_backend == 'local' or None in cached.values():
+            break
+        chosen = (tiers.pop(0), cached)
+        if count(cached) >= components.num_results:
+            return chosen
+
+    for tier in tiers:
+        try:
+            pages = fan_out(lambda keyword, radius: fetch_places(location, keyword, radius, deadline), keywords, tier)
+        except Exception:
+            # Quota, breaker and deadline failures would stop the wider tiers too.
+            if chosen is None:
+                raise
+            break
+        chosen = (tier, pages)
+        if count(pages) >= components.num_results:
+            break
+    return chosen
+
+
+@REGISTRY.timed(stage_seconds, 'rank')
+def rank_places(result_lists, location, max_results, radius_meters=None):
+    return rank(result_lists, max_results, parse_location(location), radius_meters or components.radius)
+
+
+def compact_place(result):
+    """The fields format_places needs, small enough to keep in the session."""
+    place = {'name': result['name'], 'vicinity': result['vicinity']}
+    for field in ('place_id', 'rating', 'distance_meters', 'phone', 'hours_today'):
+        if field in result:
+            place[field] = result[field]
+    if result.get('opening_hours'):
+        place['opening_hours'] = {'open_now': bool(result['opening_hours'].get('open_now'))}
+    return place
+
+
+def remember_results(session, location, candidates, tokens, shown, radius_meters=None):
+    """Stores the ranked candidates after the ``shown`` ones, and the
+    next-page tokens by keyword, for the "more" command."""
+    session['more'] = {
+        'location': location,
+        'radius': radius_meters or components.radius,
+        'results': [compact_place(result) for result in candidates[shown:]],
+        'tokens': tokens,
+        'seen': [place_key(result) for result in candidates[:shown] if result.get('place_id')],
+    }
+
+
+@REGISTRY.timed(stage_seconds, 'nearby_search')
+def nearby_search(location, keyword, max_results=5, deadline=None, session=None):
+    keywords = split_keywords(keyword, components.max_keywords)
+    radius_meters = components.radius
+    if components.adaptive_radius and components.radius_tiers:
+        radius_meters, pages = fetch_radius_tiers(location, keywords, deadline)
+        radius_tiers_chosen.inc(radius_meters)
+    elif len(keywords) == 1:
+        pages = {keyword: fetch_places(location, keyword, deadline=deadline)}
     else:
-        raise ResponseError("Geocode API returned non-200 status code")
+        pages = fetch_keywords(location, keywords, deadline)
+    if not any(pages.values()):
+        return f'No places found for "{keyword}" near that address.'
+    if session is None:
+        ranked = rank_places(list(pages.values()), location, max_results, radius_meters)
+        return render_places(enrich_places(ranked, max_results, deadline), max_results)[0]
 
+    candidates = rank_places(list(pages.values()), location, sum(len(page) for page in pages.values()),
+                             radius_meters)
+    candidates = enrich_places(candidates, max_results, deadline)
+    tokens = {keyword: page.next_page_token for keyword, page in pages.items()
+              if getattr(page, 'next_page_token', None)}
+    text, shown = render_places(candidates, max_results)
+    remember_results(session, location, candidates, tokens, shown, radius_meters)
+    return text
 
-def set_user_state(user_phone_number, state, keyword=None):
-    user_state[user_phone_number] = {'state': state}
+
+def more_results(session, deadline=None):
+    """Serves the next slice of the stored candidates. Later Places pages are
+    fetched only once the stored list runs short, and prefetched in the
+    background when it is about to."""
+    more = session.get('more')
+    if not more:
+        return 'There are no more results for this search.'
+    if len(more['results']) < components.num_results and more['tokens']:
+        more['results'] += next_page_candidates(more, deadline)
+    more['results'] = enrich_places(more['results'], components.num_results, deadline)
+    text, count = render_places(more['results'], components.num_results)
+    shown = more['results'][:count]
+    more['results'] = more['results'][count:]
+    more['seen'] += [place['place_id'] for place in shown if 'place_id' in place]
+    if not more['results'] and not more['tokens']:
+        del session['more']
+    elif len(more['results']) < 2 * components.num_results and more['tokens']:
+        prefetch_next_pages(more['tokens'])
+    if not shown:
+        return 'There are no more results for this search.'
+    return text
+
+
+def next_page_candidates(more, deadline=None):
+    try:
+        pages = fan_out(lambda keyword: fetch_next_page(more['tokens'][keyword], deadline), list(more['tokens']))
+    except Exception as e:
+        logging.warning(f"Fetching more Places results failed: {str(e)}")
+        more['tokens'] = {}
+        return []
+    more['tokens'] = {keyword: page.next_page_token for keyword, page in pages.items() if page.next_page_token}
+    seen = set(more['seen']) | {place.get('place_id') for place in more['results']}
+    candidates = rank_places(list(pages.values()), more['location'], sum(len(page) for page in pages.values()),
+                             more.get('radius'))
+    return [compact_place(result) for result in candidates if result.get('place_id') not in seen]
+
+
+def geocode_address(address, deadline=None):
+    if components.gazetteer is not None:
+        location = components.gazetteer.lookup(address)
+        if location is not None:
+            return location
+    data = get_json_data(address, deadline)
+    return get_lat_long(data)
+
+
+def geocode(address, deadline=None):
+    """Decodes coordinates, maps links and plus codes locally and geocodes
+    only what is left."""
+    geocoded = []
+
+    def lookup(text):
+        geocoded.append(text)
+        return geocode_address(text, deadline)
+
+    kind, location = resolve_location(address, lookup)
+    location_inputs.inc(kind, 'geocoded' if geocoded else 'local')
+    return location
+
+
+def search_businesses(address, keyword, deadline=None, session=None):
+    location = geocode(address, deadline)
+    return nearby_search(str(location), keyword, components.num_results, deadline, session)
+
+
+def search_reply(address, keyword, state, phone, deadline=None, received_at=None, session=None):
+    """Searches and returns the reply text. Candidates for "more" are stored
+    in ``session``, or in the phone's session when run by a background worker."""
+    found = {}
+    try:
+        with caller(phone):
+            response = search_businesses(address, keyword, deadline, found)
+        if session is not None:
+            session.update(found)
+        else:
+            with components.session_store.transaction(phone) as user_state_info:
+                if user_state_info.get('state') == UserState.SEARCHING_CONTINUE:
+                    user_state_info.update(found)
+    except DeadlineExceeded as e:
+        logging.warning(f"{str(e)}; finishing the search in the background")
+        if defer_search(phone, address, keyword, received_at, state):
+            return generate_searching_message()
+        error_message = f"An error occurred: {str(e)}"
+        sms_errors.inc(state)
+        response = error_message
+    except Exception as e:
+        error_message = f"An error occurred: {str(e)}"
+        logging.error(error_message)
+        sms_errors.inc(state)
+        response = error_message
+    return response + "\n\n" + generate_continue_search_message()
+
+
+def defer_search(user_phone_number, address, keyword, received_at, state):
+    """Queues the search for the background workers, which text the results;
+    returns False if the queue is full."""
+    job = SearchJob(user_phone_number, request.form.get('To') or components.twilio_phone_number, address, keyword,
+                    received_at, context={'state': state, 'phone': user_phone_number})
+    return components.search_workers.submit(job)
+
+
+def enqueue_search(user_phone_number, address, keyword, received_at, state, deadline=None, session=None):
+    """``session`` is the webhook's open session; the inline fallback stores
+    results for "more" in it, as the phone's session lock is already held."""
+    if defer_search(user_phone_number, address, keyword, received_at, state):
+        return generate_searching_message()
+    # Queue is full, answer inline rather than dropping the search.
+    return search_reply(address, keyword, state, user_phone_number, deadline, received_at, session)
+
+
+def reset_user_state(user_state_info, state, keyword=None):
+    user_state_info.clear()
+    user_state_info['state'] = state
     if keyword:
-        user_state[user_phone_number]['keyword'] = keyword
+        user_state_info['keyword'] = keyword
+
+
+def set_user_state(user_phone_number, state, keyword=None):
+    user_state_info = {}
+    reset_user_state(user_state_info, state, keyword)
+    components.session_store.set(user_phone_number, user_state_info)
 
 
 def get_user_state(user_phone_number):
-    return user_state.get(user_phone_number, {})
+    return components.session_store.get(user_phone_number)
 
 
 def generate_welcome_message():
@@ -133,78 +824,309 @@ def generate_welcome_message():
 
 
 def generate_continue_search_message():
-    return 'Do you want to search for another business? Reply "yes" or "no".'
+    return 'Do you want to search for another business? Reply "yes" or "no", or "more" for more results.'
+
+
+def generate_searching_message():
+    return "Searching… we'll text you the results in a moment."
 
 
 def generate_goodbye_message():
     return 'Okay, goodbye.'
 
 
-@app.route("/sms", methods=['GET', 'POST'])
+def idempotent_webhook(view):
+    """Twilio retries a slow webhook with the same MessageSid; replay the first reply instead of
+    advancing the conversation again. A retry that gives up waiting gets an empty TwiML response."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.form.get('MessageSid')
+        if not key:
+            return view(*args, **kwargs)
+        return components.webhook_responses.run(key, lambda: view(*args, **kwargs), EMPTY_TWIML)
+    return wrapper
+
+
+def profiled(view):
+    """Runs the request under the profiler when an admin asks for it with an
+    X-Profile header (``sample`` or ``cprofile``) or PROFILE_SAMPLE_RATE picks
+    it. The profile's id is returned in X-Profile-Id."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        mode = components.profiler.mode_for(request.headers.get('X-Profile'), admin_authorized)
+        if mode is None:
+            return view(*args, **kwargs)
+        result, profile = components.profiler.profile(mode, lambda: view(*args, **kwargs),
+                                                      f'{request.method} {request.path}',
+                                                      request.form.get('MessageSid') or None)
+        response = make_response(result)
+        response.headers['X-Profile-Id'] = profile.id
+        return response
+    return wrapper
+
+
+def twiml_reply(text):
+    from twilio.twiml.messaging_response import MessagingResponse
+
+    resp = MessagingResponse()
+    resp.message(text)
+    return str(resp)
+
+
+@routes.route("/sms", methods=['GET', 'POST'])
+@profiled
+@idempotent_webhook
 def sms_reply():
+    received_at = time.perf_counter()
+    deadline = Deadline(components.request_deadline, started_at=received_at)
     user_phone_number = request.form['From']
     user_input = request.form['Body'].strip().lower()
+    # Google API calls made while handling this webhook count against this phone's fair share.
+    current_phone.set(user_phone_number)
 
-    user_state_info = get_user_state(user_phone_number)
-    user_state_info['address'] = user_input
+    with components.session_store.transaction(user_phone_number) as user_state_info:
+        from_state = user_state_info.get('state', 'new')
+        user_state_info['address'] = user_input
 
-    if 'state' not in user_state_info:
-        set_user_state(user_phone_number, UserState.waiting_for_address, user_input)
-        response = generate_welcome_message()
-    else:
-        state = user_state_info['state']
+        if 'state' not in user_state_info:
+            reset_user_state(user_state_info, UserState.waiting_for_address, user_input)
+            response = generate_welcome_message()
+        else:
+            state = user_state_info['state']
 
-        if state == UserState.waiting_for_address:
-            user_state_info['state'] = UserState.searching
-            user_address = user_state_info['address']
-            keyword = user_state_info.get('keyword')
+            if state == UserState.waiting_for_address:
+                user_state_info['state'] = UserState.searching
+                user_address = user_state_info['address']
+                keyword = user_state_info.get('keyword')
 
-            try:
-                data = get_json_data(user_address)
-                location = get_lat_long(data)
-                response = nearby_search(str(location), keyword)
-                response += "\n\n" + generate_continue_search_message()
-                set_user_state(user_phone_number, UserState.SEARCHING_CONTINUE)
-            except Exception as e:
-                error_message = f"An error occurred: {str(e)}"
-                logging.error(error_message)
-                return error_message
-        else:
-            if state == UserState.SEARCHING_CONTINUE:
-                if user_input == 'yes':
-                    user_state_info['state'] = UserState.SEARCHING_FOR_NEW_BUSINESS
-                    response = 'Great, what new business would you like to search for?'
-                elif user_input == 'no':
-                    response = generate_goodbye_message()
-                    user_state.pop(user_phone_number)
+                if components.async_reply_enabled:
+                    reset_user_state(user_state_info, UserState.SEARCHING_CONTINUE)
+                    response = enqueue_search(user_phone_number, user_address, keyword, received_at, state,
+                                              deadline, user_state_info)
                 else:
-                    response = 'Please reply with "yes" or "no".'
-            elif state == UserState.SEARCHING_FOR_NEW_BUSINESS:
-                user_state_info['new_business'] = user_input
-                user_state_info['state'] = UserState.SEARCHING_NEW_ADDRESS
-                response = 'What is your new address?'
-            elif state == UserState.SEARCHING_NEW_ADDRESS:
-                user_state_info['new_address'] = user_input
-                user_state_info['state'] = UserState.SEARCHING_RESULTS
-                new_business = user_state_info['new_business']
-                new_address = user_state_info['new_address']
-
-                try:
-                    data = get_json_data(new_address)
-                    location = get_lat_long(data)
-                    response = nearby_search(str(location), new_business)
-                except Exception as e:
-                    error_message = f"An error occurred: {str(e)}"
-                    logging.error(error_message)
-                    response = error_message
-
-                response += "\n\n" + generate_continue_search_message()
-                set_user_state(user_phone_number, UserState.SEARCHING_CONTINUE)
+                    try:
+                        found = {}
+                        response = search_businesses(user_address, keyword, deadline, found)
+                        response += "\n\n" + generate_continue_search_message()
+                        reset_user_state(user_state_info, UserState.SEARCHING_CONTINUE)
+                        user_state_info.update(found)
+                    except DeadlineExceeded as e:
+                        logging.warning(f"{str(e)}; finishing the search in the background")
+                        reset_user_state(user_state_info, UserState.SEARCHING_CONTINUE)
+                        response = enqueue_search(user_phone_number, user_address, keyword, received_at, state,
+                                                  deadline, user_state_info)
+                    except Exception as e:
+                        error_message = f"An error occurred: {str(e)}"
+                        logging.error(error_message)
+                        sms_errors.inc(state)
+                        return error_message
+            else:
+                if state == UserState.SEARCHING_CONTINUE:
+                    if user_input == 'yes':
+                        user_state_info['state'] = UserState.SEARCHING_FOR_NEW_BUSINESS
+                        response = 'Great, what new business would you like to search for?'
+                    elif user_input == 'no':
+                        response = generate_goodbye_message()
+                        user_state_info.clear()
+                    elif user_input == 'more':
+                        response = more_results(user_state_info, deadline)
+                        response += "\n\n" + generate_continue_search_message()
+                    else:
+                        response = 'Please reply with "yes", "no" or "more".'
+                elif state == UserState.SEARCHING_FOR_NEW_BUSINESS:
+                    user_state_info['new_business'] = user_input
+                    user_state_info['state'] = UserState.SEARCHING_NEW_ADDRESS
+                    response = 'What is your new address?'
+                elif state == UserState.SEARCHING_NEW_ADDRESS:
+                    user_state_info['new_address'] = user_input
+                    user_state_info['state'] = UserState.SEARCHING_RESULTS
+                    new_business = user_state_info['new_business']
+                    new_address = user_state_info['new_address']
 
-    resp = MessagingResponse()
-    resp.message(response)
-    return str(resp)
+                    if components.async_reply_enabled:
+                        reset_user_state(user_state_info, UserState.SEARCHING_CONTINUE)
+                        response = enqueue_search(user_phone_number, new_address, new_business, received_at, state,
+                                                  deadline, user_state_info)
+                    else:
+                        found = {}
+                        response = search_reply(new_address, new_business, state, user_phone_number, deadline,
+                                                received_at, found)
+                        reset_user_state(user_state_info, UserState.SEARCHING_CONTINUE)
+                        user_state_info.update(found)
+
+        sms_transitions.inc(from_state, user_state_info.get('state', 'ended'))
+
+    sampled = REGISTRY.sampled()
+    start = time.perf_counter()
+    count, encoding = segments(response)
+    sms_segments.observe(count, encoding)
+    twiml = twiml_reply(response)
+    if sampled:
+        stage_seconds.observe_since(start, 'twiml')
+    request_log.info('sms_reply', extra={'fields': {
+        'phone': user_phone_number, 'from_state': from_state, 'to_state': user_state_info.get('state', 'ended'),
+        'ms': round((time.perf_counter() - received_at) * 1000, 1), 'segments': count, 'encoding': encoding}})
+    return twiml
+
+
+def collect_component_stats():
+    geocode_stats = components.geocode_cache.stats()
+    places_stats = components.places_cache.stats()
+    session_stats = components.session_store.stats()
+    coalescer_stats = components.request_coalescer.stats()
+    quota_stats = components.api_scheduler.stats()
+    worker_stats = components.search_workers.stats()
+    collected = [
+        ('geocode_cache_hits_total', 'counter', 'Geocode cache hits by tier.',
+         [({'tier': tier}, tier_stats['hits']) for tier, tier_stats in geocode_stats.items()]),
+        ('geocode_cache_misses_total', 'counter', 'Geocode cache misses by tier.',
+         [({'tier': tier}, tier_stats['misses']) for tier, tier_stats in geocode_stats.items()]),
+        ('geocode_cache_evictions_total', 'counter', 'Geocode cache evictions by tier.',
+         [({'tier': tier}, tier_stats['evictions']) for tier, tier_stats in geocode_stats.items()]),
+        ('places_cache_api_calls_avoided_total', 'counter', 'Nearby Search calls answered from cache.',
+         [({}, places_stats['api_calls_avoided'])]),
+        ('places_cache_api_calls_total', 'counter', 'Nearby Search calls made on cache misses.',
+         [({}, places_stats['api_calls'])]),
+        ('http_client_retries_total', 'counter', 'Retried upstream requests.', [({}, components.http_client.retries)]),
+        ('http_client_p95_seconds', 'gauge', 'Recent p95 upstream latency by endpoint.',
+         [({'endpoint': endpoint}, recorder.percentile(95))
+          for endpoint, recorder in list(components.http_client.latency.items())]),
+        ('coalesced_requests_total', 'counter', 'Lookups that shared another caller\'s upstream call.',
+         [({'scope': 'thread'}, coalescer_stats['coalesced']),
+          ({'scope': 'process'}, coalescer_stats['coalesced_across_processes'])]),
+        ('sessions_active', 'gauge', 'Conversations held in the session store.',
+         [({}, session_stats['active_sessions'])]),
+        ('sessions_bytes', 'gauge', 'Approximate serialized size of all sessions.',
+         [({}, session_stats['approx_bytes'])]),
+        ('http_retries_skipped_total', 'counter', 'Retries dropped because the request deadline could not fit them.',
+         [({}, components.http_client.retries_skipped)]),
+        ('http_hedges_total', 'counter', 'Duplicate requests sent for slow upstream calls.',
+         [({}, components.http_client.hedges)]),
+        ('http_hedge_wins_total', 'counter', 'Hedged requests that answered before the original.',
+         [({}, components.http_client.hedge_wins)]),
+        ('circuit_breaker_state', 'gauge', 'Circuit breaker state, 1 for the current state.',
+         [({'endpoint': name, 'state': state}, int(breaker.state == state))
+          for name, breaker in list(components.circuit_breakers.items()) for state in ('closed', 'open', 'half_open')]),
+        ('circuit_breaker_transitions_total', 'counter', 'Circuit breaker state changes.',
+         [({'endpoint': name, 'from_state': old, 'to_state': new}, count)
+          for name, breaker in list(components.circuit_breakers.items())
+          for (old, new), count in list(breaker.transitions.items())]),
+        ('circuit_breaker_rejected_total', 'counter', 'Calls refused while a circuit was open.',
+         [({'endpoint': name}, breaker.rejected) for name, breaker in list(components.circuit_breakers.items())]),
+        ('quota_rejected_total', 'counter', 'Google API calls refused by the quota scheduler.',
+         [({'api': api, 'reason': reason}, stats[f'rejected_{reason}'])
+          for api, stats in quota_stats.items() for reason in ('budget', 'timeout')]),
+        ('quota_queue_wait_p95_seconds', 'gauge', 'Recent p95 time calls waited for quota.',
+         [({'api': api}, stats['queue_wait']['p95_seconds']) for api, stats in quota_stats.items()]),
+        ('quota_waiting', 'gauge', 'Calls currently queued for quota.',
+         [({'api': api}, stats['waiting']) for api, stats in quota_stats.items()]),
+        ('quota_budget_remaining', 'gauge', 'Calls left in today\'s budget.',
+         [({'api': api}, stats['budget_remaining']) for api, stats in quota_stats.items()]),
+        ('webhook_duplicates_total', 'counter', 'Retried webhook deliveries answered with the stored reply.',
+         [({}, components.webhook_responses.duplicates)]),
+        ('webhook_duplicate_waits_total', 'counter', 'Retried deliveries that waited for the first to finish.',
+         [({}, components.webhook_responses.waited)]),
+        ('webhook_duplicate_wait_timeouts_total', 'counter', 'Retried deliveries that gave up waiting.',
+         [({}, components.webhook_responses.wait_timeouts)]),
+        ('async_reply_queue_depth', 'gauge', 'Search jobs waiting for a worker.', [({}, worker_stats['queue_depth'])]),
+    ]
+    location_counts = location_inputs.series()
+    location_total = sum(location_counts.values())
+    if location_total:
+        local = sum(count for (_, source), count in location_counts.items() if source == 'local')
+        collected.append(('geocode_skipped_ratio', 'gauge', 'Share of location replies decoded without geocoding.',
+                          [({}, local / location_total)]))
+    log_stats = components.log_pipeline.stats()
+    collected.append(('log_records_dropped_total', 'counter', 'Log records dropped because the log queue was full.',
+                      [({}, log_stats['dropped'])]))
+    collected.append(('log_queue_depth', 'gauge', 'Log records waiting for the writer thread.',
+                      [({}, log_stats['queued'])]))
+    if components.gazetteer is not None:
+        collected.append(('gazetteer_hit_rate', 'gauge', 'Share of lookups answered by the local gazetteer.',
+                          [({}, components.gazetteer.stats()['hit_rate'])]))
+    if components.place_details_enabled:
+        details_stats = components.details_enricher.stats()
+        collected.append(('place_details_lookups_total', 'counter', 'Place Details lookups for replies by outcome.',
+                          [({'outcome': outcome}, details_stats[key]) for outcome, key in (
+                              ('cache_hit', 'cache_hits'), ('fetched', 'fetched'), ('timeout', 'timeouts'),
+                              ('error', 'errors'))]))
+        collected.append(('place_details_cache_hit_ratio', 'gauge', 'Share of Place Details answered from cache.',
+                          [({}, details_stats['hit_ratio'])]))
+    return collected
+
+
+REGISTRY.register_collector(collect_component_stats)
+
+
+def admin_authorized():
+    """Admin endpoints are enabled by setting ADMIN_TOKEN and called with it
+    in the X-Admin-Token header."""
+    token = components.settings.admin_token
+    return bool(token) and hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token)
+
+
+@routes.route("/admin/log-level", methods=['GET', 'POST'])
+def log_level():
+    if not admin_authorized():
+        return Response('Not found\n', status=404, mimetype='text/plain')
+    if request.method == 'POST':
+        sample_rate = None
+        if 'sample_rate' in request.values:
+            try:
+                sample_rate = float(request.values['sample_rate'])
+            except ValueError:
+                sample_rate = None
+            if sample_rate is None or not 0 <= sample_rate <= 1:
+                return Response('Invalid sample_rate: expected a number from 0 to 1\n', status=400,
+                                mimetype='text/plain')
+        try:
+            set_level(request.values['level'], request.values.get('logger') or None)
+        except (KeyError, ValueError) as e:
+            return Response(f'Invalid level: {str(e)}\n', status=400, mimetype='text/plain')
+        if sample_rate is not None:
+            components.log_pipeline.sampler.set_rate(request.values.get('logger') or 'root', sample_rate)
+    logger = logging.getLogger(request.values.get('logger') or None)
+    return Response(f'{logger.name} {logging.getLevelName(logger.getEffectiveLevel())}\n', mimetype='text/plain')
+
+
+@routes.route("/admin/profiles")
+def recent_profiles():
+    if not admin_authorized():
+        return Response('Not found\n', status=404, mimetype='text/plain')
+    return Response(''.join(profile.summary() + '\n' for profile in components.profiler.recent()),
+                    mimetype='text/plain')
+
+
+@routes.route("/admin/profiles/<profile_id>")
+def profile_dump(profile_id):
+    """``format`` is ``collapsed`` (flame-graph stacks), ``pstats`` (text
+    listing, ordered by ``sort``) or ``raw`` (a file ``pstats`` can load)."""
+    profile = components.profiler.get(profile_id) if admin_authorized() else None
+    if profile is None:
+        return Response('Not found\n', status=404, mimetype='text/plain')
+    output = request.args.get('format') or ('pstats' if profile.mode == CPROFILE else 'collapsed')
+    if output == 'raw':
+        data = profile.pstats_dump()
+        if data is not None:
+            return Response(data, mimetype='application/octet-stream',
+                            headers={'Content-Disposition': f'attachment; filename={profile_id}.prof'})
+    elif output == 'pstats':
+        try:
+            data = profile.pstats_text(request.args.get('sort', 'cumulative'))
+        except KeyError as e:
+            return Response(f'Invalid sort key: {str(e)}\n', status=400, mimetype='text/plain')
+    else:
+        data = profile.collapsed()
+    if data is None:
+        return Response(f'Profile {profile_id} was taken in {profile.mode} mode and has no {output} output\n',
+                        status=400, mimetype='text/plain')
+    return Response(data, mimetype='text/plain')
+
+
+@routes.route("/metrics")
+def metrics():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
 
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
+    create_app().run(debug=True, port=5000)
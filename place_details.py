@@ -0,0 +1,152 @@
+"""
+Place Details enrichment
+
+Nearby Search results carry no phone number and only ``open_now`` for hours.
+``DetailsEnricher`` looks up Place Details for the places about to be shown,
+all at once on a bounded thread pool, and waits at most ``budget`` seconds
+for them. Places whose details are not back by then are shown without; their
+lookups carry on in the background and fill the cache for the next reply.
+
+Phone numbers and weekly hours rarely change, so the raw details (phone,
+the week's ``weekday_text`` and ``utc_offset``) are cached for a long TTL by
+``place_id``. Which day is today is worked out again for every reply, so a
+cached entry stays right past the place's midnight. ``open_now`` is not taken
+from the cache; the Nearby Search result stays the source for whether a
+place is open.
+"""
+
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+
+from geocode_cache import LRUCache
+from sms_format import to_gsm
+
+# The Details fields asked for; Google bills Details requests by field group.
+FIELDS = 'formatted_phone_number,opening_hours,utc_offset'
+
+
+def trim(result):
+    """The parts of a Details ``result`` worth caching."""
+    details = {}
+    if result.get('formatted_phone_number'):
+        details['formatted_phone_number'] = result['formatted_phone_number']
+    weekday_text = (result.get('opening_hours') or {}).get('weekday_text')
+    if weekday_text:
+        details['opening_hours'] = {'weekday_text': weekday_text}
+    if result.get('utc_offset') is not None:
+        details['utc_offset'] = result['utc_offset']
+    return details
+
+
+def summarize(result, now=None):
+    """The fields of a Details ``result`` that replies use: ``phone`` and
+    ``hours_today``, today's opening hours in the place's time zone."""
+    details = {}
+    if result.get('formatted_phone_number'):
+        details['phone'] = result['formatted_phone_number']
+    weekday_text = (result.get('opening_hours') or {}).get('weekday_text')
+    if weekday_text and len(weekday_text) == 7:
+        now = now or datetime.now(timezone.utc)
+        if result.get('utc_offset') is not None:
+            now = now + timedelta(minutes=result['utc_offset'])
+        # weekday_text starts on Monday, as does datetime.weekday().
+        today = weekday_text[now.weekday()]
+        details['hours_today'] = to_gsm(today.split(': ', 1)[-1])
+    return details
+
+
+class DetailsEnricher:
+    """Adds ``summarize`` fields to results by ``place_id``. ``fetch(place_id)``
+    returns the Details result to cache (see ``trim``), ``{}`` for a place
+    without details, or raises."""
+
+    def __init__(self, fetch, workers=8, budget=1.0, cache_size=4096, ttl=86400):
+        self.fetch = fetch
+        self.budget = budget
+        self.cache = LRUCache(max_size=cache_size, ttl=ttl)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='place-details')
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.fetched = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.requests = 0
+        self.seconds = 0.0
+
+    def _lookup(self, place_id):
+        try:
+            details = self.fetch(place_id)
+            self.cache.set(place_id, details)
+            return details
+        finally:
+            with self._lock:
+                self._inflight.pop(place_id, None)
+
+    def _submit(self, place_id):
+        with self._lock:
+            future = self._inflight.get(place_id)
+            if future is None:
+                # copy_context carries the caller's phone number to the pool for quota fairness.
+                future = self.pool.submit(contextvars.copy_context().run, self._lookup, place_id)
+                self._inflight[place_id] = future
+            return future
+
+    def enrich(self, results, budget=None, now=None):
+        """Returns ``results`` with the details that were cached or arrived
+        within ``budget`` seconds (default: the enricher's) summarized as of
+        ``now`` and merged into copies."""
+        start = time.perf_counter()
+        found = {}
+        pending = {}
+        for result in results:
+            place_id = result.get('place_id')
+            if not place_id or place_id in found or place_id in pending:
+                continue
+            details = self.cache.get(place_id)
+            if details is not None:
+                found[place_id] = details
+            else:
+                pending[place_id] = self._submit(place_id)
+
+        fetched = timeouts = errors = 0
+        if pending:
+            done, _ = wait(pending.values(), timeout=max(0.0, self.budget if budget is None else budget))
+            for place_id, future in pending.items():
+                if future not in done:
+                    timeouts += 1
+                elif future.exception() is not None:
+                    errors += 1
+                else:
+                    fetched += 1
+                    found[place_id] = future.result()
+
+        with self._lock:
+            self.requests += 1
+            self.fetched += fetched
+            self.timeouts += timeouts
+            self.errors += errors
+            self.seconds += time.perf_counter() - start
+        now = now or datetime.now(timezone.utc)
+        found = {place_id: summarize(details, now) for place_id, details in found.items()}
+        return [dict(result, **found[result['place_id']]) if found.get(result.get('place_id')) else result
+                for result in results]
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False)
+
+    def stats(self):
+        cache_stats = self.cache.stats()
+        lookups = cache_stats['hits'] + cache_stats['misses']
+        return {
+            'cache_hits': cache_stats['hits'],
+            'cache_misses': cache_stats['misses'],
+            'hit_ratio': cache_stats['hits'] / lookups if lookups else 0.0,
+            'fetched': self.fetched,
+            'timeouts': self.timeouts,
+            'errors': self.errors,
+            'inflight': len(self._inflight),
+            'avg_seconds': self.seconds / self.requests if self.requests else 0.0,
+        }
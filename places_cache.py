@@ -0,0 +1,171 @@
+"""
+Places result cache
+
+Caches raw Nearby Search result records keyed on a geohash cell of the
+search location plus the normalized keyword and radius, so two users a block
+apart searching for the same thing within the TTL share one API call.
+Formatting and ``max_results`` are applied by the caller on every request.
+Later pages, fetched with a ``next_page_token``, are cached by token.
+"""
+
+import re
+import threading
+import time
+
+from geocode_cache import LRUCache
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def geohash(latitude, longitude, precision=6):
+    """Encodes a coordinate as a geohash string of ``precision`` characters."""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        value, bounds = (longitude, lng_range) if even else (latitude, lat_range)
+        mid = (bounds[0] + bounds[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            bounds[0] = mid
+        else:
+            bounds[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(chars)
+
+
+def parse_location(location):
+    """Parses a ``"lat, lng"`` string; returns None if it is not one."""
+    try:
+        lat, lng = (float(part) for part in str(location).split(','))
+    except ValueError:
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    return lat, lng
+
+
+def normalize_keyword(keyword):
+    return ' '.join(str(keyword or '').casefold().split())
+
+
+# "coffee or donuts", "coffee, donuts", "coffee / donuts". '&' and 'and' are left
+# alone since they are common inside business names ("bed & breakfast"), and so
+# is '/' without spaces around it ("24/7 gym", "bar/grill").
+_KEYWORD_SEPARATORS = re.compile(r'\s*(?:,|;|\||\bor\b)\s*|\s+/\s+')
+
+
+def split_keywords(text, limit=3):
+    """Splits an SMS body into at most ``limit`` distinct normalized keywords."""
+    keywords = []
+    for part in _KEYWORD_SEPARATORS.split(normalize_keyword(text)):
+        if part and part not in keywords:
+            keywords.append(part)
+    return keywords[:limit] or [normalize_keyword(text)]
+
+
+class PlacesPage(list):
+    """A page of Nearby Search results and the token for the page after it."""
+
+    def __init__(self, results=(), next_page_token=None):
+        super().__init__(results)
+        self.next_page_token = next_page_token
+
+
+class PlacesCache:
+    """LRU/TTL cache of raw Nearby Search results bucketed by location cell."""
+
+    def __init__(self, max_size=2048, ttl=300, precision=6, coalescer=None, stale_ttl=0):
+        self.precision = precision
+        self.coalescer = coalescer
+        self.results = LRUCache(max_size=max_size, ttl=ttl, stale_ttl=stale_ttl)
+        self._lock = threading.Lock()
+        self.fetches = 0
+        self.fetch_seconds = 0.0
+
+    def key(self, location, keyword, radius):
+        coordinates = parse_location(location)
+        if coordinates is None:
+            return None
+        return geohash(*coordinates, precision=self.precision), normalize_keyword(keyword), int(radius)
+
+    def get(self, location, keyword, radius):
+        key = self.key(location, keyword, radius)
+        return None if key is None else self.results.get(key)
+
+    def get_stale(self, location, keyword, radius):
+        """Expired results kept within ``stale_ttl``, for when the API
+        cannot be called."""
+        key = self.key(location, keyword, radius)
+        return None if key is None else self.results.get_stale(key)
+
+    def set(self, location, keyword, radius, results):
+        key = self.key(location, keyword, radius)
+        if key is not None:
+            self.results.set(key, results)
+
+    def get_page(self, token):
+        return self.results.get(('page', token))
+
+    def set_page(self, token, page):
+        self.results.set(('page', token), page)
+
+    def get_or_fetch(self, location, keyword, radius, fetch, deadline=None):
+        """Returns cached results for the cell, otherwise calls ``fetch()``
+        and caches what it returns. Exceptions from ``fetch`` are not cached.
+        Concurrent misses for one cell share a single fetch when a
+        ``coalescer`` is configured; ``deadline`` is the caller's."""
+        key = self.key(location, keyword, radius)
+        if key is not None:
+            results = self.results.get(key)
+            if results is not None:
+                return results
+
+        def timed_fetch():
+            start = time.perf_counter()
+            results = fetch()
+            with self._lock:
+                self.fetches += 1
+                self.fetch_seconds += time.perf_counter() - start
+            return results
+
+        if self.coalescer is not None and key is not None:
+            results = self.coalescer.do(('places',) + key, timed_fetch, deadline=deadline)
+        else:
+            results = timed_fetch()
+
+        if key is not None:
+            self.results.set(key, results)
+        return results
+
+    def snapshot(self, limit=None):
+        """JSON-serializable form of ``LRUCache.snapshot``."""
+        return [(list(key), {'results': list(page), 'next_page_token': getattr(page, 'next_page_token', None)}, ttl)
+                for key, page, ttl in self.results.snapshot(limit)]
+
+    def restore(self, entries):
+        self.results.restore((tuple(key), PlacesPage(page['results'], page.get('next_page_token')), ttl)
+                             for key, page, ttl in entries)
+
+    def clear(self):
+        self.results.clear()
+
+    def stats(self):
+        stats = self.results.stats()
+        avg_fetch = self.fetch_seconds / self.fetches if self.fetches else 0.0
+        stats.update({
+            'api_calls': self.fetches,
+            'api_calls_avoided': stats['hits'],
+            'avg_api_seconds': avg_fetch,
+            'latency_saved_seconds': stats['hits'] * avg_fetch,
+        })
+        return stats
@@ -0,0 +1,182 @@
+"""
+On-demand request profiling
+
+``RequestProfiler.profile`` runs one request under a profiler and keeps the
+result in a bounded ring buffer of recent profiles, by id. Two modes:
+
+- ``cprofile``: deterministic ``cProfile`` of the request thread, read back
+  as a ``pstats`` listing or a marshalled stats dump for snakeviz and
+  friends.
+- ``sample``: a background thread samples the request thread's stack every
+  ``interval`` seconds; read back as collapsed stacks
+  (``frame;frame;frame count``), the input format of flamegraph.pl and
+  speedscope.
+
+Both see only the thread handling the request. Work done on pool threads
+(keyword fan-out, Place Details) shows up as time spent waiting for it.
+
+Whether a request is profiled is decided by ``mode_for``, which costs one
+comparison when no profile was asked for and the sample rate is zero.
+"""
+
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+CPROFILE = 'cprofile'
+SAMPLE = 'sample'
+MODES = (CPROFILE, SAMPLE)
+
+
+class StackSampler:
+    """Samples one thread's Python stack on a background thread."""
+
+    def __init__(self, thread_id=None, interval=0.001):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _label(frame):
+        code = frame.f_code
+        return f'{os.path.basename(code.co_filename)}:{code.co_name}'
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+class Profile:
+    def __init__(self, profile_id, mode, label, started_at):
+        self.id = profile_id
+        self.mode = mode
+        self.label = label
+        self.started_at = started_at
+        self.seconds = 0.0
+        self.profiler = None
+        self.sampler = None
+
+    def pstats_text(self, sort='cumulative', limit=60):
+        if self.profiler is None:
+            return None
+        stream = io.StringIO()
+        pstats.Stats(self.profiler, stream=stream).sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
+
+    def pstats_dump(self):
+        """Marshalled stats in the format ``pstats.Stats(path)`` loads."""
+        if self.profiler is None:
+            return None
+        self.profiler.create_stats()
+        return marshal.dumps(self.profiler.stats)
+
+    def collapsed(self):
+        return None if self.sampler is None else self.sampler.collapsed()
+
+    def summary(self):
+        return f'{self.id} {self.mode} {self.seconds * 1000:.1f}ms {self.label}'
+
+
+class RequestProfiler:
+    """Profiles requests on demand and keeps the ``size`` most recent."""
+
+    def __init__(self, size=20, sample_rate=0.0, default_mode=SAMPLE, interval=0.001, sink=None):
+        self.size = size
+        self.sample_rate = sample_rate
+        self.default_mode = default_mode
+        self.interval = interval
+        # Called with every finished Profile, e.g. by the benchmark to aggregate a run.
+        self.sink = sink
+        self._profiles = OrderedDict()
+        self._lock = threading.Lock()
+        # Only one cProfile can be active per process on Python 3.12+; others fall back to sampling.
+        self._cprofile_lock = threading.Lock()
+
+    def mode_for(self, requested=None, authorized=lambda: False):
+        """The mode to profile a request in, or None. ``requested`` is the
+        value of the request's profile header; it is honored only if
+        ``authorized()``."""
+        if requested:
+            if authorized():
+                return requested if requested in MODES else self.default_mode
+        elif self.sample_rate > 0 and random.random() < self.sample_rate:
+            return self.default_mode
+        return None
+
+    def profile(self, mode, fn, label='', profile_id=None):
+        """Calls ``fn()`` under the profiler and returns ``(result, profile)``."""
+        profile = Profile(profile_id or uuid.uuid4().hex[:12], mode, label, time.time())
+        cprofile_held = mode == CPROFILE and self._cprofile_lock.acquire(blocking=False)
+        if mode == CPROFILE and not cprofile_held:
+            profile.mode = SAMPLE
+        start = time.perf_counter()
+        try:
+            if cprofile_held:
+                profile.profiler = cProfile.Profile()
+                result = profile.profiler.runcall(fn)
+            else:
+                profile.sampler = StackSampler(interval=self.interval)
+                profile.sampler.start()
+                try:
+                    result = fn()
+                finally:
+                    profile.sampler.stop()
+        finally:
+            if cprofile_held:
+                self._cprofile_lock.release()
+            profile.seconds = time.perf_counter() - start
+            self._keep(profile)
+        return result, profile
+
+    def _keep(self, profile):
+        with self._lock:
+            self._profiles[profile.id] = profile
+            self._profiles.move_to_end(profile.id)
+            while len(self._profiles) > self.size:
+                self._profiles.popitem(last=False)
+        if self.sink is not None:
+            self.sink(profile)
+
+    def get(self, profile_id):
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def recent(self):
+        with self._lock:
+            return list(reversed(self._profiles.values()))
+
+
+def merge_collapsed(profiles):
+    """Sums the collapsed stacks of sampled profiles into one flame graph."""
+    stacks = Counter()
+    for profile in profiles:
+        if profile.sampler is not None:
+            stacks.update(profile.sampler.stacks)
+    return ''.join(f'{stack} {count}\n' for stack, count in stacks.most_common())
@@ -0,0 +1,63 @@
+"""
+Token-bucket rate limiting
+
+A ``TokenBucket`` refills continuously at ``rate`` tokens per second up to
+``burst`` tokens. ``acquire`` blocks until a token is available, so callers on
+any number of threads share one global rate. A ``rate`` of 0 means unlimited.
+"""
+
+import threading
+import time
+
+
+class TokenBucket:
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        if rate < 0:
+            raise ValueError(f"rate must be 0 (unlimited) or positive, not {rate}")
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1.0, self.rate))
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = self.burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens=1):
+        if not self.rate:
+            return True
+        with self._lock:
+            self._refill(self.clock())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def wait_time(self, tokens=1):
+        """Seconds until ``tokens`` would be available, 0 if they are now."""
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            self._refill(self.clock())
+            return max(0.0, (tokens - self._tokens) / self.rate)
+
+    def acquire(self, tokens=1, timeout=None):
+        """Blocks until ``tokens`` are taken; returns False if that would take
+        longer than ``timeout`` seconds."""
+        if not self.rate:
+            return True
+        deadline = None if timeout is None else self.clock() + timeout
+        while True:
+            with self._lock:
+                now = self.clock()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                return False
+            self.sleep(wait)
@@ -0,0 +1,180 @@
+"""
+Quota-aware scheduling of outbound Google API calls
+
+Every geocode and Places request asks the ``QuotaScheduler`` for permission
+first. Each API has its own token bucket matching its per-second quota and an
+optional daily budget. When the bucket is empty, callers queue rather than
+fail, up to a deadline. Tokens go to the waiting caller whose phone number has
+been granted the fewest calls in the current fairness window, so one chatty
+user cannot starve everyone else.
+
+The phone number is read from the ``current_phone`` context variable, which
+the webhook and the async workers set with ``caller(phone)``. Calls made
+outside a conversation share one anonymous slot.
+
+``acquire`` raises ``QuotaExceeded`` when the daily budget is spent or the
+deadline passes, and callers degrade to cached or local results. A
+``max_wait`` of None lets callers queue for as long as it takes, which suits
+batch jobs better than degrading.
+"""
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from itertools import count
+
+from http_client import LatencyRecorder
+from rate_limit import TokenBucket
+
+current_phone = contextvars.ContextVar('current_phone', default=None)
+
+
+@contextmanager
+def caller(phone):
+    """Attributes API calls made inside the block to ``phone``."""
+    token = current_phone.set(phone)
+    try:
+        yield
+    finally:
+        current_phone.reset(token)
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, api, reason):
+        self.api = api
+        self.reason = reason
+        super().__init__(f"Google {api} quota {'exhausted for today' if reason == 'budget' else 'busy'}, "
+                         f"please try again later")
+
+
+class DailyBudget:
+    """Counts calls per calendar day in ``tz`` (Google resets daily quotas
+    at midnight Pacific time). A ``limit`` of 0 means unlimited."""
+
+    def __init__(self, limit=0, tz=timezone.utc, clock=time.time):
+        self.limit = limit
+        self.tz = tz
+        self.clock = clock
+        self.used = 0
+        self._day = self._today()
+
+    def _today(self):
+        return datetime.fromtimestamp(self.clock(), self.tz).date()
+
+    def _roll(self):
+        today = self._today()
+        if today != self._day:
+            self._day = today
+            self.used = 0
+
+    def remaining(self):
+        self._roll()
+        return None if not self.limit else max(0, self.limit - self.used)
+
+    def spend(self):
+        self._roll()
+        self.used += 1
+
+
+class _Ticket:
+    __slots__ = ('phone', 'seq')
+
+    def __init__(self, phone, seq):
+        self.phone = phone
+        self.seq = seq
+
+
+class _ApiQuota:
+    def __init__(self, rate, burst, daily_limit, tz, clock, sleep):
+        self.bucket = TokenBucket(rate, burst, clock=clock, sleep=sleep)
+        self.budget = DailyBudget(daily_limit, tz)
+        self.condition = threading.Condition()
+        self.waiting = []
+        self.queue_wait = LatencyRecorder()
+        self.granted = 0
+        self.rejected = {'budget': 0, 'timeout': 0}
+
+
+class QuotaScheduler:
+    def __init__(self, limits, max_wait=2.0, fairness_window=60.0, tz=timezone.utc,
+                 clock=time.monotonic, sleep=None):
+        """``limits`` maps an API name to ``(per_second, daily_limit)``."""
+        self.max_wait = max_wait
+        self.fairness_window = fairness_window
+        self.clock = clock
+        self.quotas = {
+            api: _ApiQuota(per_second, max(1.0, per_second), daily_limit, tz, clock, sleep or time.sleep)
+            for api, (per_second, daily_limit) in limits.items()
+        }
+        self._seq = count()
+        self._granted_by_phone = {}
+        self._window_started = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, api, timeout=None):
+        """Blocks until a call to ``api`` may be made. Raises ``QuotaExceeded``
+        if the daily budget is spent or no token frees up within ``timeout``
+        (default ``max_wait``; None waits indefinitely) seconds. APIs without
+        limits pass through."""
+        quota = self.quotas.get(api)
+        if quota is None:
+            return
+        phone = current_phone.get()
+        start = self.clock()
+        timeout = self.max_wait if timeout is None else timeout
+        deadline = None if timeout is None else start + timeout
+        ticket = _Ticket(phone, next(self._seq))
+
+        with quota.condition:
+            quota.waiting.append(ticket)
+            try:
+                while True:
+                    if quota.budget.remaining() == 0:
+                        quota.rejected['budget'] += 1
+                        raise QuotaExceeded(api, 'budget')
+                    if self._next_in_line(quota) is ticket and quota.bucket.try_acquire():
+                        break
+                    now = self.clock()
+                    if deadline is not None and now >= deadline:
+                        quota.rejected['timeout'] += 1
+                        raise QuotaExceeded(api, 'timeout')
+                    wait = None if deadline is None else deadline - now
+                    if self._next_in_line(quota) is ticket:
+                        refill = max(0.001, quota.bucket.wait_time())
+                        wait = refill if wait is None else min(wait, refill)
+                    quota.condition.wait(wait)
+            finally:
+                quota.waiting.remove(ticket)
+                quota.condition.notify_all()
+            quota.budget.spend()
+            quota.granted += 1
+            self._record_grant(phone)
+        quota.queue_wait.record(self.clock() - start)
+
+    def _next_in_line(self, quota):
+        granted = self._granted_by_phone
+        return min(quota.waiting, key=lambda ticket: (granted.get(ticket.phone, 0), ticket.seq))
+
+    def _record_grant(self, phone):
+        with self._lock:
+            now = self.clock()
+            if now - self._window_started >= self.fairness_window:
+                self._granted_by_phone = {}
+                self._window_started = now
+            self._granted_by_phone[phone] = self._granted_by_phone.get(phone, 0) + 1
+
+    def stats(self):
+        return {
+            api: {
+                'granted': quota.granted,
+                'waiting': len(quota.waiting),
+                'rejected_budget': quota.rejected['budget'],
+                'rejected_timeout': quota.rejected['timeout'],
+                'budget_used': quota.budget.used,
+                'budget_remaining': quota.budget.remaining(),
+                'queue_wait': quota.queue_wait.stats(),
+            }
+            for api, quota in self.quotas.items()
+        }
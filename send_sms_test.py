@@ -4,11 +4,12 @@ from urllib.parse import urlencode
 from flask import Flask, request
 import requests
 import os
+from structured_logging import setup_logging
 from twilio.twiml.messaging_response import MessagingResponse
 
 app = Flask(__name__)
 load_dotenv()
-logging.basicConfig(level=logging.DEBUG)
+setup_logging(os.getenv('LOG_LEVEL', 'INFO'), os.getenv('LOG_FORMAT', 'json'))
 
 account_sid = os.environ.get('TWILIO_ACCOUNT_SID')
 auth_token = os.environ.get('TWILIO_AUTH_TOKEN')
@@ -79,9 +80,9 @@ def get_lat_long(data):
             return f"{latitude}, {longitude}"  # returns latitude, longitude
 
         else:
-            print("results == None. Line 86: No results found")
+            logging.warning("results == None. Line 86: No results found")
     else:
-        print("Error on line 84:  Geocoding was not successful for the following reason: ", data['status'])
+        logging.warning("Error on line 84: Geocoding was not successful for the following reason: %s", data['status'])
 
 
 def nearby_search(location, keyword, max_results=5):
@@ -96,20 +97,17 @@ def nearby_search(location, keyword, max_results=5):
     try:
         search_data = requests.get(search_url)
         response = search_data.json()
-        print("line 62", response)
+        logging.debug("line 62 %s", response)
 
         if response['status'] == 'OK':
-            print(f'line 99: {response["status"]}')
+            logging.debug('line 99: %s', response['status'])
 
             results = response.get('results', [])[:max_results]
-            print(f'line 100: {results}')
+            logging.debug('line 100: %s', results)
             for result in results:
                 name = result['name']
-                print(name)
                 address = result['vicinity']
-                print(address)
                 opening_hours = result.get('opening_hours', [])
-                print(opening_hours)
                 if opening_hours:
                     if opening_hours.get('open_now', False):
                         hours = 'Open'
@@ -120,10 +118,8 @@ def nearby_search(location, keyword, max_results=5):
                     hours = 'N/A'
 
                 rating = result.get('rating', 'N/A')
-                print(rating)
                 formatted_text += f'Name: {name}\nAddress: {address}\nHours: {hours}\nRating: {rating}\n'
-                print(formatted_text)
-                print("Line 90", formatted_text)
+                logging.debug("Line 90 %s", formatted_text)
             return formatted_text
 
         else:
@@ -152,11 +148,10 @@ def sms_reply():
 
             try:
                 data = get_json_data(user_address)
-                print(f'user_state response data: {data}')
+                logging.debug('user_state response data: %s', data)
                 location = get_lat_long(data)
-                print(f'user_state response location lat and lon: {location}')
+                logging.debug('user_state response location lat and lon: %s', location)
                 response: str = nearby_search(str(location), keyword)  # This function is expecting a string
-                print(response)
                 response += "\n\nDo you want to search for another business? Reply 'yes' or 'no'."
                 user_state[user_phone_number]['state'] = UserState.SEARCHING_CONTINUE
             except Exception as e:
@@ -0,0 +1,292 @@
+"""
+Conversation session stores
+
+Backends that hold each phone number's conversation state for ``/sms``.
+``MemorySessionStore`` keeps sessions in-process with an idle TTL and an LRU
+cap; ``SQLiteSessionStore`` keeps them in a WAL-mode SQLite database that
+several gunicorn workers can share.
+
+Both expose ``transaction(phone)``, which serializes concurrent webhooks for
+the same phone number and writes the state back only if the block completes.
+Expired sessions are dropped lazily on read and swept periodically on write.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class KeyedLock:
+    """One lock per key, created on demand and discarded when unused."""
+
+    def __init__(self):
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    @contextmanager
+    def __call__(self, key):
+        with self._guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        entry[0].acquire()
+        try:
+            yield
+        finally:
+            entry[0].release()
+            with self._guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
+
+
+class ThreadConnections:
+    """One SQLite connection per thread to ``path``. ``close`` closes all of
+    them; a thread's connection is dropped with the thread otherwise."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._by_thread = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def get(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # check_same_thread=False only so that close() may run on another thread.
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            with self._lock:
+                self._by_thread[threading.current_thread()] = conn
+        return conn
+
+    def close(self):
+        with self._lock:
+            conns = list(self._by_thread.values())
+            self._by_thread.clear()
+            self._local = threading.local()
+        for conn in conns:
+            conn.close()
+
+
+class SessionStore:
+    """Interface shared by the session backends."""
+
+    def get(self, phone):
+        raise NotImplementedError
+
+    def set(self, phone, state):
+        raise NotImplementedError
+
+    def delete(self, phone):
+        raise NotImplementedError
+
+    def lock(self, phone):
+        raise NotImplementedError
+
+    @contextmanager
+    def transaction(self, phone):
+        """Yields the session dict for ``phone`` while holding its lock. The
+        dict is saved on exit, or the session deleted if it was emptied."""
+        with self.lock(phone):
+            state = self.get(phone)
+            yield state
+            if state:
+                self.set(phone, state)
+            else:
+                self.delete(phone)
+
+    def close(self):
+        pass
+
+    def stats(self):
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    def __init__(self, ttl=86400, max_entries=100000, sweep_interval=60, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self.clock = clock
+        # Sessions are held serialized so readers get a private copy and the
+        # memory footprint can be tracked without walking every dict.
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._guard = threading.Lock()
+        self._last_sweep = clock()
+        self._locks = KeyedLock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, phone):
+        with self._guard:
+            entry = self._data.get(phone)
+            if entry is None:
+                return {}
+            if entry[1] <= self.clock():
+                self._remove(phone)
+                self.expirations += 1
+                return {}
+            self._data.move_to_end(phone)
+            return json.loads(entry[0])
+
+    def lock(self, phone):
+        return self._locks(phone)
+
+    def set(self, phone, state):
+        payload = json.dumps(state)
+        with self._guard:
+            self._remove(phone)
+            self._data[phone] = (payload, self.clock() + self.ttl)
+            self._bytes += len(payload)
+            while len(self._data) > self.max_entries:
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+            self._maybe_sweep()
+
+    def delete(self, phone):
+        with self._guard:
+            self._remove(phone)
+
+    def _remove(self, phone):
+        entry = self._data.pop(phone, None)
+        if entry is not None:
+            self._bytes -= len(entry[0])
+
+    def _maybe_sweep(self):
+        now = self.clock()
+        if now - self._last_sweep < self.sweep_interval:
+            return
+        self._last_sweep = now
+        expired = [phone for phone, (_, expires_at) in self._data.items() if expires_at <= now]
+        for phone in expired:
+            self._remove(phone)
+        self.expirations += len(expired)
+
+    def clear(self):
+        with self._guard:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self):
+        return {
+            'backend': 'memory',
+            'active_sessions': len(self._data),
+            'approx_bytes': self._bytes,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+class SQLiteSessionStore(SessionStore):
+    """Sessions in a WAL-mode SQLite file. Per-phone atomicity across
+    processes comes from a short-lived lease row rather than holding a
+    database write lock while the webhook is calling Google."""
+
+    def __init__(self, path, ttl=86400, sweep_interval=60, lease_ttl=30, lease_timeout=20,
+                 clock=time.time):
+        self.path = path
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.lease_ttl = lease_ttl
+        self.lease_timeout = lease_timeout
+        self.clock = clock
+        self._connections = ThreadConnections(path)
+        self._thread_locks = KeyedLock()
+        self._last_sweep = clock()
+        self.expirations = 0
+
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('CREATE TABLE IF NOT EXISTS sessions '
+                     '(phone TEXT PRIMARY KEY, state TEXT NOT NULL, expires_at REAL NOT NULL)')
+        conn.execute('CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires_at)')
+        conn.execute('CREATE TABLE IF NOT EXISTS session_leases '
+                     '(phone TEXT PRIMARY KEY, token TEXT NOT NULL, expires_at REAL NOT NULL)')
+
+    def _conn(self):
+        return self._connections.get()
+
+    def close(self):
+        self._connections.close()
+
+    def get(self, phone):
+        row = self._conn().execute(
+            'SELECT state FROM sessions WHERE phone = ? AND expires_at > ?', (phone, self.clock())
+        ).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def set(self, phone, state):
+        self._conn().execute(
+            'INSERT OR REPLACE INTO sessions (phone, state, expires_at) VALUES (?, ?, ?)',
+            (phone, json.dumps(state), self.clock() + self.ttl),
+        )
+        self._maybe_sweep()
+
+    def delete(self, phone):
+        self._conn().execute('DELETE FROM sessions WHERE phone = ?', (phone,))
+
+    @contextmanager
+    def lock(self, phone):
+        with self._thread_locks(phone):
+            token = self._acquire_lease(phone)
+            try:
+                yield
+            finally:
+                self._conn().execute('DELETE FROM session_leases WHERE phone = ? AND token = ?',
+                                     (phone, token))
+
+    def _acquire_lease(self, phone):
+        conn = self._conn()
+        token = uuid.uuid4().hex
+        give_up_at = time.monotonic() + self.lease_timeout
+        delay = 0.005
+        while True:
+            now = self.clock()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute('DELETE FROM session_leases WHERE phone = ? AND expires_at <= ?', (phone, now))
+                acquired = conn.execute(
+                    'INSERT OR IGNORE INTO session_leases (phone, token, expires_at) VALUES (?, ?, ?)',
+                    (phone, token, now + self.lease_ttl),
+                ).rowcount == 1
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            if acquired:
+                return token
+            if time.monotonic() >= give_up_at:
+                raise TimeoutError(f"Timed out waiting for the session lock on {phone}")
+            time.sleep(delay)
+            delay = min(delay * 2, 0.1)
+
+    def _maybe_sweep(self):
+        now = self.clock()
+        if now - self._last_sweep < self.sweep_interval:
+            return
+        self._last_sweep = now
+        self.expirations += self._conn().execute(
+            'DELETE FROM sessions WHERE expires_at <= ?', (now,)
+        ).rowcount
+
+    def clear(self):
+        self._conn().execute('DELETE FROM sessions')
+
+    def stats(self):
+        active, size = self._conn().execute(
+            'SELECT COUNT(*), COALESCE(SUM(LENGTH(state)), 0) FROM sessions WHERE expires_at > ?',
+            (self.clock(),),
+        ).fetchone()
+        return {
+            'backend': 'sqlite',
+            'active_sessions': active,
+            'approx_bytes': size,
+            'expirations': self.expirations,
+        }
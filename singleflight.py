@@ -0,0 +1,136 @@
+"""
+Single-flight request coalescing
+
+When many webhooks ask for the same geocode or Places lookup at once, only the
+first caller (the leader) performs the upstream call; concurrent callers with
+the same key wait for it and share its result or exception. The exception is
+a leader that ran out of its own request deadline: its followers may still
+have time left, so they call again on their own budget.
+
+Coalescing across worker processes is optional. With ``lock_dir`` set, a
+leader that was given a ``recheck`` also takes an exclusive file lock for the
+key. A leader in another process that has to wait for that lock calls
+``recheck()`` once it gets the lock, and returns what it finds there instead
+of calling upstream. The recheck must read a store shared by the processes,
+such as the SQLite geocode tier; without one the lock would only serialize
+the calls, so lookups without a recheck skip it. The wait is bounded by
+``lock_wait`` and the caller's deadline, after which the caller goes
+upstream itself. Keys are hashed onto a fixed set of lock files so the
+directory does not grow.
+"""
+
+import hashlib
+import os
+import threading
+import time
+
+from deadline import DeadlineExceeded
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, lock_dir=None, lock_stripes=1024, lock_wait=5.0, poll_interval=0.01):
+        self.lock_dir = lock_dir
+        self.lock_stripes = lock_stripes
+        self.lock_wait = lock_wait
+        self.poll_interval = poll_interval
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+        self.coalesced_across_processes = 0
+        self.lock_timeouts = 0
+        self.retries = 0
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+
+    def do(self, key, fn, recheck=None, deadline=None):
+        """Returns ``fn()``, sharing one in-flight call per ``key``.
+        ``deadline`` is the caller's own; it bounds the wait for another
+        process and decides whether to retry after the leader ran out of time."""
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+                    self.leaders += 1
+                else:
+                    self.coalesced += 1
+            if leader:
+                break
+
+            call.done.wait()
+            if isinstance(call.error, DeadlineExceeded) and (deadline is None or not deadline.expired()):
+                with self._lock:
+                    self.retries += 1
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._lead(key, fn, recheck, deadline)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _lead(self, key, fn, recheck, deadline):
+        if not self.lock_dir or recheck is None:
+            return fn()
+
+        import fcntl
+
+        stripe = int(hashlib.sha1(repr(key).encode('utf-8')).hexdigest(), 16) % self.lock_stripes
+        path = os.path.join(self.lock_dir, f'{stripe}.lock')
+        # Closing the file releases the lock, whichever way we leave.
+        with open(path, 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Another process is fetching a key in this stripe; wait for
+                # it and then see whether it left our answer behind.
+                if not self._wait_for_lock(fcntl, lock_file, deadline):
+                    with self._lock:
+                        self.lock_timeouts += 1
+                result = recheck()
+                if result is not None:
+                    with self._lock:
+                        self.coalesced_across_processes += 1
+                    return result
+            return fn()
+
+    def _wait_for_lock(self, fcntl, lock_file, deadline):
+        """Polls for the lock for at most ``lock_wait`` seconds or what is
+        left of ``deadline``. Returns whether it got the lock."""
+        wait = self.lock_wait if deadline is None else min(self.lock_wait, deadline.remaining())
+        give_up = time.monotonic() + wait
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                if time.monotonic() >= give_up:
+                    return False
+                time.sleep(self.poll_interval)
+
+    def stats(self):
+        return {
+            'in_flight': len(self._calls),
+            'leaders': self.leaders,
+            'coalesced': self.coalesced,
+            'coalesced_across_processes': self.coalesced_across_processes,
+            'lock_timeouts': self.lock_timeouts,
+            'retries': self.retries,
+        }
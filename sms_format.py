@@ -0,0 +1,146 @@
+"""
+Segment-aware compact SMS formatting
+
+A single SMS holds 160 GSM-7 characters, or 70 UCS-2 characters once any
+character outside the GSM-7 alphabet appears. Longer messages are split into
+concatenated segments of 153 or 67 characters, each billed separately. One
+emoji in a business name is enough to switch the whole reply to UCS-2.
+
+``to_gsm`` keeps text in GSM-7: typographic punctuation is mapped to plain
+equivalents, accented letters outside the alphabet lose their accents, and
+whatever is left (emoji, CJK) is dropped. ``CompactFormatter`` writes one
+line per place with abbreviated addresses, and stops adding places once the
+next one would push the reply past ``segment_budget`` segments.
+
+Names and addresses repeat across requests, so ``to_gsm`` and
+``abbreviate_address`` are memoized; pure ASCII text takes a fast path.
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+
+GSM_BASIC = frozenset(
+    '@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !"#¤%&\'()*+,-./0123456789:;<=>?¡'
+    'ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà'
+)
+# Extension characters take two septets: an escape and the character.
+GSM_EXTENSION = frozenset('^{}\\[~]|€\f')
+GSM_CHARSET = GSM_BASIC | GSM_EXTENSION
+
+GSM_SINGLE, GSM_MULTI = 160, 153
+UCS2_SINGLE, UCS2_MULTI = 70, 67
+
+_REPLACEMENTS = str.maketrans({
+    '‘': "'", '’': "'", '‚': "'", '′': "'", '´': "'", '`': "'",
+    '“': '"', '”': '"', '„': '"', '″': '"', '«': '"', '»': '"',
+    '‐': '-', '‑': '-', '‒': '-', '–': '-', '—': '-', '−': '-',
+    '…': '...', ' ': ' ', ' ': ' ', ' ': ' ', '•': '-', '·': '-',
+    '★': '*', '☆': '*', '®': '', '™': '', '©': '(c)',
+    # No NFKD decomposition for these.
+    'Ł': 'L', 'ł': 'l', 'Đ': 'D', 'đ': 'd', 'ı': 'i', 'Œ': 'OE', 'œ': 'oe',
+})
+
+_SPACES = re.compile(r' {2,}')
+
+
+def is_gsm(text):
+    return all(char in GSM_CHARSET for char in text)
+
+
+@lru_cache(maxsize=4096)
+def to_gsm(text):
+    """Returns ``text`` using only GSM-7 characters."""
+    if text.isascii() and '`' not in text:
+        return text
+    text = text.translate(_REPLACEMENTS)
+    if is_gsm(text):
+        return text
+    kept = []
+    for char in text:
+        if char in GSM_CHARSET:
+            kept.append(char)
+            continue
+        # Fall back to the base letter of a decomposed character: "á" becomes "a".
+        base = unicodedata.normalize('NFKD', char)[:1]
+        if base in GSM_CHARSET and base != char:
+            kept.append(base)
+    return _SPACES.sub(' ', ''.join(kept)).strip()
+
+
+def segments(text):
+    """Returns ``(segment_count, encoding)`` for sending ``text`` as one SMS.
+    Multipart GSM-7 counts are approximate where an extension character would
+    straddle a segment boundary."""
+    if not text:
+        return 0, 'GSM-7'
+    if is_gsm(text):
+        units = len(text) + sum(1 for char in text if char in GSM_EXTENSION)
+        single, multi, encoding = GSM_SINGLE, GSM_MULTI, 'GSM-7'
+    else:
+        units = len(text.encode('utf-16-le')) // 2
+        single, multi, encoding = UCS2_SINGLE, UCS2_MULTI, 'UCS-2'
+    if units <= single:
+        return 1, encoding
+    return -(-units // multi), encoding
+
+
+_ABBREVIATIONS = {
+    'street': 'St', 'avenue': 'Ave', 'boulevard': 'Blvd', 'road': 'Rd', 'drive': 'Dr', 'lane': 'Ln',
+    'court': 'Ct', 'place': 'Pl', 'square': 'Sq', 'terrace': 'Ter', 'circle': 'Cir', 'highway': 'Hwy',
+    'parkway': 'Pkwy', 'expressway': 'Expy', 'turnpike': 'Tpke', 'suite': 'Ste', 'building': 'Bldg',
+    'floor': 'Fl', 'apartment': 'Apt', 'center': 'Ctr', 'centre': 'Ctr', 'plaza': 'Plz', 'mount': 'Mt',
+    'northeast': 'NE', 'northwest': 'NW', 'southeast': 'SE', 'southwest': 'SW',
+}
+_ABBREVIATION_PATTERN = re.compile(r'\b(' + '|'.join(_ABBREVIATIONS) + r')\b\.?', re.IGNORECASE)
+
+
+@lru_cache(maxsize=4096)
+def abbreviate_address(address, keep_locality=False):
+    """Abbreviates street suffixes. Unless ``keep_locality`` is set, drops
+    everything after the first comma: every result is near the user, so the
+    town is usually the same for all of them."""
+    if not keep_locality and ', ' in address:
+        street = address.split(', ', 1)[0]
+        # A vicinity without a street part ("Downtown, Springfield") is kept whole.
+        if any(char.isdigit() for char in street):
+            address = street
+    return _ABBREVIATION_PATTERN.sub(lambda match: _ABBREVIATIONS[match.group(1).lower()], address)
+
+
+class CompactFormatter:
+    def __init__(self, segment_budget=2, header='Nearby:', distance_format=None):
+        self.segment_budget = segment_budget
+        self.header = header
+        self.distance_format = distance_format
+
+    def line(self, number, result):
+        details = []
+        if result.get('rating') is not None:
+            details.append(f"{result['rating']}*")
+        opening_hours = result.get('opening_hours')
+        if opening_hours:
+            details.append('open' if opening_hours.get('open_now') else 'closed')
+        if self.distance_format is not None and 'distance_meters' in result:
+            details.append(self.distance_format(result['distance_meters']).replace(' ', ''))
+        text = f"{number}. {to_gsm(result['name'])} - {to_gsm(abbreviate_address(result['vicinity']))}"
+        if details:
+            text += f" ({', '.join(details)})"
+        if result.get('phone'):
+            text += f" {to_gsm(result['phone'])}"
+        return text
+
+    def pack(self, results, max_results=5, suffix=''):
+        """Returns ``(text, count)``: as many of the first ``max_results``
+        results as fit in ``segment_budget`` segments together with
+        ``suffix``, which the caller appends after a blank line. At least one
+        result is always included."""
+        text = self.header
+        count = 0
+        for result in results[:max_results]:
+            candidate = text + '\n' + self.line(count + 1, result)
+            if count and segments(candidate + '\n\n' + suffix)[0] > self.segment_budget:
+                break
+            text = candidate
+            count += 1
+        return text, count
@@ -0,0 +1,211 @@
+"""
+Non-blocking structured logging
+
+``setup_logging`` replaces the root logger's handlers with a ``QueueHandler``.
+Logging on the request path only builds the ``LogRecord`` and puts it on a
+bounded queue; formatting and I/O happen on a ``QueueListener`` thread. When
+the queue is full, records are dropped and counted rather than blocking the
+request.
+
+Records are written one JSON object per line. Structured fields are passed as
+``extra={'fields': {...}}`` and become top-level keys. Before a record is
+written, phone numbers and API keys are redacted from the message and string
+fields, and long values (upstream payloads) are truncated to
+``max_field_length`` characters.
+
+DEBUG records can be sampled per logger, e.g. ``{'upstream': 0.1}`` keeps one
+upstream debug event in ten; a logger inherits the rate of its closest
+configured parent, and ``root`` sets the rate for all others. ``set_level``
+changes levels at runtime.
+
+A process forked after ``setup_logging`` (gunicorn ``--preload``) does not
+inherit the listener thread, so the pipeline starts a new one, on a new
+queue, in the child.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+
+PHONE_PATTERN = re.compile(r'(?<![\w.(])\+?\(?\d[\d\-\s()]{6,}(\d{4})\b')
+API_KEY_PATTERN = re.compile(r'(\bkey=)[\w-]+')
+# Fields that always hold a phone number, whatever its format.
+PHONE_FIELDS = frozenset(('phone', 'from', 'to'))
+# Loggers that are chatty at DEBUG and rarely useful; they stay at WARNING unless set explicitly.
+NOISY_LOGGERS = ('urllib3', 'requests', 'twilio.http_client', 'werkzeug')
+
+
+def redact(text):
+    text = PHONE_PATTERN.sub(lambda match: '***' + match.group(1), text)
+    return API_KEY_PATTERN.sub(r'\1***', text)
+
+
+def truncate(text, limit):
+    if limit and len(text) > limit:
+        return f'{text[:limit]}...(+{len(text) - limit} chars)'
+    return text
+
+
+class JsonFormatter(logging.Formatter):
+    def __init__(self, max_field_length=512):
+        super().__init__()
+        self.max_field_length = max_field_length
+
+    def _clean(self, value):
+        if isinstance(value, (int, float, bool)) or value is None:
+            return value
+        if not isinstance(value, str):
+            value = json.dumps(value, default=str, separators=(',', ':'))
+        return truncate(redact(value), self.max_field_length)
+
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': truncate(redact(record.getMessage()), self.max_field_length),
+        }
+        for name, value in (getattr(record, 'fields', None) or {}).items():
+            if name in PHONE_FIELDS and isinstance(value, str):
+                value = '***' + value[-4:]
+            entry[name] = self._clean(value)
+        if record.exc_info:
+            entry['exc'] = redact(self.formatException(record.exc_info))
+        return json.dumps(entry, default=str, separators=(',', ':'))
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        return redact(super().format(record))
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a ``rate`` share of DEBUG records per logger name."""
+
+    def __init__(self, rates=None, default=1.0):
+        super().__init__()
+        self.rates = dict(rates or {})
+        self.default = default
+        self._resolved = {}
+
+    def rate(self, name):
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate = self.rates.get('root', self.default)
+            parts = name.split('.')
+            for i in range(len(parts), 0, -1):
+                prefix = '.'.join(parts[:i])
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+            self._resolved[name] = rate
+        return rate
+
+    def set_rate(self, name, rate):
+        self.rates[name] = rate
+        self._resolved = {}
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG:
+            return True
+        rate = self.rate(record.name)
+        return rate >= 1.0 or (rate > 0 and random.random() < rate)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # The stock prepare formats the message in the caller's thread; the listener does that instead.
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LoggingPipeline:
+    def __init__(self, handler, listener, sampler):
+        self.handler = handler
+        self.listener = listener
+        self.sampler = sampler
+        self._stopped = False
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._restart_in_child)
+
+    def _restart_in_child(self):
+        if self._stopped:
+            return
+        log_queue = queue.Queue(self.handler.queue.maxsize)
+        self.handler.queue = log_queue
+        self.listener = logging.handlers.QueueListener(log_queue, *self.listener.handlers,
+                                                       respect_handler_level=self.listener.respect_handler_level)
+        self.listener.start()
+
+    def stop(self):
+        # Called by configure() when the app is reconfigured and again at exit.
+        if not self._stopped:
+            self._stopped = True
+            self.listener.stop()
+
+    def stats(self):
+        return {'queued': self.handler.queue.qsize(), 'dropped': self.handler.dropped}
+
+
+def parse_sample_rates(text):
+    """Parses ``"upstream=0.1,urllib3=0"`` into ``{'upstream': 0.1, 'urllib3': 0.0}``."""
+    rates = {}
+    for part in (text or '').split(','):
+        if '=' in part:
+            name, rate = part.split('=', 1)
+            rates[name.strip()] = float(rate)
+    return rates
+
+
+def set_level(level, logger=None):
+    """Changes the level of ``logger`` (the root logger by default) at runtime."""
+    logging.getLogger(logger).setLevel(level.upper() if isinstance(level, str) else level)
+
+
+def setup_logging(level='INFO', fmt='json', sample_rates=None, max_field_length=512, queue_size=10000,
+                  stream=None):
+    """Routes all logging through a queue to a background listener and
+    returns the ``LoggingPipeline``. ``fmt`` is ``'json'`` or ``'text'``."""
+    output = logging.StreamHandler(stream or sys.stderr)
+    if fmt == 'json':
+        output.setFormatter(JsonFormatter(max_field_length))
+    else:
+        output.setFormatter(TextFormatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+    log_queue = queue.Queue(queue_size)
+    handler = NonBlockingQueueHandler(log_queue)
+    sampler = SamplingFilter(sample_rates)
+    handler.addFilter(sampler)
+    listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        if isinstance(existing, NonBlockingQueueHandler):
+            root.removeHandler(existing)
+    root.addHandler(handler)
+    set_level(level)
+    for name in NOISY_LOGGERS:
+        if logging.getLogger(name).level == logging.NOTSET:
+            logging.getLogger(name).setLevel(logging.WARNING)
+
+    listener.start()
+    pipeline = LoggingPipeline(handler, listener, sampler)
+    atexit.register(pipeline.stop)
+    return pipeline
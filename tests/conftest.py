@@ -0,0 +1,12 @@
+"""
+Keeps the test run away from real on-disk caches: the geocode cache's SQLite
+tier is pointed at a temporary directory before ``main`` first configures itself,
+so tests that clear ``main.components.geocode_cache`` never touch a
+developer's file.
+"""
+
+import os
+import tempfile
+
+_cache_dir = tempfile.TemporaryDirectory(prefix='tests-geocode-')
+os.environ['GEOCODE_CACHE_PATH'] = os.path.join(_cache_dir.name, 'geocode_cache.sqlite3')
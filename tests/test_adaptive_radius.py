@@ -0,0 +1,93 @@
+import threading
+import unittest
+from urllib.parse import parse_qs, urlsplit
+from unittest.mock import MagicMock, patch
+
+import main
+from scheduler import QuotaExceeded
+
+
+def places(prefix, count):
+    return [{'place_id': f'{prefix}{i}', 'name': f'{prefix.title()} {i}', 'vicinity': f'{i} Main St',
+             'rating': 4.5, 'user_ratings_total': 100} for i in range(count)]
+
+
+def response(data):
+    mock = MagicMock(status_code=200, content=b'')
+    mock.json.return_value = data
+    return mock
+
+
+def by_radius(pages, calls=None):
+    """A fake session.get answering each radius with ``pages[radius]``."""
+    lock = threading.Lock()
+
+    def get(url, timeout):
+        radius = int(parse_qs(urlsplit(url).query)['radius'][0])
+        if calls is not None:
+            with lock:
+                calls.append(radius)
+        results = pages[radius]
+        return response({'status': 'OK', 'results': results} if results else {'status': 'ZERO_RESULTS'})
+
+    return get
+
+
+class TestAdaptiveRadius(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(main.components, 'adaptive_radius', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch('main.components.http_client.session.get')
+    def test_sparse_area_widens_in_the_same_reply(self, mock_get):
+        calls = []
+        mock_get.side_effect = by_radius({1609: [], 8047: places('farm', 2), 40234: places('farm', 7)}, calls)
+
+        reply = main.nearby_search('44.51,-101.51', 'feed store', 5)
+
+        self.assertIn('Farm 4', reply)
+        self.assertEqual(calls, [1609, 8047, 40234])
+        self.assertGreater(main.radius_tiers_chosen.value(40234), 0)
+
+    @patch('main.components.http_client.session.get')
+    def test_dense_area_uses_the_tightest_tier_and_reuses_it_from_cache(self, mock_get):
+        calls = []
+        mock_get.side_effect = by_radius({1609: places('near', 6), 8047: places('far', 20),
+                                          40234: places('far', 20)}, calls)
+        session = {}
+
+        reply = main.nearby_search('40.75,-73.99', 'coffee', 5, session=session)
+        self.assertIn('Near 0', reply)
+        self.assertNotIn('Far', reply)
+        self.assertEqual(session['more']['radius'], 1609)
+        self.assertEqual(calls, [1609])
+
+        mock_get.reset_mock()
+        main.nearby_search('40.75,-73.99', 'coffee', 5)
+        mock_get.assert_not_called()
+
+
+    def test_a_failed_wider_tier_keeps_the_tighter_one(self):
+        def fetch_places(location, keyword, radius, deadline=None):
+            if radius > 1609:
+                raise QuotaExceeded('nearbysearch', 'budget')
+            return places('near', 2)
+
+        with patch.object(main, 'fetch_places', side_effect=fetch_places) as mock_fetch:
+            radius, pages = main.fetch_radius_tiers('44.61,-101.61', ['feed store'])
+
+        self.assertEqual((radius, len(pages['feed store'])), (1609, 2))
+        self.assertEqual(mock_fetch.call_count, 2)
+
+
+class TestZeroResults(unittest.TestCase):
+    @patch('main.components.http_client.session.get')
+    def test_zero_results_is_a_reply_not_an_error(self, mock_get):
+        mock_get.return_value = response({'status': 'ZERO_RESULTS', 'results': []})
+        self.assertEqual(main.nearby_search('45.01,-102.01', 'sushi', 5),
+                         'No places found for "sushi" near that address.')
+
+
+if __name__ == '__main__':
+    unittest.main()
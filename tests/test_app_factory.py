@@ -0,0 +1,116 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import cache_snapshot
+import main
+from config import Config
+from geocode_cache import GeocodeCache
+from places_cache import PlacesCache, PlacesPage
+
+GEOCODE_OK = {'status': 'OK', 'results': [{'geometry': {'location': {'lat': 40.7, 'lng': -74.0}}}]}
+
+
+class TestConfig(unittest.TestCase):
+    def test_from_env_converts_to_the_default_types(self):
+        config = Config.from_env({'NUM_RESULTS': '3', 'HTTP_HEDGING': 'yes', 'QUOTA_MAX_WAIT': '0.5',
+                                  'API_KEY': 'k'}, reply_format='compact')
+        self.assertEqual((config.num_results, config.http_hedging, config.quota_max_wait), (3, True, 0.5))
+        self.assertEqual((config.api_key, config.reply_format), ('k', 'compact'))
+        self.assertEqual(config.radius_meters, Config().radius_meters)
+
+    def test_float_fields_with_whole_number_defaults_accept_fractions(self):
+        config = Config.from_env({'QUOTA_GEOCODE_QPS': '0.5', 'BREAKER_OPEN_SECONDS': '2.5'})
+        self.assertEqual((config.quota_geocode_qps, config.breaker_open_seconds), (0.5, 2.5))
+
+    def test_invalid_values_name_the_variable(self):
+        with self.assertRaisesRegex(ValueError, 'NUM_RESULTS'):
+            Config.from_env({'NUM_RESULTS': 'five'})
+
+
+class TestCacheSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), 'snapshot.json')
+
+    def test_round_trip_keeps_the_remaining_ttl(self):
+        geocode, places = GeocodeCache(ttl=100), PlacesCache(ttl=100)
+        geocode.set('1 Main St', GEOCODE_OK)
+        places.set('40.7,-74.0', 'pizza', 1500, PlacesPage([{'name': 'Joe'}], 'token'))
+
+        self.assertEqual(cache_snapshot.save(self.path, geocode, places, clock=lambda: 1000.0), 2)
+        geocode, places = GeocodeCache(ttl=100), PlacesCache(ttl=100)
+        self.assertEqual(cache_snapshot.load(self.path, geocode, places, clock=lambda: 1060.0), 2)
+
+        self.assertEqual(geocode.get('1 main st'), GEOCODE_OK)
+        page = places.get('40.7,-74.0', 'pizza', 1500)
+        self.assertEqual((list(page), page.next_page_token), ([{'name': 'Joe'}], 'token'))
+        self.assertLessEqual(places.snapshot()[0][2], 40)
+
+    def test_missing_or_expired_snapshots_load_nothing(self):
+        geocode, places = GeocodeCache(), PlacesCache()
+        self.assertEqual(cache_snapshot.load(self.path, geocode, places), 0)
+        geocode.set('1 Main St', GEOCODE_OK)
+        cache_snapshot.save(self.path, geocode, places, clock=lambda: 0.0)
+        geocode = GeocodeCache()
+        cache_snapshot.load(self.path, geocode, places)
+        self.assertIsNone(geocode.get('1 Main St'))
+
+
+class TestCreateApp(unittest.TestCase):
+    def setUp(self):
+        self.saved = main.configure()
+        self.addCleanup(main.configure, self.saved)
+
+    def run_fresh(self, code):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.run([sys.executable, '-c', code], cwd=root,
+                                env=dict(os.environ, GEOCODE_CACHE_PATH=''), capture_output=True, text=True)
+        self.assertEqual(output.returncode, 0, output.stderr)
+        return output.stdout.split()
+
+    def test_importing_main_sets_nothing_up(self):
+        code = ('import sys, threading\n'
+                'import main\n'
+                "print('twilio' in sys.modules, 'numpy' in sys.modules,\n"
+                "      any('QueueListener' in repr(thread._target) for thread in threading.enumerate()\n"
+                "          if hasattr(thread, '_target')),\n"
+                '      threading.active_count())')
+        self.assertEqual(self.run_fresh(code), ['False', 'False', 'False', '1'])
+
+    def test_functions_work_in_a_fresh_interpreter(self):
+        code = ('from main import collect_component_stats, components, render_places\n'
+                'collect_component_stats()\n'
+                'print(render_places([], 5)[1], components.max_keywords)')
+        self.assertEqual(self.run_fresh(code), ['0', str(main.components.max_keywords)])
+
+    def test_reconfiguring_closes_the_previous_components(self):
+        previous = main.components
+        keyword_fanout = previous.keyword_fanout
+        with patch.object(previous.http_client.session, 'close') as close_session, \
+                patch.object(previous.log_pipeline, 'stop', wraps=previous.log_pipeline.stop) as stop_logging:
+            http_client = previous.http_client
+            main.configure(self.saved.replace(api_key='k'))
+
+        self.assertIsNot(main.components.http_client, http_client)
+        close_session.assert_called_once_with()
+        stop_logging.assert_called_once_with()
+        with self.assertRaises(RuntimeError):
+            keyword_fanout.submit(print)
+
+    def test_app_starts_with_the_snapshot_warm(self):
+        path = os.path.join(tempfile.mkdtemp(), 'snapshot.json')
+        geocode = GeocodeCache()
+        geocode.set('1 Main St', GEOCODE_OK)
+        cache_snapshot.save(path, geocode, PlacesCache())
+
+        app = main.create_app(self.saved.replace(cache_snapshot_path=path, api_key='k'))
+        self.assertEqual(main.components.settings.api_key, 'k')
+        self.assertEqual(main.components.geocode_cache.get('1 Main St'), GEOCODE_OK)
+        self.assertEqual(app.test_client().get('/metrics').status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import threading
+import unittest
+from unittest.mock import patch
+
+import main
+from async_reply import InMemorySender, SearchJob, SearchWorkerPool
+
+
+class TestSearchWorkerPool(unittest.TestCase):
+    def test_jobs_are_delivered_out_of_band(self):
+        sender = InMemorySender()
+        pool = SearchWorkerPool(lambda address, keyword: f'{keyword} near {address}', sender, workers=2)
+
+        self.assertTrue(pool.submit(SearchJob('+15550001', '+15559999', '1 main st', 'pizza')))
+        pool.join()
+
+        self.assertEqual(sender.messages, [{'to': '+15550001', 'from': '+15559999', 'body': 'pizza near 1 main st'}])
+        stats = pool.stats()
+        self.assertEqual(stats['queue_depth'], 0)
+        self.assertEqual(stats['end_to_end']['count'], 1)
+
+    def test_failed_jobs_are_counted(self):
+        def search(address, keyword):
+            raise RuntimeError('boom')
+
+        pool = SearchWorkerPool(search, InMemorySender(), workers=1)
+        pool.submit(SearchJob('+15550001', None, 'a', 'b'))
+        pool.join()
+        self.assertEqual(pool.stats()['failed'], 1)
+
+
+class TestAsyncSmsReply(unittest.TestCase):
+    def setUp(self):
+        self.app = main.app.test_client()
+        self.sender = InMemorySender()
+        self.pool = SearchWorkerPool(lambda address, keyword, **context: f'results for {keyword} at {address}',
+                                     self.sender)
+
+    def test_webhook_acks_before_search_completes(self):
+        form = {'From': '+15550002', 'To': '+15559999'}
+        with patch.object(main.components, 'async_reply_enabled', True), \
+                patch.object(main.components, 'search_workers', self.pool):
+            self.app.post('/sms', data=dict(form, Body='tacos'))
+            response = self.app.post('/sms', data=dict(form, Body='1 Main St'))
+            self.pool.join()
+
+        self.assertIn('Searching'.encode(), response.data)
+        self.assertEqual(main.get_user_state('+15550002')['state'], main.UserState.SEARCHING_CONTINUE)
+        self.assertEqual(self.sender.messages[0]['from'], '+15559999')
+        self.assertEqual(self.sender.messages[0]['body'], 'results for tacos at 1 main st')
+
+    @patch('main.components.http_client.session.get')
+    def test_full_queue_answers_inline_without_reopening_the_session(self, mock_get):
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = {'status': 'ZERO_RESULTS', 'results': []}
+        form = {'From': '+15550118', 'To': '+15559999'}
+        with patch.object(main.components, 'async_reply_enabled', True), \
+                patch.object(main.components.search_workers, 'submit', return_value=False):
+            self.app.post('/sms', data=dict(form, Body='tacos'))
+            reply = []
+            thread = threading.Thread(target=lambda: reply.append(
+                self.app.post('/sms', data=dict(form, Body='40.11, -75.21'))), daemon=True)
+            thread.start()
+            thread.join(5)
+
+        self.assertFalse(thread.is_alive())
+        self.assertIn(b'No places found', reply[0].data)
+        self.assertEqual(main.get_user_state('+15550118')['state'], main.UserState.SEARCHING_CONTINUE)
+        main.components.session_store.delete('+15550118')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import json
+import unittest
+import urllib.request
+
+from bench import report
+from bench.fake_google import FakeGoogleServer
+from bench.runner import run
+
+
+class TestFakeGoogleServer(unittest.TestCase):
+    def test_responses_are_deterministic(self):
+        with FakeGoogleServer() as server:
+            url = server.geocode_url + '?address=1+Main+St&key=x'
+            first = json.load(urllib.request.urlopen(url))
+            second = json.load(urllib.request.urlopen(url))
+        self.assertEqual(first['status'], 'OK')
+        self.assertEqual(first, second)
+
+    def test_error_injection(self):
+        with FakeGoogleServer(error_rate=1.0, error_kind='OVER_QUERY_LIMIT') as server:
+            data = json.load(urllib.request.urlopen(server.places_url + '?location=1,2&keyword=a'))
+        self.assertEqual(data['status'], 'OVER_QUERY_LIMIT')
+        self.assertEqual(server.stats()['errors'], 1)
+
+
+class TestBenchmarkRun(unittest.TestCase):
+    def test_full_conversations_are_replayed(self):
+        results = run(phones=3, conversations=2, latency_ms=0, jitter_ms=0)
+
+        self.assertEqual(results['requests'], 3 * 2 * 6)
+        self.assertEqual(results['error_rate'], 0.0)
+        self.assertEqual(results['steps']['address']['count'], 6)
+        self.assertEqual(results['memory']['session_bytes_growth'], 0)
+        self.assertEqual(results['memory']['sessions_after'], results['memory']['sessions_before'])
+
+    def test_compare_flags_latency_regressions(self):
+        baseline = {'throughput_rps': 100.0, 'error_rate': 0.0, 'overall': {'p99_ms': 10.0}, 'steps': {}}
+        candidate = {'throughput_rps': 100.0, 'error_rate': 0.0, 'overall': {'p99_ms': 15.0}, 'steps': {}}
+        rows, regressions = report.compare(baseline, candidate, threshold_pct=10)
+        self.assertEqual(regressions, ['overall.p99_ms'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+import main
+from bulk_search import BulkSearch, Checkpoint, configure_app, open_output, read_queries
+from rate_limit import TokenBucket
+
+
+def fake_search(keyword, address):
+    # Later lines finish first so completion order differs from input order.
+    time.sleep(0.02 / int(address.split()[0]))
+    if address.startswith('13 '):
+        raise ValueError('Geocoding was not successful')
+    return '40.7, -74.0', [{'name': f'{keyword} {n}', 'vicinity': address, 'types': ['x']} for n in range(10)]
+
+
+def query_lines(count):
+    return [json.dumps({'id': n, 'keyword': 'pizza', 'address': f'{n} Main St'}) + '\n' for n in range(1, count + 1)]
+
+
+class TestReadQueries(unittest.TestCase):
+    def test_bad_lines_become_errors(self):
+        lines = ['{"keyword": "pizza", "address": "1 Main St"}\n', '\n', 'not json\n', '{"keyword": "pizza"}\n']
+        parsed = list(read_queries(lines))
+        self.assertEqual([line for line, _, _ in parsed], [1, 3, 4])
+        self.assertIsNone(parsed[0][2])
+        self.assertIn('Invalid JSON', parsed[1][2])
+        self.assertIn("'address'", parsed[2][2])
+
+
+class TestBulkSearch(unittest.TestCase):
+    def test_input_order(self):
+        out = io.StringIO()
+        stats = BulkSearch(fake_search, workers=4, max_results=3).run(read_queries(query_lines(20)), out)
+
+        results = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([result['line'] for result in results], list(range(1, 21)))
+        self.assertEqual(len(results[0]['results']), 3)
+        self.assertNotIn('types', results[0]['results'][0])
+        self.assertEqual(results[12]['error'], 'Geocoding was not successful')
+        self.assertEqual((stats['ok'], stats['errors']), (19, 1))
+
+    def test_completion_order_writes_everything(self):
+        out = io.StringIO()
+        BulkSearch(fake_search, workers=4, ordered=False).run(read_queries(query_lines(20)), out)
+        lines = [json.loads(line)['line'] for line in out.getvalue().splitlines()]
+        self.assertEqual(sorted(lines), list(range(1, 21)))
+
+    def test_in_flight_queries_are_bounded(self):
+        in_flight = []
+        peak = [0]
+        lock = threading.Lock()
+
+        def search(keyword, address):
+            with lock:
+                in_flight.append(address)
+                peak[0] = max(peak[0], len(in_flight))
+            time.sleep(0.005)
+            with lock:
+                in_flight.remove(address)
+            return '0, 0', []
+
+        consumed = []
+
+        def lines():
+            for line in query_lines(50):
+                consumed.append(line)
+                yield line
+
+        BulkSearch(search, workers=3, window=5).run(read_queries(lines()), io.StringIO())
+        self.assertLessEqual(peak[0], 3)
+        self.assertEqual(len(consumed), 50)
+
+    def test_resume_skips_checkpointed_lines(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output_path = os.path.join(tmp, 'results.jsonl')
+            checkpoint = Checkpoint(os.path.join(tmp, 'results.ckpt'), every=5)
+            calls = []
+
+            def search(keyword, address):
+                calls.append(address)
+                if len(calls) > 12:
+                    raise KeyboardInterrupt
+                return '0, 0', []
+
+            with open(output_path, 'w') as out:
+                with self.assertRaises(KeyboardInterrupt):
+                    BulkSearch(search, workers=1, window=1).run(read_queries(query_lines(20)), out, checkpoint)
+
+            checkpoint = Checkpoint(checkpoint.path).load()
+            self.assertEqual(checkpoint.next_line, 11)
+            calls.clear()
+            with open_output(output_path, checkpoint) as out:
+                stats = BulkSearch(lambda keyword, address: calls.append(address) or ('0, 0', []),
+                                   workers=2).run(read_queries(query_lines(20)), out, checkpoint)
+
+            with open(output_path) as f:
+                lines = [json.loads(line)['line'] for line in f]
+            self.assertEqual(lines, list(range(1, 21)))
+            self.assertEqual(stats['skipped'], 10)
+            self.assertEqual(len(calls), 10)
+
+
+class TestConfigureApp(unittest.TestCase):
+    def test_batch_runs_wait_for_quota(self):
+        saved = main.configure()
+        self.addCleanup(main.configure, saved)
+        configure_app()
+        self.assertIsNone(main.components.api_scheduler.max_wait)
+        configure_app(30.0)
+        self.assertEqual(main.components.api_scheduler.max_wait, 30.0)
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_rate(self):
+        now = [0.0]
+        bucket = TokenBucket(rate=2, burst=2, clock=lambda: now[0], sleep=lambda s: now.__setitem__(0, now[0] + s))
+        for _ in range(6):
+            bucket.acquire()
+        self.assertAlmostEqual(now[0], 2.0)
+        self.assertFalse(bucket.try_acquire())
+        self.assertFalse(bucket.acquire(timeout=0.1))
+
+    def test_zero_rate_is_unlimited(self):
+        bucket = TokenBucket(rate=0, sleep=self.fail)
+        for _ in range(100):
+            self.assertTrue(bucket.acquire(timeout=0))
+        self.assertTrue(bucket.try_acquire(5))
+        self.assertEqual(bucket.wait_time(), 0.0)
+        with self.assertRaises(ValueError):
+            TokenBucket(rate=-1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+from unittest.mock import patch
+
+import main
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.now = [0.0]
+        self.breaker = CircuitBreaker('geocode', failure_rate=0.5, min_calls=4, open_seconds=10,
+                                      slow_call_seconds=1.0, clock=lambda: self.now[0])
+
+    def call(self, success=True, seconds=0.1):
+        self.breaker.before_call()
+        self.breaker.record(success, seconds)
+
+    def test_opens_on_failure_rate(self):
+        self.call()
+        self.call(False)
+        self.call()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.call(False)
+        self.assertEqual(self.breaker.state, OPEN)
+        with self.assertRaises(CircuitOpen):
+            self.breaker.before_call()
+        self.assertEqual(self.breaker.rejected, 1)
+
+    def test_opens_on_slow_calls(self):
+        for _ in range(4):
+            self.call(seconds=2.0)
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_old_failures_leave_the_window(self):
+        self.call(False)
+        self.call(False)
+        self.now[0] += 60
+        self.call()
+        self.call()
+        self.call(False)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_half_open_trial(self):
+        for _ in range(4):
+            self.call(False)
+        self.now[0] += 10
+
+        self.breaker.before_call()
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        with self.assertRaises(CircuitOpen):
+            self.breaker.before_call()
+        self.breaker.record(False, 0.1)
+        self.assertEqual(self.breaker.state, OPEN)
+
+        self.now[0] += 10
+        self.call()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(self.breaker.stats()['transitions'],
+                         {'closed->open': 1, 'open->half_open': 2, 'half_open->open': 1, 'half_open->closed': 1})
+
+    def test_cancel_returns_the_trial(self):
+        for _ in range(4):
+            self.call(False)
+        self.now[0] += 10
+        self.breaker.before_call()
+        self.breaker.cancel()
+        self.breaker.before_call()
+
+
+class TestBreakerFallback(unittest.TestCase):
+    def tearDown(self):
+        main.components.places_cache.clear()
+
+    def test_open_circuit_serves_expired_results_without_calling_google(self):
+        location = '40.741, -73.9896'
+        key = main.components.places_cache.key(location, 'sushi', main.components.radius)
+        main.components.places_cache.results.set(key, [{'name': 'Old Sushi'}], ttl=-1)
+        breaker = CircuitBreaker('nearbysearch', min_calls=1)
+        breaker.before_call()
+        breaker.record(False, 0.1)
+
+        with patch.dict(main.components.circuit_breakers, {'nearbysearch': breaker}), \
+                patch('main.components.http_client.session.get') as mock_get:
+            results = main.fetch_places(location, 'sushi')
+
+        self.assertEqual(results, [{'name': 'Old Sushi'}])
+        mock_get.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import json
+import unittest
+from unittest.mock import MagicMock, patch
+
+import main
+from async_reply import InMemorySender, SearchWorkerPool
+from deadline import Deadline, DeadlineExceeded
+from http_client import HttpClient
+
+URL = 'https://maps.googleapis.com/maps/api/geocode/json?address=x'
+
+
+def make_response(status_code, body=b'{"status": "OK"}'):
+    response = MagicMock()
+    response.status_code = status_code
+    response.content = body
+    response.json.side_effect = lambda: json.loads(body)
+    return response
+
+
+class TestDeadline(unittest.TestCase):
+    def test_check(self):
+        now = [0.0]
+        deadline = Deadline(2.0, clock=lambda: now[0])
+        deadline.check('geocode', 1.0)
+        now[0] = 1.5
+        self.assertAlmostEqual(deadline.remaining(), 0.5)
+        with self.assertRaises(DeadlineExceeded) as raised:
+            deadline.check('nearbysearch', 1.0)
+        self.assertEqual(raised.exception.stage, 'nearbysearch')
+
+
+class TestHttpClientDeadline(unittest.TestCase):
+    def test_timeouts_are_capped_to_the_remaining_budget(self):
+        client = HttpClient(connect_timeout=3, read_timeout=5)
+        with patch.object(client.session, 'get', return_value=make_response(200)) as mock_get:
+            client.get(URL, Deadline(1.0))
+        connect, read = mock_get.call_args.kwargs['timeout']
+        self.assertLessEqual(connect, 1.0)
+        self.assertLessEqual(read, 1.0)
+
+    def test_retry_skipped_when_backoff_does_not_fit(self):
+        client = HttpClient(max_retries=2, backoff=10, max_backoff=10)
+        with patch.object(client, '_backoff_delay', return_value=5.0), \
+                patch.object(client.session, 'get', return_value=make_response(503)) as mock_get:
+            response = client.get(URL, Deadline(1.0))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(client.retries_skipped, 1)
+
+
+class TestSmsReplyDeadline(unittest.TestCase):
+    def setUp(self):
+        main.components.geocode_cache.clear()
+        self.app = main.app.test_client()
+        self.sender = InMemorySender()
+        self.pool = SearchWorkerPool(lambda address, keyword, **context: f'results for {keyword} at {address}',
+                                     self.sender)
+
+    @patch('main.components.http_client.session.get')
+    def test_out_of_budget_search_is_texted_later(self, mock_get):
+        form = {'From': '+15550003', 'To': '+15559999'}
+        misses = main.deadline_misses.value('geocode')
+        with patch.object(main.components, 'request_deadline', 0.1), \
+                patch.object(main.components, 'search_workers', self.pool):
+            self.app.post('/sms', data=dict(form, Body='tacos'))
+            response = self.app.post('/sms', data=dict(form, Body='1 Main St'))
+            self.pool.join()
+
+        mock_get.assert_not_called()
+        self.assertIn('Searching'.encode(), response.data)
+        self.assertEqual(main.deadline_misses.value('geocode'), misses + 1)
+        self.assertEqual(main.get_user_state('+15550003')['state'], main.UserState.SEARCHING_CONTINUE)
+        self.assertEqual(self.sender.messages[0]['body'], 'results for tacos at 1 main st')
+        main.components.session_store.delete('+15550003')
+
+
+if __name__ == '__main__':
+    unittest.main()
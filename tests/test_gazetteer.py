@@ -0,0 +1,94 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+import main
+from gazetteer import Gazetteer
+
+ROWS = """address,lat,lng
+123 Main Street Springfield IL,39.8017,-89.6437
+125 Main Street Springfield IL,39.8019,-89.6439
+10001,40.7506,-73.9972
+Springfield IL,39.7817,-89.6501
+Springfield MO,37.2089,-93.2923
+Clinton Township MI,42.5870,-82.9199
+Clifton Township MI,44.4900,-84.3200
+"""
+
+
+class TestGazetteer(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'gazetteer.csv')
+        with open(self.path, 'w') as f:
+            f.write(ROWS)
+        self.gazetteer = Gazetteer(self.path)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_loads_lazily(self):
+        self.assertFalse(self.gazetteer.stats()['loaded'])
+        self.gazetteer.lookup('10001')
+        self.assertTrue(self.gazetteer.stats()['loaded'])
+
+    def test_exact_match_after_normalization(self):
+        self.assertEqual(self.gazetteer.lookup('123 main st., springfield, il'), '39.8017, -89.6437')
+
+    def test_typos_are_tolerated(self):
+        self.assertEqual(self.gazetteer.lookup('123 Mian Street Springfeld IL'), '39.8017, -89.6437')
+
+    def test_one_differing_state_city_or_street_falls_through(self):
+        self.assertIsNone(self.gazetteer.lookup('123 Main Street Springfield MA'))
+        self.assertIsNone(self.gazetteer.lookup('123 Main Street Springfield MO'))
+        self.assertIsNone(self.gazetteer.lookup('123 Maine Street Springfield IL'))
+        self.assertIsNone(self.gazetteer.lookup('123 Main Street Springvale IL'))
+        self.assertIsNone(self.gazetteer.lookup('Springfield'))
+
+    def test_numbers_must_match_exactly(self):
+        self.assertIsNone(self.gazetteer.lookup('127 Main Street Springfield IL'))
+        self.assertIsNone(self.gazetteer.lookup('10002'))
+
+    def test_ambiguous_match_falls_through(self):
+        self.assertIsNone(self.gazetteer.lookup('Cliton Township MI'))
+        self.assertEqual(self.gazetteer.stats()['ambiguous'], 1)
+
+    def test_hit_rate(self):
+        self.gazetteer.lookup('10001')
+        self.gazetteer.lookup('Nowhere at all')
+        self.assertEqual(self.gazetteer.stats()['hit_rate'], 0.5)
+
+    def test_duplicate_addresses_keep_the_first_row_and_are_counted(self):
+        with open(self.path, 'a') as f:
+            f.write('"123 Main St. Springfield, IL",1.0,2.0\n10001,3.0,4.0\n')
+        with self.assertLogs(level='WARNING') as logs:
+            self.assertEqual(self.gazetteer.lookup('10001'), '40.7506, -73.9972')
+        self.assertEqual(self.gazetteer.stats()['duplicates'], 2)
+        self.assertIn('skipped 2 rows', logs.output[0])
+
+    def test_counters_are_consistent_across_threads(self):
+        def look_up(address):
+            for _ in range(200):
+                self.gazetteer.lookup(address)
+
+        threads = [threading.Thread(target=look_up, args=(address,))
+                   for address in ('10001', 'Nowhere at all', '123 Mian Street Springfeld IL')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = self.gazetteer.stats()
+        self.assertEqual((stats['lookups'], stats['exact_hits'], stats['misses'], stats['fuzzy_hits']),
+                         (600, 200, 200, 200))
+
+    @patch('main.components.http_client.session.get')
+    def test_confident_match_skips_the_network(self, mock_get):
+        with patch.object(main.components, 'gazetteer', self.gazetteer):
+            self.assertEqual(main.geocode('10001'), '40.7506, -73.9972')
+        mock_get.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
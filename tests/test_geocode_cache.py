@@ -0,0 +1,91 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+import main
+from geocode_cache import GeocodeCache, LRUCache, normalize_address
+
+OK_DATA = {'status': 'OK', 'results': [{'geometry': {'location': {'lat': 123, 'lng': 456}}}]}
+
+
+class TestNormalizeAddress(unittest.TestCase):
+    def test_equivalent_addresses_share_a_key(self):
+        self.assertEqual(normalize_address('123  Main Street, Springfield'),
+                         normalize_address('123 main st. springfield'))
+
+    def test_directions_are_abbreviated(self):
+        self.assertEqual(normalize_address('10 North Oak Avenue'), '10 n oak ave')
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(max_size=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_expired_entries_miss(self):
+        now = [0]
+        cache = LRUCache(ttl=10, clock=lambda: now[0])
+        cache.set('a', 1)
+        now[0] = 11
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['expirations'], 1)
+
+
+class TestGeocodeCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'geocode.sqlite3')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_disk_tier_survives_restart(self):
+        GeocodeCache(path=self.path).set('123 Main St', OK_DATA)
+        restarted = GeocodeCache(path=self.path)
+        self.assertEqual(restarted.get('123 main street'), OK_DATA)
+        self.assertEqual(restarted.stats()['disk']['hits'], 1)
+
+    def test_disk_hit_keeps_the_ttl_it_has_left(self):
+        GeocodeCache(path=self.path, ttl=100).set('123 Main St', OK_DATA)
+        restarted = GeocodeCache(path=self.path, ttl=100)
+        restarted.disk.clock = lambda: time.time() + 90
+        self.assertEqual(restarted.get('123 Main St'), OK_DATA)
+        [(_, _, ttl)] = restarted.snapshot()
+        self.assertLess(ttl, 11)
+
+    def test_only_negative_statuses_are_cached(self):
+        cache = GeocodeCache(path=self.path)
+        cache.set('nowhere', {'status': 'ZERO_RESULTS', 'results': []})
+        cache.set('quota', {'status': 'OVER_QUERY_LIMIT', 'results': []})
+        cache.set('error', 'An error occurred: timeout')
+        self.assertEqual(cache.get('nowhere')['status'], 'ZERO_RESULTS')
+        self.assertIsNone(cache.get('quota'))
+        self.assertIsNone(cache.get('error'))
+
+
+class TestGetJsonDataCaching(unittest.TestCase):
+    def setUp(self):
+        main.components.geocode_cache.clear()
+
+    @patch('main.components.http_client.session.get')
+    def test_repeat_address_skips_the_api(self, mock_get):
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = OK_DATA
+
+        main.get_json_data('1 Cache Test Road')
+        result = main.get_json_data('1 cache test rd')
+
+        self.assertEqual(result, OK_DATA)
+        self.assertEqual(mock_get.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,7 +5,7 @@ from main import get_json_data
 
 
 class TestGetJsonData(unittest.TestCase):
-    @patch('main.requests.get')  # Mock the requests.get method
+    @patch('main.components.http_client.session.get')  # Mock the pooled session's get method
     def test_get_json_data_success(self, mock_get):
         # Set up the mock response
         mock_response = mock_get.return_value
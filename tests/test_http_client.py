@@ -0,0 +1,135 @@
+import json
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from http_client import HttpClient, LatencyRecorder
+
+
+def make_response(status_code, body=b'{"status": "OK"}'):
+    response = MagicMock()
+    response.status_code = status_code
+    response.content = body
+    response.json.side_effect = lambda: json.loads(body)
+    return response
+
+
+class TestHttpClient(unittest.TestCase):
+    def setUp(self):
+        self.client = HttpClient(max_retries=2, connect_timeout=1, read_timeout=2)
+
+    @patch('http_client.time.sleep')
+    def test_retries_server_errors_then_succeeds(self, mock_sleep):
+        with patch.object(self.client.session, 'get',
+                          side_effect=[make_response(503), make_response(200)]) as mock_get:
+            response = self.client.get('https://maps.googleapis.com/maps/api/geocode/json?address=x')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(mock_get.call_args.kwargs['timeout'], (1, 2))
+        self.assertEqual(self.client.retries, 1)
+        mock_sleep.assert_called_once()
+
+    @patch('http_client.time.sleep')
+    def test_retries_over_query_limit_up_to_the_limit(self, mock_sleep):
+        over_limit = make_response(200, b'{"status": "OVER_QUERY_LIMIT", "results": []}')
+        with patch.object(self.client.session, 'get', return_value=over_limit) as mock_get:
+            response = self.client.get('https://maps.googleapis.com/maps/api/geocode/json')
+
+        self.assertIs(response, over_limit)
+        self.assertEqual(mock_get.call_count, 3)
+
+    @patch('http_client.time.sleep')
+    def test_each_retry_is_acquired_and_skipped_when_refused(self, mock_sleep):
+        over_limit = make_response(200, b'{"status": "OVER_QUERY_LIMIT", "results": []}')
+        acquire = MagicMock(side_effect=[True, False])
+        with patch.object(self.client.session, 'get', return_value=over_limit) as mock_get:
+            response = self.client.get('https://maps.googleapis.com/maps/api/geocode/json', acquire=acquire)
+
+        self.assertIs(response, over_limit)
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(acquire.call_count, 2)
+        self.assertEqual((self.client.retries, self.client.retries_skipped), (1, 1))
+
+    def test_records_latency_per_endpoint(self):
+        with patch.object(self.client.session, 'get', return_value=make_response(200)):
+            self.client.get('https://maps.googleapis.com/maps/api/geocode/json?address=a')
+            self.client.get('https://maps.googleapis.com/maps/api/geocode/json?address=b')
+
+        stats = self.client.stats()['endpoints']['maps.googleapis.com/maps/api/geocode/json']
+        self.assertEqual(stats['count'], 2)
+
+    def test_transport_errors_propagate(self):
+        with patch.object(self.client.session, 'get', side_effect=requests.ConnectTimeout()):
+            with self.assertRaises(requests.ConnectTimeout):
+                self.client.get('https://maps.googleapis.com/maps/api/geocode/json')
+
+
+class TestHedging(unittest.TestCase):
+    URL = 'https://maps.googleapis.com/maps/api/geocode/json?address=x'
+
+    def make_client(self, ratio):
+        client = HttpClient(hedging=True, hedge_ratio=ratio, hedge_min_delay=0.02)
+        recorder = client._recorder(self.URL)
+        for _ in range(20):
+            recorder.record(0.01)
+        return client
+
+    def slow_then_fast(self):
+        calls = []
+
+        def get(url, timeout):
+            calls.append(url)
+            if len(calls) == 1:
+                time.sleep(0.3)
+            return make_response(200)
+        return calls, get
+
+    def test_slow_call_is_hedged(self):
+        client = self.make_client(ratio=1.0)
+        calls, get = self.slow_then_fast()
+        with patch.object(client.session, 'get', side_effect=get):
+            start = time.perf_counter()
+            response = client.get(self.URL)
+            elapsed = time.perf_counter() - start
+
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(elapsed, 0.25)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual((client.hedges, client.hedge_wins), (1, 1))
+
+    def test_refused_hedge_is_not_sent(self):
+        client = self.make_client(ratio=1.0)
+        calls, get = self.slow_then_fast()
+        acquire = MagicMock(return_value=False)
+        with patch.object(client.session, 'get', side_effect=get):
+            response = client.get(self.URL, acquire=acquire)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(calls), 1)
+        acquire.assert_called_once_with()
+        self.assertEqual(client.hedge_wins, 0)
+
+    def test_hedge_budget(self):
+        client = self.make_client(ratio=0.0)
+        client._hedge_tokens = 0
+        calls, get = self.slow_then_fast()
+        with patch.object(client.session, 'get', side_effect=get):
+            client.get(self.URL)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(client.hedges, 0)
+
+
+class TestLatencyRecorder(unittest.TestCase):
+    def test_percentiles(self):
+        recorder = LatencyRecorder()
+        for ms in range(1, 101):
+            recorder.record(ms / 1000)
+        self.assertAlmostEqual(recorder.percentile(95), 0.095, places=3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+import main
+from idempotency import CLAIMED, DONE, PENDING, MemoryIdempotencyStore, SQLiteIdempotencyStore
+
+
+class IdempotencyStoreTests:
+    def make_store(self, **kwargs):
+        raise NotImplementedError
+
+    def test_duplicate_returns_stored_response(self):
+        store = self.make_store()
+        calls = []
+        handler = lambda: calls.append(1) or '<Response>one</Response>'
+
+        self.assertEqual(store.run('SM1', handler), '<Response>one</Response>')
+        self.assertEqual(store.run('SM1', handler), '<Response>one</Response>')
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(store.stats()['duplicates'], 1)
+
+    def test_failed_handler_releases_the_claim(self):
+        store = self.make_store()
+
+        def fail():
+            raise ValueError('boom')
+
+        with self.assertRaises(ValueError):
+            store.run('SM2', fail)
+        self.assertEqual(store.run('SM2', lambda: 'ok'), 'ok')
+
+    def test_concurrent_duplicate_waits_for_the_first(self):
+        store = self.make_store()
+        started = threading.Event()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            started.set()
+            time.sleep(0.1)
+            return 'first'
+
+        results = []
+        first = threading.Thread(target=lambda: results.append(store.run('SM3', slow)))
+        first.start()
+        started.wait()
+        results.append(store.run('SM3', lambda: 'second'))
+        first.join()
+
+        self.assertEqual(results, ['first', 'first'])
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(store.stats()['waited'], 1)
+
+    def test_gives_up_waiting(self):
+        store = self.make_store(wait_timeout=0.05)
+        self.assertEqual(store.claim('SM4')[0], CLAIMED)
+        self.assertEqual(store.run('SM4', lambda: 'second', pending_response='<Response/>'), '<Response/>')
+        self.assertEqual(store.stats()['wait_timeouts'], 1)
+
+    def test_expired_lease_can_be_claimed(self):
+        now = [1000.0]
+        store = self.make_store(lease_ttl=30, clock=lambda: now[0])
+        self.assertEqual(store.claim('SM5')[0], CLAIMED)
+        self.assertEqual(store.claim('SM5')[0], PENDING)
+        now[0] += 31
+        self.assertEqual(store.claim('SM5')[0], CLAIMED)
+
+
+class TestMemoryIdempotencyStore(IdempotencyStoreTests, unittest.TestCase):
+    def make_store(self, **kwargs):
+        return MemoryIdempotencyStore(**kwargs)
+
+    def test_bounded(self):
+        store = self.make_store(max_entries=2)
+        for sid in ('SM1', 'SM2', 'SM3'):
+            store.run(sid, lambda: sid)
+        self.assertEqual(store.stats()['entries'], 2)
+        self.assertEqual(store.claim('SM1')[0], CLAIMED)
+
+    def test_claims_in_flight_are_not_evicted(self):
+        store = self.make_store(max_entries=2)
+        self.assertEqual(store.claim('SM1')[0], CLAIMED)
+        self.assertEqual(store.claim('SM2')[0], CLAIMED)
+        store.run('SM3', lambda: 'third')
+        self.assertEqual(store.claim('SM1')[0], PENDING)
+        self.assertEqual(store.claim('SM2')[0], PENDING)
+
+        store.run('SM4', lambda: 'fourth')
+        self.assertEqual(store.stats()['entries'], 3)
+        self.assertEqual(store.claim('SM3')[0], CLAIMED)
+
+
+class TestSQLiteIdempotencyStore(IdempotencyStoreTests, unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'sessions.sqlite3')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def make_store(self, **kwargs):
+        return SQLiteIdempotencyStore(self.path, **kwargs)
+
+    def test_shared_between_stores(self):
+        first, second = self.make_store(), self.make_store()
+        first.run('SM6', lambda: 'from first')
+        self.assertEqual(second.claim('SM6'), (DONE, 'from first'))
+
+
+class TestWebhookRetries(unittest.TestCase):
+    def setUp(self):
+        self.app = main.app.test_client()
+
+    def tearDown(self):
+        main.components.session_store.delete('+15550004')
+
+    def test_retried_yes_does_not_skip_a_step(self):
+        main.set_user_state('+15550004', main.UserState.SEARCHING_CONTINUE)
+        form = {'From': '+15550004', 'Body': 'yes', 'MessageSid': 'SMretry1'}
+
+        first = self.app.post('/sms', data=form)
+        retry = self.app.post('/sms', data=form)
+
+        self.assertEqual(first.data, retry.data)
+        self.assertIn(b'what new business', first.data)
+        self.assertEqual(main.get_user_state('+15550004')['state'], main.UserState.SEARCHING_FOR_NEW_BUSINESS)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import main
+from local_index import LocalPlaceIndex, load_index
+
+BUSINESSES = [
+    {'name': "Joe's Pizza", 'vicinity': '7 Carmine St', 'lat': 40.7306, 'lng': -74.0021, 'rating': 4.6,
+     'open_now': 'true', 'keywords': 'pizza;restaurant'},
+    {'name': 'Prince Street Pizza', 'vicinity': '27 Prince St', 'lat': 40.7231, 'lng': -73.9945, 'rating': 4.8,
+     'open_now': '', 'keywords': 'pizza'},
+    {'name': 'Blue Bottle Coffee', 'vicinity': '54 W 40th St', 'lat': 40.7527, 'lng': -73.9832, 'rating': 4.4,
+     'open_now': 'false', 'keywords': 'coffee;cafe'},
+    {'name': 'Philly Pizza', 'vicinity': '1 Market St', 'lat': 39.9526, 'lng': -75.1652, 'rating': 4.0,
+     'open_now': '', 'keywords': 'pizza'},
+]
+
+
+class TestLocalPlaceIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.tmpdir.name, 'businesses.csv')
+        with open(self.csv_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(BUSINESSES[0]))
+            writer.writeheader()
+            writer.writerows(BUSINESSES)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_radius_and_keyword_query(self):
+        index = LocalPlaceIndex.from_file(self.csv_path)
+        results = index.query(40.7300, -74.0000, 2000, 'Pizza')
+        self.assertEqual([r['name'] for r in results], ["Joe's Pizza", 'Prince Street Pizza'])
+        self.assertEqual(results[0]['opening_hours'], {'open_now': True})
+        self.assertNotIn('opening_hours', results[1])
+
+    def test_order_by_rating(self):
+        index = LocalPlaceIndex.from_file(self.csv_path)
+        results = index.query(40.7300, -74.0000, 2000, 'pizza', order='rating')
+        self.assertEqual(results[0]['name'], 'Prince Street Pizza')
+
+    def test_unknown_keyword_returns_nothing(self):
+        index = LocalPlaceIndex.from_file(self.csv_path)
+        self.assertEqual(index.query(40.73, -74.0, 50000, 'laundromat'), [])
+
+    def test_snapshot_round_trip(self):
+        snapshot_path = os.path.join(self.tmpdir.name, 'businesses.idx')
+        LocalPlaceIndex.from_file(self.csv_path).save(snapshot_path)
+        loaded = load_index(snapshot_path)
+        self.assertEqual(len(loaded), len(BUSINESSES))
+        self.assertEqual(loaded.query(40.7527, -73.9832, 500, 'cafe')[0]['name'], 'Blue Bottle Coffee')
+
+    def test_jsonl_google_shaped_records(self):
+        jsonl_path = os.path.join(self.tmpdir.name, 'places.jsonl')
+        with open(jsonl_path, 'w') as f:
+            f.write(json.dumps({'name': 'Store', 'vicinity': '123 Main St', 'types': ['grocery_or_supermarket'],
+                                'geometry': {'location': {'lat': 12.34, 'lng': 56.78}}}) + '\n')
+        results = LocalPlaceIndex.from_file(jsonl_path).query(12.34, 56.78, 100, 'grocery')
+        self.assertEqual(results[0]['vicinity'], '123 Main St')
+
+
+class TestLocalBackend(unittest.TestCase):
+    def setUp(self):
+        main.components.places_cache.clear()
+        self.index = LocalPlaceIndex.build(
+            [{'name': 'Store', 'vicinity': '123 Main St', 'lat': 12.34, 'lng': 56.78, 'rating': 4.5,
+              'reviews': 10, 'open_now': None, 'keywords': 'grocery'}])
+
+    def test_local_backend_matches_google_formatting(self):
+        with patch.object(main.components, 'places_backend', 'local'), \
+                patch.object(main.components, 'local_index', self.index):
+            result = main.nearby_search('12.34,56.78', 'grocery')
+        self.assertEqual(result, "Nearby places:\nName: Store\nAddress: 123 Main St\nDistance: 0 m\n"
+                                 "Hours: N/A\nRating: 4.5\n")
+
+    @patch('main.components.http_client.session.get')
+    def test_auto_backend_falls_back_when_over_quota(self, mock_get):
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = {'status': 'OVER_QUERY_LIMIT', 'results': []}
+        with patch.object(main.components, 'places_backend', 'auto'), \
+                patch.object(main.components, 'local_index_path', 'x'), \
+                patch.object(main.components, 'local_index', self.index), \
+                patch.object(main.components.http_client, 'max_retries', 0):
+            result = main.nearby_search('12.34,56.78', 'grocery')
+        self.assertIn('Name: Store', result)
+
+
+if __name__ == '__main__':
+    unittest.main()
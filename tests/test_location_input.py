@@ -0,0 +1,70 @@
+import unittest
+from unittest.mock import patch
+
+import main
+from location_input import decode_plus_code, parse_decimal, parse_dms, recover_nearest, resolve
+
+
+def no_geocode(text):
+    raise AssertionError(f'geocoded {text!r}')
+
+
+class TestResolve(unittest.TestCase):
+    def test_coordinates(self):
+        self.assertEqual(resolve('40.7128, -74.0060', no_geocode), ('decimal', '40.7128, -74.006'))
+        self.assertEqual(resolve('40°42\'46"n 74°0\'22"w', no_geocode), ('dms', '40.712778, -74.006111'))
+        self.assertEqual(parse_dms('74.006° w, 40.7128° n'), (40.7128, -74.006))
+        self.assertEqual(parse_dms('40d 30\' n 74d w'), (40.5, -74.0))
+        self.assertEqual(parse_dms('40.5 n 74 w'), (40.5, -74.0))
+
+    def test_whole_numbers_are_not_coordinates_in_free_text(self):
+        self.assertIsNone(parse_decimal('5, 12'))
+        self.assertIsNone(parse_decimal('10 12'))
+        self.assertEqual(parse_decimal('40, -74.5'), (40.0, -74.5))
+        self.assertEqual(resolve('geo:40,-74', no_geocode), ('geo_uri', '40.0, -74.0'))
+        self.assertEqual(resolve('5, 12', lambda text: 'geocoded'), ('text', 'geocoded'))
+
+    def test_address_like_numbers_are_not_dms(self):
+        self.assertIsNone(parse_dms('50 n 100 w'))
+        self.assertIsNone(parse_dms('40 N 111 W'))
+
+    def test_share_urls(self):
+        google = 'https://www.google.com/maps/place/joe\'s+pizza/@40.7306,-73.9866,17z/data=x'
+        apple = 'https://maps.apple.com/?q=pizza&ll=40.7306,-73.9866'
+        self.assertEqual(resolve(google, no_geocode), ('google_maps', '40.7306, -73.9866'))
+        self.assertEqual(resolve(apple, no_geocode), ('apple_maps', '40.7306, -73.9866'))
+        self.assertEqual(resolve('geo:40.7306,-73.9866', no_geocode), ('geo_uri', '40.7306, -73.9866'))
+
+    def test_url_with_an_address_geocodes_only_the_address(self):
+        url = 'https://www.google.com/maps/search/?api=1&query=350+5th+avenue+new+york'
+        self.assertEqual(resolve(url, lambda text: text), ('google_maps', '350 5th avenue new york'))
+
+    def test_plus_codes(self):
+        lat, lng = decode_plus_code('87G7PX7V+4H')
+        self.assertAlmostEqual(lat, 40.71281, places=4)
+        self.assertAlmostEqual(lng, -74.00606, places=4)
+        self.assertEqual(resolve('849vcwc8+r9', no_geocode), ('plus_code', '37.422063, -122.084063'))
+
+        kind, location = resolve('px7v+4h new york', lambda text: '40.7, -74.0')
+        self.assertEqual((kind, location), ('plus_code_short', '40.712813, -74.006062'))
+        # Across a grid boundary the nearest cell wins over the reference's own.
+        lat, _ = recover_nearest('XX+X2', 40.0001, -74.5)
+        self.assertLess(lat, 40.0)
+
+    def test_free_text_is_geocoded(self):
+        for text in ('123 main st', '10001', '5 12'):
+            self.assertEqual(resolve(text, lambda text: 'geocoded'), ('text', 'geocoded'))
+
+
+class TestGeocodeFastPath(unittest.TestCase):
+    @patch('main.components.http_client.session.get')
+    def test_coordinates_skip_the_geocoding_api(self, mock_get):
+        self.assertEqual(main.geocode('40.7128,-74.0060'), '40.7128, -74.006')
+        mock_get.assert_not_called()
+        self.assertGreater(main.location_inputs.value('decimal', 'local'), 0)
+        gauges = {name: series for name, _, _, series in main.collect_component_stats()}
+        self.assertGreater(gauges['geocode_skipped_ratio'][0][1], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
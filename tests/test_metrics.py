@@ -0,0 +1,89 @@
+import unittest
+from unittest.mock import patch
+
+import main
+from metrics import Registry
+
+GEOCODE_DATA = {'status': 'OK', 'results': [{'geometry': {'location': {'lat': 40.741, 'lng': -73.9896}}}]}
+PLACES_DATA = {'status': 'OK', 'results': [{'name': 'Store', 'vicinity': '123 Main St', 'rating': 4.5}]}
+
+
+class TestRegistry(unittest.TestCase):
+    def test_counter_render(self):
+        registry = Registry()
+        counter = registry.counter('requests_total', 'Requests.', ('code',))
+        counter.inc('200')
+        counter.inc('200')
+        counter.inc('500')
+
+        text = registry.render()
+        self.assertIn('# TYPE requests_total counter', text)
+        self.assertIn('requests_total{code="200"} 2', text)
+        self.assertIn('requests_total{code="500"} 1', text)
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = Registry()
+        histogram = registry.histogram('stage_seconds', 'Stage time.', ('stage',), buckets=(0.1, 1.0))
+        histogram.observe(0.05, 'geocode')
+        histogram.observe(0.5, 'geocode')
+        histogram.observe(5, 'geocode')
+
+        text = registry.render()
+        self.assertIn('stage_seconds_bucket{stage="geocode",le="0.1"} 1', text)
+        self.assertIn('stage_seconds_bucket{stage="geocode",le="1"} 2', text)
+        self.assertIn('stage_seconds_bucket{stage="geocode",le="+Inf"} 3', text)
+        self.assertIn('stage_seconds_count{stage="geocode"} 3', text)
+
+    def test_sampling_skips_timing(self):
+        registry = Registry(sample_rate=0.0)
+        histogram = registry.histogram('stage_seconds', 'Stage time.', ('stage',))
+        timed = registry.timed(histogram, 'format')(lambda: 'done')
+
+        self.assertEqual(timed(), 'done')
+        self.assertEqual(histogram.count('format'), 0)
+
+    def test_collector_samples(self):
+        registry = Registry()
+        registry.register_collector(lambda: [('queue_depth', 'gauge', 'Queue depth.', [({}, 3), ({'x': 'y'}, None)])])
+        text = registry.render()
+        self.assertIn('queue_depth 3', text)
+        self.assertNotIn('x="y"', text)
+
+
+class TestMetricsRoute(unittest.TestCase):
+    def setUp(self):
+        main.components.geocode_cache.clear()
+        main.components.places_cache.clear()
+        self.app = main.app.test_client()
+
+    def tearDown(self):
+        main.components.geocode_cache.clear()
+        main.components.places_cache.clear()
+
+    @patch('main.components.http_client.session.get')
+    def test_search_records_stages_and_statuses(self, mock_get):
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.side_effect = [GEOCODE_DATA, PLACES_DATA]
+        before = main.stage_seconds.count('nearby_search')
+        geocode_ok = main.google_statuses.value('geocode', 'OK')
+
+        main.search_businesses('123 Metrics St', 'pizza')
+
+        response = self.app.get('/metrics')
+        text = response.get_data(as_text=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain'))
+        self.assertEqual(main.stage_seconds.count('nearby_search'), before + 1)
+        self.assertEqual(main.google_statuses.value('geocode', 'OK'), geocode_ok + 1)
+        self.assertIn('sms_stage_seconds_bucket{stage="get_json_data"', text)
+        self.assertIn('places_cache_api_calls_total', text)
+
+    def test_transitions_are_counted(self):
+        before = main.sms_transitions.value('new', main.UserState.waiting_for_address)
+        self.app.post('/sms', data={'From': '+15550100', 'Body': 'tacos'})
+        self.assertEqual(main.sms_transitions.value('new', main.UserState.waiting_for_address), before + 1)
+        main.components.session_store.delete('+15550100')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+import main
+
+
+def places(prefix, count):
+    return [{'place_id': f'{prefix}{i}', 'name': f'{prefix.title()} {i}', 'vicinity': f'{i} Main St',
+             'rating': 4.9 - i * 0.1, 'user_ratings_total': 500} for i in range(count)]
+
+
+def response(data):
+    mock = MagicMock(status_code=200, content=b'')
+    mock.json.return_value = data
+    return mock
+
+
+class TestMoreResults(unittest.TestCase):
+    @patch('main.components.http_client.session.get')
+    def test_more_serves_stored_results_without_a_request(self, mock_get):
+        mock_get.return_value = response({'status': 'OK', 'results': places('bakery', 8)})
+        session = {}
+
+        first = main.nearby_search('41.01,-75.01', 'bakery', 5, session=session)
+        more = main.more_results(session)
+
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertIn('Bakery 0', first)
+        self.assertNotIn('Bakery 5', first)
+        self.assertIn('Bakery 5', more)
+        self.assertIn('Bakery 7', more)
+        self.assertNotIn('Bakery 0', more)
+        self.assertEqual(main.more_results(session), 'There are no more results for this search.')
+
+    @patch('main.components.http_client.session.get')
+    def test_next_page_is_fetched_when_stored_results_run_out(self, mock_get):
+        def get(url, timeout):
+            if 'pagetoken=page2' in url:
+                return response({'status': 'OK', 'results': places('deli', 12)[6:]})
+            return response({'status': 'OK', 'results': places('deli', 6), 'next_page_token': 'page2'})
+
+        mock_get.side_effect = get
+        session = {}
+        main.nearby_search('41.02,-75.02', 'deli', 5, session=session)
+
+        more = main.more_results(session)
+
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertIn('Deli 5', more)
+        self.assertIn('Deli 6', more)
+        self.assertEqual(session['more']['tokens'], {})
+
+    @patch('main.components.http_client.session.get')
+    def test_next_page_is_prefetched_in_the_background(self, mock_get):
+        def get(url, timeout):
+            if 'pagetoken=page3' in url:
+                return response({'status': 'OK', 'results': places('pizza', 20)[10:]})
+            return response({'status': 'OK', 'results': places('pizza', 10), 'next_page_token': 'page3'})
+
+        mock_get.side_effect = get
+        session = {}
+        main.nearby_search('41.03,-75.03', 'pizza', 5, session=session)
+
+        main.more_results(session)
+        for _ in range(100):
+            if main.components.places_cache.get_page('page3') is not None:
+                break
+            time.sleep(0.01)
+
+        self.assertEqual(len(main.components.places_cache.get_page('page3')), 10)
+        self.assertIn('Pizza 10', main.more_results(session))
+        self.assertEqual(mock_get.call_count, 2)
+
+
+class TestMoreCommand(unittest.TestCase):
+    def setUp(self):
+        self.app = main.app.test_client()
+
+    def tearDown(self):
+        main.components.session_store.delete('+15550018')
+
+    def test_more_without_a_search(self):
+        main.set_user_state('+15550018', main.UserState.SEARCHING_CONTINUE)
+
+        reply = self.app.post('/sms', data={'From': '+15550018', 'Body': 'more'})
+
+        self.assertIn(b'no more results', reply.data)
+        self.assertEqual(main.get_user_state('+15550018')['state'], main.UserState.SEARCHING_CONTINUE)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,11 @@
+import time
 import unittest
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 from main import nearby_search
 
 
 class TestNearbySearch(unittest.TestCase):
-    @patch('main.requests.get')  # Mock the requests.get method
+    @patch('main.components.http_client.session.get')  # Mock the pooled session's get method
     def test_nearby_search_success(self, mock_get):
         # Set up the mock response
         mock_response = mock_get.return_value
@@ -20,6 +21,33 @@ class TestNearbySearch(unittest.TestCase):
         # Add more test cases for error handling
         # ...
 
+    @patch('main.components.http_client.session.get')
+    def test_multiple_keywords_are_searched_concurrently(self, mock_get):
+        places = {
+            'coffee': [{'place_id': 'shared', 'name': 'Cafe Donut', 'vicinity': '1 Main St', 'rating': 4.7,
+                        'user_ratings_total': 800},
+                       {'place_id': 'c1', 'name': 'Beans', 'vicinity': '2 Main St', 'rating': 3.9}],
+            'donuts': [{'place_id': 'shared', 'name': 'Cafe Donut', 'vicinity': '1 Main St', 'rating': 4.7,
+                        'user_ratings_total': 800}],
+        }
+
+        def get(url, timeout):
+            time.sleep(0.2)
+            keyword = 'coffee' if 'keyword=coffee' in url else 'donuts'
+            response = MagicMock(status_code=200, content=b'')
+            response.json.return_value = {'status': 'OK', 'results': places[keyword]}
+            return response
+
+        mock_get.side_effect = get
+        start = time.perf_counter()
+        result = nearby_search('40.1,-75.2', 'coffee or donuts')
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertLess(elapsed, 0.35)
+        self.assertEqual(result.count('Cafe Donut'), 1)
+        self.assertLess(result.index('Cafe Donut'), result.index('Beans'))
+
 
 if __name__ == '__main__':
     unittest.main()
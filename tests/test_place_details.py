@@ -0,0 +1,99 @@
+import threading
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+import main
+from place_details import DetailsEnricher, summarize, trim
+
+WEEK = [f'{day}: {hours}' for day, hours in zip(
+    ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'),
+    ('9:00 AM – 5:00 PM',) * 5 + ('10:00 AM – 2:00 PM', 'Closed'))]
+
+
+def response(data):
+    mock = MagicMock(status_code=200, content=b'')
+    mock.json.return_value = data
+    return mock
+
+
+class TestSummarize(unittest.TestCase):
+    def test_todays_hours_in_the_places_time_zone(self):
+        # Sunday 02:00 UTC is still Saturday evening five hours west.
+        now = datetime(2026, 10, 18, 2, 0, tzinfo=timezone.utc)
+        details = summarize({'formatted_phone_number': '(212) 555-0100', 'utc_offset': -300,
+                             'opening_hours': {'weekday_text': WEEK}}, now)
+        self.assertEqual(details, {'phone': '(212) 555-0100', 'hours_today': '10:00 AM - 2:00 PM'})
+        self.assertEqual(summarize({'opening_hours': {'open_now': True}}), {})
+
+
+class TestDetailsEnricher(unittest.TestCase):
+    def test_cached_details_are_merged_without_a_lookup(self):
+        enricher = DetailsEnricher(lambda place_id: {'formatted_phone_number': place_id})
+        results = [{'place_id': 'a'}, {'place_id': 'b'}, {'name': 'no id'}]
+        self.assertEqual(enricher.enrich(results), [{'place_id': 'a', 'phone': 'a'}, {'place_id': 'b', 'phone': 'b'},
+                                                    {'name': 'no id'}])
+        with patch.object(enricher, 'fetch') as fetch:
+            enricher.enrich(results)
+        fetch.assert_not_called()
+        self.assertEqual(enricher.stats()['hit_ratio'], 0.5)
+
+    def test_slow_lookups_are_left_out_and_finish_in_the_background(self):
+        release = threading.Event()
+
+        def fetch(place_id):
+            if place_id == 'slow':
+                release.wait(5)
+            return {'formatted_phone_number': place_id}
+
+        enricher = DetailsEnricher(fetch, budget=0.05)
+        results = enricher.enrich([{'place_id': 'fast'}, {'place_id': 'slow'}])
+        self.assertEqual(results, [{'place_id': 'fast', 'phone': 'fast'}, {'place_id': 'slow'}])
+        self.assertEqual(enricher.stats()['timeouts'], 1)
+
+        release.set()
+        enricher.pool.shutdown(wait=True)
+        self.assertEqual(enricher.cache.get('slow'), {'formatted_phone_number': 'slow'})
+
+    def test_cached_hours_follow_the_day(self):
+        enricher = DetailsEnricher(lambda place_id: trim({'utc_offset': -300, 'opening_hours': {
+            'open_now': True, 'weekday_text': WEEK}}))
+        friday = datetime(2026, 10, 16, 20, 0, tzinfo=timezone.utc)
+        saturday = friday + timedelta(days=1)
+        self.assertEqual(enricher.enrich([{'place_id': 'a'}], now=friday)[0]['hours_today'], '9:00 AM - 5:00 PM')
+        self.assertEqual(enricher.enrich([{'place_id': 'a'}], now=saturday)[0]['hours_today'], '10:00 AM - 2:00 PM')
+        self.assertEqual(enricher.stats()['fetched'], 1)
+
+    def test_failed_lookups_are_not_cached(self):
+        enricher = DetailsEnricher(MagicMock(side_effect=RuntimeError('boom')))
+        self.assertEqual(enricher.enrich([{'place_id': 'a'}]), [{'place_id': 'a'}])
+        self.assertEqual(enricher.stats()['errors'], 1)
+        self.assertIsNone(enricher.cache.get('a'))
+
+
+class TestRepliesWithDetails(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.object(main.components, 'place_details_enabled', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch('main.components.http_client.session.get')
+    def test_reply_shows_phone_and_hours(self, mock_get):
+        def get(url, timeout):
+            if '/details/' in url:
+                return response({'status': 'OK', 'result': {'formatted_phone_number': '(212) 555-0100',
+                                                            'opening_hours': {'weekday_text': WEEK}}})
+            return response({'status': 'OK', 'results': [
+                {'place_id': 'details-1', 'name': 'Joe', 'vicinity': '1 Main St', 'opening_hours': {'open_now': True}},
+                {'name': 'No Id', 'vicinity': '2 Main St'}]})
+
+        mock_get.side_effect = get
+        reply = main.nearby_search('41.03,-75.03', 'florist', 5)
+
+        self.assertIn('Phone: (212) 555-0100', reply)
+        self.assertRegex(reply, r'Hours: Open, today (Closed|\d+:00 [AP]M - \d+:00 PM)')
+        self.assertEqual(sum('/details/' in call.args[0] for call in mock_get.call_args_list), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import time
+import unittest
+from unittest.mock import patch
+
+import main
+from places_cache import PlacesCache, geohash, parse_location, split_keywords
+
+PLACES_DATA = {'status': 'OK', 'results': [
+    {'name': 'Store', 'vicinity': '123 Main St', 'rating': 4.5},
+    {'name': 'Market', 'vicinity': '9 Elm St', 'opening_hours': {'open_now': True}},
+]}
+
+
+class TestGeohash(unittest.TestCase):
+    def test_known_value(self):
+        self.assertEqual(geohash(57.64911, 10.40744, precision=11), 'u4pruydqqvj')
+
+    def test_parse_location(self):
+        self.assertEqual(parse_location('40.7, -74.0'), (40.7, -74.0))
+        self.assertIsNone(parse_location('None'))
+
+
+class TestSplitKeywords(unittest.TestCase):
+    def test_separators(self):
+        self.assertEqual(split_keywords('coffee or donuts'), ['coffee', 'donuts'])
+        self.assertEqual(split_keywords('Tacos, burritos / tacos'), ['tacos', 'burritos'])
+
+    def test_names_are_not_split(self):
+        self.assertEqual(split_keywords('bed & breakfast'), ['bed & breakfast'])
+        self.assertEqual(split_keywords('orange julius'), ['orange julius'])
+        self.assertEqual(split_keywords('24/7 gym'), ['24/7 gym'])
+        self.assertEqual(split_keywords('bar/grill'), ['bar/grill'])
+
+    def test_limit(self):
+        self.assertEqual(split_keywords('a, b, c, d', limit=2), ['a', 'b'])
+
+
+class TestPlacesCache(unittest.TestCase):
+    def test_nearby_locations_share_a_cell(self):
+        cache = PlacesCache()
+        fetches = []
+        fetch = lambda: fetches.append(1) or ['place']
+
+        cache.get_or_fetch('40.74100, -73.98960', 'Pizza', 8047, fetch)
+        result = cache.get_or_fetch('40.74150, -73.98990', 'pizza ', 8047, fetch)
+
+        self.assertEqual(result, ['place'])
+        self.assertEqual(len(fetches), 1)
+        self.assertEqual(cache.stats()['api_calls_avoided'], 1)
+
+    def test_radius_is_part_of_the_key(self):
+        cache = PlacesCache()
+        cache.set('40.741, -73.9896', 'pizza', 8047, ['place'])
+        self.assertIsNone(cache.get('40.741, -73.9896', 'pizza', 1000))
+
+    def test_hit_is_sub_millisecond(self):
+        cache = PlacesCache()
+        cache.set('40.741, -73.9896', 'pizza', 8047, ['place'])
+        start = time.perf_counter()
+        for _ in range(1000):
+            cache.get('40.741, -73.9896', 'pizza', 8047)
+        self.assertLess((time.perf_counter() - start) / 1000, 0.001)
+
+
+class TestNearbySearchCaching(unittest.TestCase):
+    def setUp(self):
+        main.components.places_cache.clear()
+
+    @patch('main.components.http_client.session.get')
+    def test_cached_results_are_reformatted_per_request(self, mock_get):
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = PLACES_DATA
+
+        first = main.nearby_search('12.34,56.78', 'grocery', max_results=1)
+        second = main.nearby_search('12.34,56.78', 'grocery', max_results=2)
+
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(first.count('Name: '), 1)
+        self.assertIn('Name: Store\nAddress: 123 Main St', second)
+        self.assertIn('Name: Market\nAddress: 9 Elm St\nHours: Open', second)
+        self.assertIn('radius=8047', mock_get.call_args[0][0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import marshal
+import time
+import unittest
+from unittest.mock import patch
+
+import main
+from profiling import RequestProfiler
+
+
+def slow_lookup():
+    time.sleep(0.05)
+    return 'done'
+
+
+class TestRequestProfiler(unittest.TestCase):
+    def test_only_admins_or_the_sample_rate_turn_profiling_on(self):
+        profiler = RequestProfiler()
+        self.assertIsNone(profiler.mode_for(None))
+        self.assertIsNone(profiler.mode_for('cprofile', authorized=lambda: False))
+        self.assertEqual(profiler.mode_for('cprofile', authorized=lambda: True), 'cprofile')
+        self.assertEqual(RequestProfiler(sample_rate=1.0, default_mode='cprofile').mode_for(None), 'cprofile')
+
+    def test_sampled_profile_has_collapsed_stacks(self):
+        profiler = RequestProfiler(interval=0.001)
+        result, profile = profiler.profile('sample', slow_lookup, 'test')
+        self.assertEqual(result, 'done')
+        self.assertIn('test_profiling.py:slow_lookup', profile.collapsed())
+        self.assertIsNone(profile.pstats_text())
+
+    def test_cprofile_and_the_ring_buffer(self):
+        profiler = RequestProfiler(size=2)
+        profiles = [profiler.profile('cprofile', slow_lookup)[1] for _ in range(3)]
+        self.assertIn('slow_lookup', profiles[-1].pstats_text())
+        self.assertTrue(marshal.loads(profiles[-1].pstats_dump()))
+        self.assertEqual(profiler.recent(), [profiles[2], profiles[1]])
+        self.assertIsNone(profiler.get(profiles[0].id))
+
+
+class TestProfileEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.app = main.app.test_client()
+        patcher = patch.object(main.components, 'settings', main.components.settings.replace(admin_token='secret'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        main.components.session_store.delete('+15550025')
+
+    def test_admin_profiles_a_webhook_and_reads_it_back(self):
+        reply = self.app.post('/sms', data={'From': '+15550025', 'Body': 'pizza'},
+                              headers={'X-Profile': 'cprofile', 'X-Admin-Token': 'secret'})
+        profile_id = reply.headers['X-Profile-Id']
+
+        listing = self.app.get(f'/admin/profiles/{profile_id}', headers={'X-Admin-Token': 'secret'})
+        self.assertIn(b'sms_reply', listing.data)
+        self.assertIn(profile_id.encode(), self.app.get('/admin/profiles', headers={'X-Admin-Token': 'secret'}).data)
+        self.assertEqual(self.app.get(f'/admin/profiles/{profile_id}').status_code, 404)
+        self.assertEqual(self.app.get(f'/admin/profiles/{profile_id}?format=collapsed',
+                                      headers={'X-Admin-Token': 'secret'}).status_code, 400)
+
+    def test_profile_header_needs_the_admin_token(self):
+        reply = self.app.post('/sms', data={'From': '+15550025', 'Body': 'pizza'}, headers={'X-Profile': 'sample'})
+        self.assertNotIn('X-Profile-Id', reply.headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import time
+import unittest
+
+import numpy as np
+
+from ranking import format_distance, haversine_meters, merge_results, rank, score_results, top_k
+
+
+class TestRanking(unittest.TestCase):
+    def test_merge_keeps_best_position_per_place(self):
+        first = [{'place_id': 'a'}, {'place_id': 'b'}]
+        second = [{'place_id': 'b'}, {'place_id': 'c'}]
+        merged = {result['place_id']: position for result, position in merge_results([first, second])}
+        self.assertEqual(merged, {'a': 0, 'b': 0, 'c': 1})
+
+    def test_well_reviewed_beats_thinly_reviewed(self):
+        few = {'rating': 5.0, 'user_ratings_total': 2}
+        many = {'rating': 4.6, 'user_ratings_total': 2000}
+        scores, _ = score_results([few, many])
+        self.assertGreater(scores[1], scores[0])
+
+    def test_rank_truncates_and_orders(self):
+        coffee = [{'place_id': 'a', 'rating': 3.0}, {'place_id': 'b', 'rating': 4.8, 'user_ratings_total': 500}]
+        donuts = [{'place_id': 'c', 'rating': 4.2, 'user_ratings_total': 300}, {'place_id': 'a', 'rating': 3.0}]
+        self.assertEqual([result['place_id'] for result in rank([coffee, donuts], 2)], ['b', 'c'])
+
+    def test_distance_is_weighed_and_attached(self):
+        origin = (40.7410, -73.9896)
+        near = {'place_id': 'near', 'rating': 4.4, 'user_ratings_total': 300,
+                'geometry': {'location': {'lat': 40.7420, 'lng': -73.9896}}}
+        far = {'place_id': 'far', 'rating': 4.5, 'user_ratings_total': 300,
+               'geometry': {'location': {'lat': 40.7900, 'lng': -73.9896}}}
+        unknown = {'place_id': 'unknown', 'rating': 3.0}
+
+        ranked = rank([[far, near, unknown]], 3, origin, 8047)
+
+        self.assertEqual([result['place_id'] for result in ranked], ['near', 'far', 'unknown'])
+        self.assertAlmostEqual(ranked[0]['distance_meters'], 111, delta=2)
+        self.assertNotIn('distance_meters', ranked[2])
+        self.assertNotIn('distance_meters', near)
+
+    def test_haversine(self):
+        distances = haversine_meters(40.7128, -74.0060, np.array([40.7128, 34.0522]), np.array([-74.0060, -118.2437]))
+        self.assertAlmostEqual(distances[0], 0)
+        self.assertAlmostEqual(distances[1] / 1000, 3936, delta=5)
+
+    def test_top_k_matches_full_sort(self):
+        scores = np.random.default_rng(1).random(5000)
+        self.assertEqual(list(top_k(scores, 5)), list(np.argsort(-scores)[:5]))
+
+    def test_thousands_of_candidates(self):
+        rng = np.random.default_rng(2)
+        results = [{'place_id': str(n), 'rating': float(rating), 'user_ratings_total': int(reviews),
+                    'geometry': {'location': {'lat': 40.7 + float(dlat), 'lng': -74.0 + float(dlng)}}}
+                   for n, (rating, reviews, dlat, dlng) in enumerate(zip(
+                       rng.uniform(1, 5, 5000), rng.integers(0, 1000, 5000),
+                       rng.uniform(-0.05, 0.05, 5000), rng.uniform(-0.05, 0.05, 5000)))]
+        start = time.perf_counter()
+        ranked = rank([results], 5, (40.7, -74.0), 8047)
+        self.assertEqual(len(ranked), 5)
+        self.assertLess(time.perf_counter() - start, 0.5)
+
+    def test_format_distance(self):
+        self.assertEqual(format_distance(804.672), '0.5 mi')
+        self.assertEqual(format_distance(50), '50 m')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+import main
+from scheduler import DailyBudget, QuotaExceeded, QuotaScheduler, caller
+
+
+class TestQuotaScheduler(unittest.TestCase):
+    def test_daily_budget(self):
+        scheduler = QuotaScheduler({'geocode': (100, 2)})
+        scheduler.acquire('geocode')
+        scheduler.acquire('geocode')
+        with self.assertRaises(QuotaExceeded) as raised:
+            scheduler.acquire('geocode')
+        self.assertEqual(raised.exception.reason, 'budget')
+        self.assertEqual(scheduler.stats()['geocode']['rejected_budget'], 1)
+
+    def test_budget_resets_each_day(self):
+        now = [0.0]
+        budget = DailyBudget(limit=1, clock=lambda: now[0])
+        budget.spend()
+        self.assertEqual(budget.remaining(), 0)
+        now[0] += 86400
+        self.assertEqual(budget.remaining(), 1)
+
+    def test_queues_until_deadline(self):
+        scheduler = QuotaScheduler({'nearbysearch': (10, 0)}, max_wait=0.5)
+        for _ in range(10):
+            scheduler.acquire('nearbysearch')
+
+        start = time.perf_counter()
+        scheduler.acquire('nearbysearch')
+        self.assertGreater(time.perf_counter() - start, 0.05)
+
+        with self.assertRaises(QuotaExceeded) as raised:
+            scheduler.acquire('nearbysearch', timeout=0.01)
+        self.assertEqual(raised.exception.reason, 'timeout')
+        self.assertEqual(scheduler.stats()['nearbysearch']['rejected_timeout'], 1)
+
+    def test_no_max_wait_queues_until_a_token_frees_up(self):
+        scheduler = QuotaScheduler({'nearbysearch': (20, 0)}, max_wait=None)
+        for _ in range(20):
+            scheduler.acquire('nearbysearch')
+        scheduler.acquire('nearbysearch')
+        self.assertEqual(scheduler.stats()['nearbysearch']['rejected_timeout'], 0)
+
+    def test_unknown_api_is_not_limited(self):
+        QuotaScheduler({}).acquire('details')
+
+    def test_zero_rate_is_not_limited(self):
+        scheduler = QuotaScheduler({'geocode': (0, 0)})
+        for _ in range(10):
+            scheduler.acquire('geocode', timeout=0)
+        self.assertEqual(scheduler.stats()['geocode']['granted'], 10)
+
+    def test_quiet_phone_goes_before_chatty_phone(self):
+        scheduler = QuotaScheduler({'geocode': (20, 0)}, max_wait=5)
+        for _ in range(20):
+            scheduler.acquire('geocode')
+        order = []
+
+        def call(phone):
+            with caller(phone):
+                scheduler.acquire('geocode')
+            order.append(phone)
+
+        threads = []
+        for phone in ('chatty', 'chatty', 'chatty', 'quiet'):
+            thread = threading.Thread(target=call, args=(phone,))
+            thread.start()
+            threads.append(thread)
+            while scheduler.stats()['geocode']['waiting'] < len(threads) and not order:
+                time.sleep(0.001)
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(order.index('quiet'), 1)
+
+
+class TestQuotaDegradation(unittest.TestCase):
+    def tearDown(self):
+        main.components.places_cache.clear()
+
+    def test_places_quota_serves_expired_results(self):
+        location = '40.741, -73.9896'
+        key = main.components.places_cache.key(location, 'pizza', main.components.radius)
+        main.components.places_cache.results.set(key, [{'name': 'Old Store'}], ttl=-1)
+
+        quota_exceeded = QuotaExceeded('nearbysearch', 'budget')
+        with patch.object(main.components.api_scheduler, 'acquire', side_effect=quota_exceeded):
+            results = main.fetch_places(location, 'pizza')
+
+        self.assertEqual(results, [{'name': 'Old Store'}])
+
+    @patch('http_client.time.sleep')
+    def test_retries_are_charged_to_the_budget(self, mock_sleep):
+        scheduler = QuotaScheduler({'geocode': (100, 2)})
+        over_limit = MagicMock(status_code=200, content=b'{"status": "OVER_QUERY_LIMIT"}')
+        over_limit.json.return_value = {'status': 'OVER_QUERY_LIMIT'}
+        with patch.object(main.components, 'api_scheduler', scheduler), \
+                patch.object(main.components.http_client.session, 'get', return_value=over_limit) as mock_get:
+            data = main.make_api_request('https://maps.googleapis.com/maps/api/geocode/json?address=x')
+
+        self.assertEqual(data['status'], 'OVER_QUERY_LIMIT')
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(scheduler.stats()['geocode']['budget_used'], 2)
+
+    def test_places_quota_without_fallback_raises(self):
+        quota_exceeded = QuotaExceeded('nearbysearch', 'timeout')
+        with patch.object(main.components.api_scheduler, 'acquire', side_effect=quota_exceeded):
+            with self.assertRaises(QuotaExceeded):
+                main.fetch_places('40.741, -73.9896', 'tacos')
+
+
+if __name__ == '__main__':
+    unittest.main()
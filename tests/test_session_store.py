@@ -0,0 +1,82 @@
+import os
+import tempfile
+import threading
+import unittest
+
+import main
+from session_store import MemorySessionStore, SQLiteSessionStore
+
+
+class TestMemorySessionStore(unittest.TestCase):
+    def test_idle_sessions_expire(self):
+        now = [0]
+        store = MemorySessionStore(ttl=10, clock=lambda: now[0])
+        store.set('+1', {'state': 'waiting_for_address'})
+        now[0] = 11
+        self.assertEqual(store.get('+1'), {})
+        self.assertEqual(store.stats()['active_sessions'], 0)
+
+    def test_least_recently_used_session_is_evicted(self):
+        store = MemorySessionStore(max_entries=2)
+        store.set('+1', {'state': 'a'})
+        store.set('+2', {'state': 'b'})
+        store.get('+1')
+        store.set('+3', {'state': 'c'})
+        self.assertEqual(store.get('+2'), {})
+        self.assertEqual(store.stats()['evictions'], 1)
+
+    def test_readers_get_a_private_copy(self):
+        store = MemorySessionStore()
+        store.set('+1', {'state': 'a'})
+        store.get('+1')['state'] = 'b'
+        self.assertEqual(store.get('+1'), {'state': 'a'})
+
+    def test_emptied_session_is_deleted(self):
+        store = MemorySessionStore()
+        store.set('+1', {'state': 'a'})
+        with store.transaction('+1') as state:
+            state.clear()
+        self.assertEqual(store.stats()['active_sessions'], 0)
+
+
+class TestSQLiteSessionStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'sessions.sqlite3')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_sessions_are_shared_between_store_instances(self):
+        SQLiteSessionStore(self.path).set('+1', {'state': 'searching_continue'})
+        self.assertEqual(SQLiteSessionStore(self.path).get('+1'), {'state': 'searching_continue'})
+
+    def test_concurrent_transactions_do_not_lose_updates(self):
+        store = SQLiteSessionStore(self.path)
+        store.set('+1', {'count': 0})
+
+        def increment():
+            for _ in range(20):
+                with store.transaction('+1') as state:
+                    state['count'] += 1
+
+        threads = [threading.Thread(target=increment) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(store.get('+1')['count'], 80)
+        self.assertEqual(store.stats()['active_sessions'], 1)
+
+
+class TestSmsReplySessions(unittest.TestCase):
+    def test_goodbye_ends_the_session(self):
+        client = main.app.test_client()
+        main.set_user_state('+15550003', main.UserState.SEARCHING_CONTINUE)
+        client.post('/sms', data={'From': '+15550003', 'Body': 'No'})
+        self.assertEqual(main.get_user_state('+15550003'), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
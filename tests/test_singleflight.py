@@ -0,0 +1,133 @@
+import fcntl
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+import main
+from deadline import Deadline, DeadlineExceeded
+from singleflight import SingleFlight
+
+OK_DATA = {'status': 'OK', 'results': [{'geometry': {'location': {'lat': 1, 'lng': 2}}}]}
+
+
+def run_concurrently(count, target):
+    results = [None] * count
+
+    def run(i):
+        try:
+            results[i] = target()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_callers_share_one_call(self):
+        flight = SingleFlight()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.1)
+            return 'result'
+
+        results = run_concurrently(8, lambda: flight.do('key', slow))
+
+        self.assertEqual(results, ['result'] * 8)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight.stats()['coalesced'], 7)
+        self.assertEqual(flight.stats()['in_flight'], 0)
+
+    def test_errors_are_shared(self):
+        flight = SingleFlight()
+
+        def failing():
+            time.sleep(0.1)
+            raise ValueError('upstream failed')
+
+        results = run_concurrently(4, lambda: flight.do('key', failing))
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+
+    def test_waiting_process_rechecks_the_shared_cache(self):
+        with tempfile.TemporaryDirectory() as lock_dir:
+            flight = SingleFlight(lock_dir=lock_dir, lock_stripes=1)
+            shared_cache = {}
+            calls = []
+
+            # Stand in for a leader in another process holding the key's lock.
+            other_process = open(os.path.join(lock_dir, '0.lock'), 'a')
+            fcntl.flock(other_process, fcntl.LOCK_EX)
+
+            def other_leader_finishes():
+                time.sleep(0.1)
+                shared_cache['key'] = 'from other process'
+                fcntl.flock(other_process, fcntl.LOCK_UN)
+                other_process.close()
+
+            threading.Thread(target=other_leader_finishes).start()
+            result = flight.do('key', lambda: calls.append(1), recheck=lambda: shared_cache.get('key'))
+
+            self.assertEqual(result, 'from other process')
+            self.assertEqual(calls, [])
+            self.assertEqual(flight.stats()['coalesced_across_processes'], 1)
+
+    def test_followers_with_time_left_retry_after_the_leader_runs_out(self):
+        flight = SingleFlight()
+
+        def out_of_time():
+            time.sleep(0.1)
+            raise DeadlineExceeded('geocode')
+
+        leader = threading.Thread(target=run_concurrently, args=(1, lambda: flight.do('key', out_of_time)))
+        leader.start()
+        time.sleep(0.02)
+        self.assertEqual(flight.do('key', lambda: 'mine', deadline=Deadline(5)), 'mine')
+        leader.join()
+        self.assertEqual(flight.stats()['retries'], 1)
+
+    def test_lock_wait_is_bounded_and_skipped_without_a_recheck(self):
+        with tempfile.TemporaryDirectory() as lock_dir:
+            flight = SingleFlight(lock_dir=lock_dir, lock_stripes=1)
+            with open(os.path.join(lock_dir, '0.lock'), 'a') as other_process:
+                fcntl.flock(other_process, fcntl.LOCK_EX)
+
+                start = time.perf_counter()
+                self.assertEqual(flight.do('key', lambda: 'no recheck'), 'no recheck')
+                self.assertLess(time.perf_counter() - start, 0.05)
+
+                result = flight.do('key', lambda: 'upstream', recheck=lambda: None, deadline=Deadline(0.1))
+                self.assertEqual(result, 'upstream')
+                self.assertEqual(flight.stats()['lock_timeouts'], 1)
+
+
+class TestGetJsonDataCoalescing(unittest.TestCase):
+    def setUp(self):
+        main.components.geocode_cache.clear()
+
+    @patch('main.components.http_client.session.get')
+    def test_burst_of_identical_addresses_makes_one_call(self, mock_get):
+        def slow_get(*args, **kwargs):
+            time.sleep(0.1)
+            return mock_get.return_value
+
+        mock_get.side_effect = slow_get
+        mock_get.return_value.status_code = 200
+        mock_get.return_value.json.return_value = OK_DATA
+
+        results = run_concurrently(6, lambda: main.get_json_data('500 Event Plaza'))
+
+        self.assertEqual(results, [OK_DATA] * 6)
+        self.assertEqual(mock_get.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
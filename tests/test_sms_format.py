@@ -0,0 +1,55 @@
+import unittest
+from unittest.mock import patch
+
+import main
+from sms_format import CompactFormatter, abbreviate_address, segments, to_gsm
+
+
+def place(i, name=None):
+    return {'place_id': f'p{i}', 'name': name or f'Corner Bakery Number {i}', 'vicinity': f'{i}00 Market Street, Springfield',
+            'rating': 4.5, 'opening_hours': {'open_now': True}, 'distance_meters': 400.0 + i}
+
+
+class TestEncoding(unittest.TestCase):
+    def test_to_gsm(self):
+        self.assertEqual(to_gsm('Joe’s Pizza 🍕 — “Best” in Łódź'), 'Joe\'s Pizza - "Best" in Lodz')
+        self.assertEqual(to_gsm('Café Müller'), 'Café Müller')
+        self.assertEqual(segments(to_gsm('Sushi 寿司 🍣'))[1], 'GSM-7')
+
+    def test_segments(self):
+        self.assertEqual(segments('a' * 160), (1, 'GSM-7'))
+        self.assertEqual(segments('a' * 161), (2, 'GSM-7'))
+        self.assertEqual(segments('[' * 80), (1, 'GSM-7'))
+        self.assertEqual(segments('[' * 81), (2, 'GSM-7'))
+        self.assertEqual(segments('🍕' + 'a' * 68), (1, 'UCS-2'))
+        self.assertEqual(segments('🍕' + 'a' * 69), (2, 'UCS-2'))
+
+    def test_abbreviate_address(self):
+        self.assertEqual(abbreviate_address('123 Main Street, Springfield'), '123 Main St')
+        self.assertEqual(abbreviate_address('Downtown Plaza, Springfield'), 'Downtown Plz, Springfield')
+        self.assertEqual(abbreviate_address('9 Park Avenue, Suite 4', keep_locality=True), '9 Park Ave, Ste 4')
+
+
+class TestCompactFormatter(unittest.TestCase):
+    def test_packs_within_budget(self):
+        formatter = CompactFormatter(segment_budget=2, distance_format=main.format_distance)
+        suffix = 'Reply "yes" or "no".'
+        text, count = formatter.pack([place(i) for i in range(1, 9)], 8, suffix)
+
+        self.assertLess(count, 8)
+        self.assertLessEqual(segments(text + '\n\n' + suffix)[0], 2)
+        self.assertIn('1. Corner Bakery Number 1 - 100 Market St (4.5*, open, 0.2mi)', text)
+
+    def test_always_shows_one_result(self):
+        text, count = CompactFormatter(segment_budget=1).pack([place(1, 'x' * 300)], 5)
+        self.assertEqual(count, 1)
+
+    @patch('main.components.reply_format', 'compact')
+    def test_reply_stays_gsm(self):
+        text, count = main.render_places([place(1, 'Taco 🌮 Town'), place(2)], 5)
+        self.assertEqual(count, 2)
+        self.assertEqual(segments(text + '\n\n' + main.generate_continue_search_message()), (2, 'GSM-7'))
+
+
+if __name__ == '__main__':
+    unittest.main()
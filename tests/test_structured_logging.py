@@ -0,0 +1,106 @@
+import json
+import logging
+import logging.handlers
+import queue
+import unittest
+from unittest.mock import patch
+
+import main
+from structured_logging import (JsonFormatter, LoggingPipeline, NonBlockingQueueHandler, SamplingFilter,
+                                parse_sample_rates)
+
+
+def record(name='upstream', level=logging.DEBUG, msg='upstream response', args=(), fields=None):
+    entry = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    entry.fields = fields
+    return entry
+
+
+class TestJsonFormatter(unittest.TestCase):
+    def test_redacts_and_truncates(self):
+        formatter = JsonFormatter(max_field_length=40)
+        payload = {'status': 'OK', 'results': [{'name': 'x' * 100}]}
+        line = formatter.format(record(msg='reply to %s', args=('+15551234567',), fields={
+            'phone': '+1 (555) 123-4567', 'url': '/geocode/json?address=x&key=AIzaSecret', 'payload': payload, 'ms': 12.5}))
+        entry = json.loads(line)
+
+        self.assertEqual(entry['msg'], 'reply to ***4567')
+        self.assertEqual(entry['phone'], '***4567')
+        self.assertEqual(entry['url'], '/geocode/json?address=x&key=***')
+        self.assertTrue(entry['payload'].endswith('chars)'))
+        self.assertEqual(entry['ms'], 12.5)
+        self.assertEqual(entry['level'], 'DEBUG')
+
+
+class TestSampling(unittest.TestCase):
+    def test_rates_by_logger(self):
+        sampler = SamplingFilter(parse_sample_rates('upstream=0, root=1'))
+        self.assertFalse(sampler.filter(record('upstream.geocode')))
+        self.assertTrue(sampler.filter(record('upstream', logging.INFO)))
+        self.assertTrue(sampler.filter(record('sms')))
+
+        sampler.set_rate('upstream', 1.0)
+        self.assertTrue(sampler.filter(record('upstream.geocode')))
+
+
+class TestQueueHandler(unittest.TestCase):
+    def test_does_not_format_on_the_caller_thread_and_drops_when_full(self):
+        handler = NonBlockingQueueHandler(queue.Queue(1))
+        with patch.object(logging.LogRecord, 'getMessage') as get_message:
+            handler.emit(record(msg='%s', args=({'big': 'payload'},)))
+            handler.emit(record())
+        get_message.assert_not_called()
+        self.assertEqual(handler.queue.qsize(), 1)
+        self.assertEqual(handler.dropped, 1)
+
+    def test_forked_child_gets_its_own_listener(self):
+        handler = NonBlockingQueueHandler(queue.Queue(5))
+        output = logging.NullHandler()
+        parent = logging.handlers.QueueListener(handler.queue, output)
+        pipeline = LoggingPipeline(handler, parent, SamplingFilter())
+
+        pipeline._restart_in_child()
+        self.addCleanup(pipeline.stop)
+        self.assertIsNot(pipeline.listener, parent)
+        self.assertIs(pipeline.listener.queue, handler.queue)
+        self.assertEqual(handler.queue.maxsize, 5)
+        self.assertEqual(pipeline.listener.handlers, (output,))
+        self.assertTrue(pipeline.listener._thread.is_alive())
+
+
+class TestRequestLog(unittest.TestCase):
+    def setUp(self):
+        self.app = main.app.test_client()
+
+    def tearDown(self):
+        main.components.session_store.delete('+15550021')
+        logging.getLogger('upstream').setLevel(logging.NOTSET)
+
+    def test_one_record_per_request(self):
+        with self.assertLogs('sms', level='INFO') as logs:
+            self.app.post('/sms', data={'From': '+15550021', 'Body': 'pizza'})
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(logs.records[0].fields['to_state'], main.UserState.waiting_for_address)
+        self.assertEqual(json.loads(JsonFormatter().format(logs.records[0]))['phone'], '***0021')
+
+    def test_level_changes_at_runtime(self):
+        self.assertEqual(self.app.post('/admin/log-level', data={'level': 'debug'}).status_code, 404)
+        with patch.object(main.components, 'settings', main.components.settings.replace(admin_token='secret')):
+            reply = self.app.post('/admin/log-level', data={'level': 'debug', 'logger': 'upstream'},
+                                  headers={'X-Admin-Token': 'secret'})
+        self.assertEqual(reply.data, b'upstream DEBUG\n')
+        self.assertTrue(logging.getLogger('upstream').isEnabledFor(logging.DEBUG))
+
+    def test_invalid_sample_rate_is_rejected(self):
+        with patch.object(main.components, 'settings', main.components.settings.replace(admin_token='secret')):
+            for rate in ('often', '1.5', '-0.1', 'nan'):
+                reply = self.app.post('/admin/log-level', data={'level': 'debug', 'logger': 'upstream',
+                                                                'sample_rate': rate},
+                                      headers={'X-Admin-Token': 'secret'})
+                self.assertEqual(reply.status_code, 400, rate)
+        self.assertEqual(logging.getLogger('upstream').level, logging.NOTSET)
+        self.assertNotIn('upstream', main.components.log_pipeline.sampler.rates)
+
+
+if __name__ == '__main__':
+    unittest.main()